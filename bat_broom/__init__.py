@@ -0,0 +1,24 @@
+"""
+Bat Broom - Windows Temporary Files Cleanup
+The GUI lives in bat_broom.gui; bat_broom.engine and bat_broom.cli never import tkinter
+"""
+
+import sys
+
+__version__ = "1.0.0"
+
+
+def main(argv=None):
+    """Main application entry point
+
+    With command line arguments the non-interactive CLI is used, otherwise
+    the GUI is started.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv:
+        from .cli import main as cli_main
+        return cli_main(argv)
+
+    from .gui import main as gui_main
+    return gui_main()
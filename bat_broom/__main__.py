@@ -0,0 +1,14 @@
+"""
+Allow running Bat Broom with ``python -m bat_broom``
+"""
+
+import sys
+
+from bat_broom import main
+
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        # Lets frozen builds start the processes of sharded cleanups
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""
+Agent mode for Bat Broom
+Serves the cleanup engine over a small HTTP JSON protocol for remote orchestration
+"""
+
+import hmac
+import itertools
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import __version__
+from .control import RunControl
+from .engine import CleanupEngine, build_targets, select_targets
+from .policy import Policy
+from .retry import RetryQueue
+from .roots import image_roots, list_profiles, profile_roots, targets_for_roots
+from .throttle import IoThrottle
+
+DEFAULT_PORT = 8765
+
+# Environment variable holding the token shared by agents and coordinators
+TOKEN_ENV = "BAT_BROOM_AGENT_TOKEN"
+
+# Seconds between progress events while a job produces no log lines
+PROGRESS_INTERVAL = 1.0
+
+# Largest request body accepted, in bytes
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class AgentJob:
+    """One scan or cleanup run by the agent, with the events it produced
+
+    Events are dictionaries numbered by their position in ``events``;
+    readers wait on ``condition`` for new ones. The last event of a job
+    has the type "done" (with the report) or "failed" (with the error).
+    """
+
+    def __init__(self, job_id, kind, options):
+        self.id = job_id
+        self.kind = kind
+        self.options = options
+        self.control = RunControl()
+        self.events = []
+        self.condition = threading.Condition()
+        self.state = "running"
+        self.report = None
+
+    @property
+    def finished(self):
+        return self.state != "running"
+
+    def emit(self, event_type, **fields):
+        """Append an event and wake up the readers"""
+        with self.condition:
+            self.events.append({"seq": len(self.events), "type": event_type, **fields})
+            self.condition.notify_all()
+
+    def wait_events(self, since, timeout):
+        """Return the events after position since, waiting up to timeout for one"""
+        with self.condition:
+            if len(self.events) <= since and not self.finished:
+                self.condition.wait(timeout)
+            return self.events[since:]
+
+    def progress(self):
+        """Return the current progress as an event that is not stored"""
+        snapshot = self.control.snapshot()
+        return {
+            "type": "progress",
+            "targets_done": snapshot.targets_done,
+            "total_targets": snapshot.total_targets,
+            "items": snapshot.items,
+            "bytes": snapshot.bytes,
+            "fraction": round(snapshot.fraction, 4),
+            "items_per_second": round(snapshot.items_per_second, 1),
+            "paused": snapshot.paused,
+        }
+
+    def to_dict(self):
+        """Return the job's state as a plain dictionary"""
+        return {"job": self.id, "kind": self.kind, "state": self.state, "events": len(self.events)}
+
+
+def option_number(options, name, default, kind=float, minimum=0):
+    """Return a job option converted to kind, raising ValueError unless it is a number >= minimum"""
+    value = options.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a number")
+    try:
+        number = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} must be a number") from None
+    if not math.isfinite(number) or number < minimum:
+        raise ValueError(f"{name} must be a number of at least {minimum}")
+    return number
+
+
+def option_strings(options, name):
+    """Return a job option that must be a list of strings, raising ValueError otherwise"""
+    value = options.get(name)
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} must be a list of strings")
+    return value
+
+
+def job_settings(options):
+    """Return the checked "workers", "per_volume", "retry_budget" and "scan_first" options"""
+    return {
+        "workers": option_number(options, "workers", 1, int, minimum=1),
+        "per_volume": option_number(options, "per_volume", None, int, minimum=1),
+        "retry_budget": option_number(options, "retry_budget", 0),
+        "scan_first": bool(options.get("scan_first")),
+    }
+
+
+def job_targets(options):
+    """Return the targets selected by a job's options, repeated for its roots
+
+    Options mirror the command line: "sections", "targets", "all",
+    "profiles", "profiles_dir" and "images". Raises ValueError when the
+    selection is empty or unknown.
+    """
+    if options.get("all"):
+        targets = build_targets()
+    else:
+        targets = select_targets(option_strings(options, "sections"),
+                                 option_strings(options, "targets"))
+    if not targets:
+        raise ValueError("no targets selected")
+    roots = profile_roots(option_strings(options, "profiles"))
+    for users_dir in option_strings(options, "profiles_dir"):
+        roots.extend(profile_roots(list_profiles(users_dir)))
+    for image_root in option_strings(options, "images"):
+        roots.extend(image_roots(image_root))
+    return targets_for_roots(targets, roots) if roots else targets
+
+
+def job_policy(options):
+    """Return the Policy of a job's "older_than", "larger_than" and "exclude" options"""
+    older_than = option_number(options, "older_than", 0)
+    larger_than = option_number(options, "larger_than", 0)
+    exclude = option_strings(options, "exclude")
+    if not (older_than or larger_than or exclude):
+        return None
+    return Policy(min_age_days=older_than, min_size=int(larger_than * 1024 * 1024), exclude=exclude)
+
+
+def job_throttle(options):
+    """Return the IoThrottle of a job's "max_ops", "max_mbps" and "max_latency" (ms) options"""
+    ops = option_number(options, "max_ops", 0)
+    mbps = option_number(options, "max_mbps", 0)
+    latency = option_number(options, "max_latency", 0)
+    if not (ops or mbps or latency):
+        return None
+    return IoThrottle(ops_per_second=ops, bytes_per_second=mbps * 1024 * 1024,
+                      max_latency=latency / 1000)
+
+
+class Agent:
+    """Runs one scan or cleanup at a time on behalf of remote callers
+
+    Every request must carry ``Authorization: Bearer <token>``. Starting
+    a job while another one runs is refused, so a coordinator can never
+    stack runs on a host. ``index`` is the ScanIndex shared by the jobs.
+    """
+
+    def __init__(self, token, log=None, index=None):
+        if not token:
+            raise ValueError("the agent needs a token")
+        self.token = token
+        self.log = log or (lambda message: None)
+        self.index = index
+        self.job = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def authorized(self, header):
+        """Return True if an Authorization header carries the agent's token"""
+        expected = f"Bearer {self.token}"
+        return hmac.compare_digest((header or "").encode("utf-8"), expected.encode("utf-8"))
+
+    def status(self):
+        """Return the agent's state and the progress of its current job"""
+        job = self.job
+        status = {"version": __version__, "busy": job is not None and not job.finished}
+        if job is not None:
+            status.update(job.to_dict())
+            status["progress"] = job.progress()
+        return status
+
+    def start(self, kind, options):
+        """Start a "scan" or "clean" job in the background and return it
+
+        Every option is checked first: bad values raise ValueError or
+        TypeError and no job is started.
+        """
+        settings = job_settings(options)
+        targets = job_targets(options)
+        policy = job_policy(options)
+        throttle = job_throttle(options)
+        with self._lock:
+            if self.job is not None and not self.job.finished:
+                return None
+            job = self.job = AgentJob(next(self._ids), kind, options)
+        self.log(f"📡 Job {job.id}: {kind} of {len(targets)} targets")
+        thread = threading.Thread(target=self._run,
+                                  args=(job, targets, settings, policy, throttle), daemon=True)
+        thread.start()
+        return job
+
+    def _run(self, job, targets, settings, policy, throttle):
+        """Run a job on the calling thread, recording its events
+
+        The job always ends with a "done" or "failed" event, so a failure
+        never leaves the agent busy.
+        """
+        retry_budget = settings["retry_budget"]
+        try:
+            engine = CleanupEngine(log=lambda message: job.emit("log", message=message),
+                                   workers=settings["workers"],
+                                   per_volume=settings["per_volume"], control=job.control,
+                                   index=self.index, policy=policy,
+                                   retry=RetryQueue(budget=retry_budget) if retry_budget else None,
+                                   throttle=throttle)
+            if job.kind == "scan":
+                report = engine.scan(targets)
+            else:
+                scans = engine.scan(targets) if settings["scan_first"] else None
+                report = engine.run(targets, scans)
+            job_report = report.to_dict()
+        except Exception as e:
+            job.state = "failed"
+            job.emit("failed", error=str(e))
+            self.log(f"❌ Job {job.id} failed: {str(e)}")
+            return
+        job.report = job_report
+        job.state = "cancelled" if job.control.cancelled else "done"
+        job.emit("done", state=job.state, report=job.report)
+        self.log(f"📡 Job {job.id}: {job.state}")
+
+    def cancel(self):
+        """Cancel the running job, returning it (None if there is none)"""
+        job = self.job
+        if job is None or job.finished:
+            return None
+        job.control.cancel()
+        return job
+
+
+class AgentHandler(BaseHTTPRequestHandler):
+    """HTTP front end of an Agent
+
+    GET /status, GET /report, GET /events?job=N&since=M, POST /scan,
+    POST /clean and POST /cancel. /events streams JSON lines, one event
+    per line, with progress events in between, until the job is over.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = f"BatBroomAgent/{__version__}"
+
+    @property
+    def agent(self):
+        return self.server.agent
+
+    def log_message(self, format, *args):
+        """Keep the request log out of the console"""
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method):
+        """Check the token and call the route of the request"""
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True
+            self.send_json(413, {"error": "request too large"})
+            return
+        body = self.rfile.read(length) if length else b""
+        if not self.agent.authorized(self.headers.get("Authorization")):
+            self.send_json(401, {"error": "unauthorized"})
+            return
+        route = getattr(self, f"route_{method.lower()}_{url.path.strip('/')}", None)
+        if route is None:
+            self.send_json(404, {"error": f"no route for {method} {url.path}"})
+            return
+        try:
+            options = json.loads(body) if body else {}
+            if not isinstance(options, dict):
+                raise ValueError("the request body must be a JSON object")
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        route(options, parse_qs(url.query))
+
+    def send_json(self, status, payload):
+        """Send a complete JSON response"""
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def route_get_status(self, options, query):
+        self.send_json(200, self.agent.status())
+
+    def route_get_report(self, options, query):
+        job = self.agent.job
+        if job is None or job.report is None:
+            self.send_json(404, {"error": "no finished job"})
+            return
+        self.send_json(200, {**job.to_dict(), "report": job.report})
+
+    def route_post_scan(self, options, query):
+        self.start_job("scan", options)
+
+    def route_post_clean(self, options, query):
+        self.start_job("clean", options)
+
+    def start_job(self, kind, options):
+        try:
+            job = self.agent.start(kind, options)
+        except (ValueError, TypeError, OSError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        if job is None:
+            self.send_json(409, {"error": "another job is running", **self.agent.status()})
+            return
+        self.send_json(202, job.to_dict())
+
+    def route_post_cancel(self, options, query):
+        job = self.agent.cancel()
+        if job is None:
+            self.send_json(409, {"error": "no job is running"})
+            return
+        self.send_json(200, job.to_dict())
+
+    def route_get_events(self, options, query):
+        job = self.agent.job
+        try:
+            job_id = int(query.get("job", ["0"])[0])
+            since = int(query.get("since", ["0"])[0])
+        except ValueError:
+            self.send_json(400, {"error": "job and since must be integers"})
+            return
+        if job is None or job.id != job_id:
+            self.send_json(404, {"error": f"unknown job {job_id}"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while True:
+                events = job.wait_events(since, PROGRESS_INTERVAL)
+                since += len(events)
+                if not events:
+                    events = [job.progress()]
+                self.write_chunk("".join(json.dumps(event) + "\n" for event in events))
+                if job.finished and since >= len(job.events):
+                    break
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def write_chunk(self, text):
+        """Write one chunk of a chunked response"""
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def create_server(agent, host="127.0.0.1", port=DEFAULT_PORT):
+    """Return a threading HTTP server serving agent; port 0 picks a free port"""
+    server = ThreadingHTTPServer((host, port), AgentHandler)
+    server.daemon_threads = True
+    server.agent = agent
+    return server
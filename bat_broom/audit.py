@@ -0,0 +1,135 @@
+"""
+Audit trail for Bat Broom
+Streams one JSON line per deleted or failed entry to a rotating, optionally gzipped file
+"""
+
+import json
+import os
+import threading
+import time
+
+# Entries buffered in memory before they are written out
+AUDIT_BATCH_SIZE = 1000
+
+# Default size at which the audit file is rotated, and rotated files kept
+AUDIT_MAX_BYTES = 100 * 1024 * 1024
+AUDIT_BACKUPS = 5
+
+
+class AuditSink:
+    """Append-only JSON lines record of what a cleanup removed
+
+    Each line holds the time, path, entry type ("file" or "dir"), outcome
+    ("deleted" or "failed"), size, mtime and errno name where known.
+    Records are buffered and written AUDIT_BATCH_SIZE at a time, so
+    memory stays constant however large the run is. Once the file holds
+    ``max_bytes`` (the UTF-8 bytes written, plus what it held when it was
+    opened, compressed or not) it is renamed to ``<path>.1``, older
+    files shift up and at most ``backups`` of them are kept. With
+    ``compress`` the file is written as gzip. Safe to share between
+    threads.
+    """
+
+    def __init__(self, path, max_bytes=AUDIT_MAX_BYTES, backups=AUDIT_BACKUPS, compress=False,
+                 batch_size=AUDIT_BATCH_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._file = None
+        self._written = 0
+
+    def settings(self):
+        """Return the constructor arguments, to open a sink in another process"""
+        return {
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "backups": self.backups,
+            "compress": self.compress,
+            "batch_size": self.batch_size,
+        }
+
+    @classmethod
+    def for_process(cls, settings):
+        """Open a sink writing next to settings["path"], suffixed with this process id"""
+        settings = dict(settings)
+        root, extension = os.path.splitext(settings["path"])
+        settings["path"] = f"{root}.{os.getpid()}{extension}"
+        return cls(**settings)
+
+    def record(self, path, kind, outcome, size=None, mtime=None, error=None):
+        """Queue one entry, writing the batch out once it is full"""
+        with self._lock:
+            self._buffer.append((time.time(), path, kind, outcome, size, mtime, error))
+            if len(self._buffer) >= self.batch_size:
+                self._write()
+
+    def flush(self):
+        """Write out every queued entry"""
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """Write out every queued entry and close the file"""
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self):
+        """Serialise and write the buffer; the lock must be held"""
+        if not self._buffer:
+            return
+        lines = []
+        for timestamp, path, kind, outcome, size, mtime, error in self._buffer:
+            lines.append(json.dumps({
+                "ts": round(timestamp, 3),
+                "path": path,
+                "type": kind,
+                "outcome": outcome,
+                "size": size,
+                "mtime": mtime,
+                "errno": error,
+            }, ensure_ascii=False))
+        self._buffer = []
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+
+        if self._file is None:
+            self._open()
+        if self._written >= self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._written += len(data)
+
+    def _open(self):
+        """Open the audit file for appending"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.compress:
+            # Imported here: only needed for compressed trails
+            import gzip
+            # Appending adds a new gzip member, which readers handle transparently
+            self._file = gzip.open(self.path, "ab")
+        else:
+            self._file = open(self.path, "ab")
+        self._written = os.path.getsize(self.path)
+
+    def _rotate(self):
+        """Shift <path>.N to <path>.N+1 and start a fresh file"""
+        self._file.close()
+        for number in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{number}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{number + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
@@ -0,0 +1,382 @@
+"""
+Benchmark harness for Bat Broom
+Generates synthetic temp trees and measures scans and cleanups against them
+
+Run with ``python -m bat_broom.bench``. Every scenario builds a tree shaped
+like one of the real targets, points the "User Temp Directory" catalog entry
+at it through the TEMP variable and runs the operation in a fresh
+subprocess, so peak memory is measured per scenario. Results are printed
+and saved as JSON; ``--compare`` prints the change against an earlier run.
+
+``--startup`` measures the GUI start instead: the import-time breakdown of
+``bat_broom.gui`` and the time from launching the process to its first
+drawn window, for ``python -m bat_broom`` or a frozen build given with
+``--exe``.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import stat
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from . import __version__
+
+# The catalog entry every scenario is run against
+BENCH_TARGET = "User Temp Directory"
+
+# os functions the walkers go through, counted as syscalls by the child.
+# DirEntry methods are implemented in C and cannot be counted this way.
+COUNTED_CALLS = ("scandir", "open", "close", "stat", "lstat", "fstat", "unlink", "rmdir")
+
+OPERATIONS = ("scan", "clean")
+
+# Module whose import time is broken down by the startup measurement
+STARTUP_MODULE = "bat_broom.gui"
+
+# Same as bat_broom.gui.STARTUP_PROBE_VARIABLE, without importing tkinter
+STARTUP_PROBE_VARIABLE = "BAT_BROOM_STARTUP_PROBE"
+
+# Seconds to wait for the first window before giving up
+STARTUP_TIMEOUT = 60
+
+
+def _write_files(dir_path, count, size=0, prefix="f"):
+    """Create count files of size bytes in dir_path"""
+    data = b"\0" * size
+    for number in range(count):
+        with open(os.path.join(dir_path, f"{prefix}{number:06d}.tmp"), "wb") as f:
+            f.write(data)
+
+
+def make_cache_tree(root, scale):
+    """Many tiny files spread over hashed cache folders, like INetCache"""
+    folders = max(1, int(64 * scale))
+    for folder in range(folders):
+        dir_path = os.path.join(root, f"{folder:02x}")
+        os.mkdir(dir_path)
+        _write_files(dir_path, 500, size=64)
+
+
+def make_deep_tree(root, scale):
+    """Deeply nested browser profile folders with a few files per level"""
+    for profile in range(max(1, int(8 * scale))):
+        dir_path = os.path.join(root, f"profile{profile}.default")
+        for depth in range(40):
+            dir_path = os.path.join(dir_path, f"level{depth}")
+            os.makedirs(dir_path)
+            _write_files(dir_path, 3, size=512)
+            os.mkdir(os.path.join(dir_path, "empty"))
+
+
+def make_huge_tree(root, scale):
+    """A few huge files, created sparse so generation stays fast"""
+    for number in range(max(1, int(4 * scale))):
+        with open(os.path.join(root, f"dump{number}.dmp"), "wb") as f:
+            f.truncate(512 * 1024 * 1024)
+
+
+def make_locked_tree(root, scale):
+    """Read-only files and folders the current user may not be able to delete
+
+    Read-only files can be removed on POSIX but not on Windows. Files in
+    a read-only folder cannot be removed unless running as root.
+    """
+    for folder in range(max(1, int(16 * scale))):
+        dir_path = os.path.join(root, f"app{folder}")
+        os.mkdir(dir_path)
+        _write_files(dir_path, 100, size=128)
+        for name in os.listdir(dir_path)[:50]:
+            os.chmod(os.path.join(dir_path, name), stat.S_IREAD)
+        locked = os.path.join(dir_path, "locked")
+        os.mkdir(locked)
+        _write_files(locked, 20, size=128)
+        os.chmod(locked, stat.S_IREAD | stat.S_IEXEC)
+
+
+SCENARIOS = {
+    "cache": make_cache_tree,
+    "deep": make_deep_tree,
+    "huge": make_huge_tree,
+    "locked": make_locked_tree,
+}
+
+
+def _make_writable(func, path, exc_info):
+    """shutil.rmtree error handler that retries after restoring permissions"""
+    os.chmod(os.path.dirname(path), stat.S_IRWXU)
+    os.chmod(path, stat.S_IRWXU)
+    func(path)
+
+
+def remove_tree(path):
+    """Remove a generated tree, including its read-only parts"""
+    if os.path.lexists(path):
+        shutil.rmtree(path, onerror=_make_writable)
+
+
+def generate(scenario, root, scale):
+    """Create a fresh tree for scenario under root and return its path"""
+    tree = os.path.join(root, scenario)
+    remove_tree(tree)
+    os.makedirs(tree)
+    SCENARIOS[scenario](tree, scale)
+    return tree
+
+
+def count_calls():
+    """Wrap the counted os functions and return the live counters"""
+    counts = dict.fromkeys(COUNTED_CALLS, 0)
+
+    def wrap(name, func):
+        def counted(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return counted
+
+    for name in COUNTED_CALLS:
+        setattr(os, name, wrap(name, getattr(os, name)))
+    return counts
+
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in KB, or None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_child(operation, tree):
+    """Run one operation against tree and return its measurements"""
+    from .engine import CleanupEngine, select_targets
+
+    targets = select_targets(names=[BENCH_TARGET])
+    engine = CleanupEngine(environ={"TEMP": tree})
+    counts = count_calls()
+
+    started = time.perf_counter()
+    if operation == "scan":
+        report = engine.scan(targets)
+        entries = report.files + report.dirs
+        files = report.files
+    else:
+        report = engine.run(targets)
+        entries = sum(result.stats.deleted + result.stats.failed for result in report.results)
+        files = sum(result.stats.files_deleted + result.stats.files_failed
+                    for result in report.results)
+    wall = time.perf_counter() - started
+
+    return {
+        "wall_seconds": round(wall, 4),
+        "entries": entries,
+        "files_per_second": round(files / wall, 1) if wall > 0 else None,
+        "syscalls": dict(counts, total=sum(counts.values())),
+        "peak_rss_kb": peak_rss_kb(),
+        "report": report.to_dict(),
+    }
+
+
+def run_scenario(scenario, operation, root, scale):
+    """Generate the tree for a scenario and measure one operation in a subprocess"""
+    tree = generate(scenario, root, scale)
+    try:
+        command = [sys.executable, "-m", "bat_broom.bench", "--child", operation, tree]
+        output = subprocess.run(command, stdout=subprocess.PIPE, check=True,
+                                universal_newlines=True).stdout
+    finally:
+        remove_tree(tree)
+    measurement = json.loads(output)
+    measurement.update(scenario=scenario, operation=operation)
+    return measurement
+
+
+def measure_imports(module=STARTUP_MODULE, top=15):
+    """Return the total import time of module and its slowest imports
+
+    Times come from ``python -X importtime`` and are in microseconds.
+    """
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    stderr = subprocess.run(command, stderr=subprocess.PIPE, check=True,
+                            universal_newlines=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_us": int(self_us),
+                        "cumulative_us": int(cumulative_us)})
+    total = next((item["cumulative_us"] for item in modules if item["module"] == module), None)
+    modules.sort(key=lambda item: item["self_us"], reverse=True)
+    return {"module": module, "total_us": total, "slowest": modules[:top]}
+
+
+def measure_first_window(command, repeat):
+    """Return the seconds from launching command until its first window is drawn
+
+    The GUI writes the time it finished drawing to the file named by
+    STARTUP_PROBE_VARIABLE and exits, so frozen builds can be measured too.
+    """
+    runs = []
+    error = None
+    for _ in range(repeat):
+        probe = tempfile.NamedTemporaryFile(prefix="bat-broom-startup-", delete=False)
+        probe.close()
+        os.remove(probe.name)
+        env = dict(os.environ, **{STARTUP_PROBE_VARIABLE: probe.name})
+        launched = time.time()
+        try:
+            process = subprocess.run(command, env=env, stdout=subprocess.DEVNULL,
+                                     stderr=subprocess.PIPE, universal_newlines=True,
+                                     timeout=STARTUP_TIMEOUT)
+            if not os.path.exists(probe.name):
+                lines = process.stderr.strip().splitlines()
+                error = lines[-1] if lines else "no window was shown"
+                break
+            with open(probe.name) as f:
+                runs.append(round(float(f.read()) - launched, 4))
+        except (OSError, subprocess.TimeoutExpired) as e:
+            error = str(e)
+            break
+        finally:
+            if os.path.exists(probe.name):
+                os.remove(probe.name)
+    return {
+        "command": command,
+        "runs": runs,
+        "median_seconds": statistics.median(runs) if runs else None,
+        "error": error,
+    }
+
+
+def run_startup(args):
+    """Measure import times and time to first window"""
+    command = [args.exe] if args.exe else [sys.executable, "-m", "bat_broom"]
+    imports = measure_imports()
+    print(f"import {imports['module']}: {imports['total_us'] / 1000:.1f} ms")
+    for item in imports["slowest"]:
+        print(f"  {item['module']:<30} {item['self_us'] / 1000:7.1f} ms self "
+              f"{item['cumulative_us'] / 1000:7.1f} ms cumulative")
+    window = measure_first_window(command, args.repeat)
+    if window["error"]:
+        print(f"first window: not measured ({window['error']})")
+    else:
+        print(f"first window: {window['median_seconds']:.3f} s median of {len(window['runs'])} runs")
+    return {"imports": imports, "first_window": window}
+
+
+def compare(results, startup, baseline_path):
+    """Print wall time and syscall changes against an earlier results file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        data = json.load(f)
+    baseline = {(item["scenario"], item["operation"]): item for item in data.get("results", [])}
+    print(f"\nCompared with {baseline_path}:")
+    before = data.get("startup")
+    if startup and before:
+        print(f"  import {startup['imports']['module']}: {before['imports']['total_us'] / 1000:.1f} ms"
+              f" -> {startup['imports']['total_us'] / 1000:.1f} ms")
+        if before["first_window"]["median_seconds"] and startup["first_window"]["median_seconds"]:
+            print(f"  first window: {before['first_window']['median_seconds']:.3f} s"
+                  f" -> {startup['first_window']['median_seconds']:.3f} s")
+    for item in results:
+        before = baseline.get((item["scenario"], item["operation"]))
+        if before is None or not before["wall_seconds"]:
+            continue
+        change = (item["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100
+        print(f"  {item['scenario']:<8} {item['operation']:<6} {change:+6.1f}% wall, "
+              f"syscalls {before['syscalls']['total']} -> {item['syscalls']['total']}")
+
+
+def build_parser():
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="bat_broom.bench",
+        description="Measure Bat Broom scans and cleanups on synthetic temp trees",
+    )
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--operation", action="append", choices=OPERATIONS,
+                        help="operation to measure (repeatable, default: scan and clean)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply the size of every tree (default: 1.0)")
+    parser.add_argument("--root", default=None,
+                        help="where trees are generated (default: a temporary folder)")
+    parser.add_argument("--output", "-o", default=None,
+                        help="JSON results file (default: bench-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, metavar="RESULTS",
+                        help="print the change against an earlier results file")
+    parser.add_argument("--startup", action="store_true",
+                        help="measure GUI startup instead of the cleanup scenarios")
+    parser.add_argument("--exe", default=None,
+                        help="with --startup, measure this frozen build instead of python -m bat_broom")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="with --startup, number of launches to measure (default: 5)")
+    parser.add_argument("--child", nargs=2, metavar=("OPERATION", "TREE"),
+                        help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    """Benchmark entry point"""
+    args = build_parser().parse_args(argv)
+    if args.child:
+        print(json.dumps(run_child(*args.child)))
+        return 0
+
+    started = datetime.datetime.now()
+    results = []
+    startup = None
+    if args.startup:
+        startup = run_startup(args)
+    else:
+        run_scenarios(args, results)
+
+    output = args.output or f"bench-{started.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": __version__,
+            "started": started.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+            "results": results,
+            "startup": startup,
+        }, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        compare(results, startup, args.compare)
+    return 0
+
+
+def run_scenarios(args, results):
+    """Run the selected scenarios, appending their measurements to results"""
+    scenarios = args.scenario or sorted(SCENARIOS)
+    operations = args.operation or list(OPERATIONS)
+    root = args.root or tempfile.mkdtemp(prefix="bat-broom-bench-")
+    try:
+        for scenario in scenarios:
+            for operation in operations:
+                item = run_scenario(scenario, operation, root, args.scale)
+                results.append(item)
+                print(f"{scenario:<8} {operation:<6} {item['wall_seconds']:8.3f} s  "
+                      f"{item['entries']:>9} entries  {item['files_per_second'] or 0:>10.0f} files/s  "
+                      f"{item['syscalls']['total']:>9} syscalls  {item['peak_rss_kb']} KB peak",
+                      flush=True)
+    finally:
+        if args.root is None:
+            remove_tree(root)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Cleanup catalog for Bat Broom
+Defines the cleanup sections and how their paths are expanded
+"""
+
+import os
+import re
+
+# Matches %VARIABLE% references in catalog paths
+_VARIABLE_PATTERN = re.compile(r"%([^%\\/]+)%")
+
+# Fallbacks for variables that may be missing from the environment
+DEFAULT_VARIABLES = {
+    "SystemRoot": "C:\\Windows",
+}
+
+
+def initialize_cleanup_sections():
+    """Initialize the cleanup sections with their paths
+
+    Each entry is ``(path, description)`` or ``(path, description, policy)``
+    where policy is a Policy limiting what the entry may delete.
+    """
+    return {
+        "User Temporary Files": [
+            ("%TEMP%\\*.*", "User Temp Directory"),
+            ("%USERPROFILE%\\AppData\\Local\\Temp\\*.*", "User AppData Local Temp"),
+            ("%USERPROFILE%\\AppData\\Local\\Microsoft\\Windows\\Temporary Internet Files\\*.*", "Internet Temporary Files"),
+            ("%USERPROFILE%\\AppData\\Local\\Microsoft\\Windows\\INetCache\\*.*", "Internet Cache"),
+            ("%USERPROFILE%\\AppData\\Local\\Microsoft\\Windows\\INetCookies\\*.*", "Internet Cookies"),
+            ("%USERPROFILE%\\AppData\\Local\\Microsoft\\Windows\\WebCache\\*.*", "Web Cache"),
+        ],
+        "System Temporary Files": [
+            ("%SystemRoot%\\Temp\\*.*", "System Temp Directory"),
+            ("%SystemRoot%\\Prefetch\\*.*", "Prefetch Files"),
+            ("%SystemRoot%\\SoftwareDistribution\\Download\\*.*", "Windows Update Downloads"),
+        ],
+        "Recent Files and History": [
+            ("%USERPROFILE%\\AppData\\Roaming\\Microsoft\\Windows\\Recent\\*.*", "Recent Documents"),
+            ("%USERPROFILE%\\Recent\\*.*", "Recent Files (Legacy)"),
+        ],
+        "Crash Dumps and Logs": [
+            ("%USERPROFILE%\\AppData\\Local\\CrashDumps\\*.*", "User Crash Dumps"),
+            ("%SystemRoot%\\Logs\\*.*", "System Logs"),
+            ("%SystemRoot%\\Debug\\*.*", "Debug Files"),
+        ],
+        "Application Specific": [
+            ("%USERPROFILE%\\AppData\\Local\\Packages\\*\\TempState\\*.*", "UWP App Temp State"),
+            ("%USERPROFILE%\\AppData\\Local\\Microsoft\\Windows\\Explorer\\*.*", "Explorer Thumbnails"),
+            ("%USERPROFILE%\\AppData\\Local\\IconCache.db", "Icon Cache"),
+            ("%USERPROFILE%\\AppData\\Local\\Microsoft\\Windows\\Caches\\*.*", "Windows Caches"),
+        ],
+        "Browser Temporary Files": [
+            ("%USERPROFILE%\\AppData\\Local\\Google\\Chrome\\User Data\\Default\\Cache\\*.*", "Chrome Cache"),
+            ("%USERPROFILE%\\AppData\\Local\\Google\\Chrome\\User Data\\Default\\Code Cache\\*.*", "Chrome Code Cache"),
+            ("%USERPROFILE%\\AppData\\Local\\Mozilla\\Firefox\\Profiles\\*\\cache2\\*.*", "Firefox Cache"),
+            ("%USERPROFILE%\\AppData\\Local\\Microsoft\\Edge\\User Data\\Default\\Cache\\*.*", "Edge Cache"),
+        ]
+    }
+
+
+def split_entry(entry):
+    """Return (path, description, policy) for a catalog entry, policy may be None"""
+    if len(entry) == 2:
+        return entry[0], entry[1], None
+    return tuple(entry)
+
+
+def expand_path(path, environ=None):
+    """Expand %VARIABLE% references in a catalog path
+
+    Variables are looked up in ``environ`` (``os.environ`` by default) and
+    unknown variables are left untouched. Catalog paths use Windows
+    separators, which are converted to the native separator so the same
+    catalog can be pointed at plain directories on other platforms.
+    """
+    if environ is None:
+        environ = os.environ
+
+    def replace(match):
+        name = match.group(1)
+        value = environ.get(name)
+        if value is None:
+            value = environ.get(name.upper())
+        if value is None:
+            value = DEFAULT_VARIABLES.get(name)
+        return value if value is not None else match.group(0)
+
+    expanded = _VARIABLE_PATTERN.sub(replace, path)
+    if os.sep != "\\":
+        expanded = expanded.replace("\\", os.sep)
+    return expanded
+
+
+def state_dir(environ=None):
+    """Return the directory where Bat Broom keeps its persistent state
+
+    ``BAT_BROOM_STATE_DIR`` overrides the default of
+    ``%LOCALAPPDATA%\\BatBroom`` on Windows and
+    ``$XDG_STATE_HOME/bat-broom`` (``~/.local/state/bat-broom``) elsewhere.
+    """
+    if environ is None:
+        environ = os.environ
+    if environ.get("BAT_BROOM_STATE_DIR"):
+        return environ["BAT_BROOM_STATE_DIR"]
+    if os.name == "nt":
+        base = environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+        return os.path.join(base, "BatBroom")
+    base = environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state")
+    return os.path.join(base, "bat-broom")
@@ -0,0 +1,732 @@
+"""
+Non-interactive command line interface for Bat Broom
+Usable from schedulers and headless machines; never imports tkinter
+"""
+
+import argparse
+import datetime
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+from .audit import AUDIT_BACKUPS, AUDIT_MAX_BYTES, AuditSink
+from .catalog import initialize_cleanup_sections, expand_path, split_entry
+from .control import RunControl
+from .engine import CleanupEngine, build_targets, format_size, select_targets
+from .metrics import JsonLinesExporter, MetricsCollector, write_prometheus
+from .policy import Policy
+from .retry import RETRY_BUDGET, RetryQueue
+from .roots import image_roots, list_profiles, profile_roots, targets_for_roots
+from .sharding import SHARD_THRESHOLD
+
+# Exit code of a run stopped by Ctrl+C or SIGTERM, as shells report it
+EXIT_CANCELLED = 130
+
+
+class UsageError(Exception):
+    """An option that parsed but cannot be used, reported like an argparse error"""
+
+
+def timestamped(message):
+    """Format a log message the same way the GUI log does"""
+    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+    return f"[{timestamp}] {message}"
+
+
+def make_logger(quiet=False, stream=None):
+    """Return a log callable that prints timestamped messages"""
+    if quiet:
+        return lambda message: None
+    stream = stream or sys.stdout
+
+    def log(message):
+        print(timestamped(message), file=stream, flush=True)
+    return log
+
+
+def add_selection_arguments(parser):
+    """Add the target selection options shared by the subcommands"""
+    parser.add_argument("--section", "-s", action="append", default=[],
+                        help="clean every target of a section (repeatable)")
+    parser.add_argument("--target", "-t", action="append", default=[],
+                        help="clean a single target by description or pattern (repeatable)")
+    parser.add_argument("--all", action="store_true",
+                        help="clean every target in the catalog")
+    parser.add_argument("--profile", action="append", default=[], metavar="DIR",
+                        help="apply the targets to the user profile in DIR (repeatable)")
+    parser.add_argument("--profiles-dir", action="append", default=[], metavar="DIR",
+                        help="apply the targets to every user profile in DIR, e.g. C:\\Users (repeatable)")
+    parser.add_argument("--image", action="append", default=[], metavar="DIR",
+                        help="apply the targets to the offline Windows image mounted at DIR (repeatable)")
+
+
+def add_run_arguments(parser):
+    """Add the execution and output options shared by the subcommands"""
+    parser.add_argument("--workers", "-j", type=positive_int, default=1,
+                        help="process up to N targets concurrently (default: 1)")
+    parser.add_argument("--per-volume", type=positive_int, default=None,
+                        help="limit concurrent targets on the same volume")
+    parser.add_argument("--processes", "-P", type=positive_int, default=1,
+                        help="delete very large targets on N processes (default: 1)")
+    parser.add_argument("--shard-threshold", type=positive_int, default=SHARD_THRESHOLD,
+                        metavar="ENTRIES",
+                        help=f"only use processes for folders of at least ENTRIES entries "
+                             f"(default: {SHARD_THRESHOLD})")
+    parser.add_argument("--full", action="store_true",
+                        help="list every folder again instead of skipping unchanged empty ones")
+    parser.add_argument("--no-index", action="store_true",
+                        help="neither read nor update the persistent scan index")
+    parser.add_argument("--no-history", action="store_true",
+                        help="do not record the run in the run history")
+    add_policy_arguments(parser)
+    add_metrics_arguments(parser)
+    parser.add_argument("--json", action="store_true",
+                        help="print the final report as JSON")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                        help="do not print log messages")
+
+
+def add_policy_arguments(parser):
+    """Add the age, size and name filters"""
+    parser.add_argument("--older-than", type=non_negative_float, default=0, metavar="DAYS",
+                        help="only delete files not modified for DAYS days")
+    parser.add_argument("--larger-than", type=non_negative_float, default=0, metavar="MB",
+                        help="only delete files of at least MB megabytes")
+    parser.add_argument("--exclude", "-x", action="append", default=[], metavar="PATTERN",
+                        help="never delete entries whose name matches PATTERN, e.g. *.lock (repeatable)")
+
+
+def add_metrics_arguments(parser):
+    """Add the metrics export options"""
+    parser.add_argument("--metrics-jsonl", default=None, metavar="FILE",
+                        help="append per-target metrics to FILE as JSON lines")
+    parser.add_argument("--metrics-prom", default=None, metavar="FILE",
+                        help="write per-target metrics to FILE in the Prometheus text format")
+
+
+def add_audit_arguments(parser):
+    """Add the audit trail options"""
+    parser.add_argument("--audit", default=None, metavar="FILE",
+                        help="record every deleted or failed entry in FILE as JSON lines")
+    parser.add_argument("--audit-max-mb", type=positive_int, default=AUDIT_MAX_BYTES // (1024 * 1024),
+                        metavar="MB", help="rotate the audit file at MB megabytes (default: %(default)s)")
+    parser.add_argument("--audit-backups", type=int, default=AUDIT_BACKUPS, metavar="N",
+                        help="rotated audit files to keep (default: %(default)s)")
+    parser.add_argument("--audit-gzip", action="store_true",
+                        help="gzip-compress the audit file")
+
+
+def add_archive_arguments(parser):
+    """Add the archive-before-delete options"""
+    parser.add_argument("--archive", nargs="?", const="", default=None, metavar="DIR",
+                        help="copy every deleted file into a tar.gz in DIR first "
+                             "(default DIR: 'archives' in the state directory)")
+    parser.add_argument("--archive-max-mb", type=positive_int, default=None, metavar="MB",
+                        help="keep the files that no longer fit in an archive of MB megabytes "
+                             "(default: 1024)")
+    parser.add_argument("--archive-keep", type=positive_int, default=None, metavar="N",
+                        help="archives to keep, oldest deleted first (default: 5)")
+
+
+def add_throttle_arguments(parser):
+    """Add the I/O throttle options"""
+    parser.add_argument("--max-ops", type=non_negative_float, default=0, metavar="N",
+                        help="delete at most N files and folders per second")
+    parser.add_argument("--max-mbps", type=non_negative_float, default=0, metavar="MB",
+                        help="delete at most MB megabytes of files per second")
+    parser.add_argument("--max-latency", type=non_negative_float, default=0, metavar="MS",
+                        help="slow down while deletions take more than MS milliseconds each")
+
+
+def positive_int(value):
+    """argparse type for integers greater than zero"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
+
+
+def non_negative_float(value):
+    """argparse type for numbers greater than or equal to zero"""
+    number = float(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative number, got {value}")
+    return number
+
+
+def make_policy(args):
+    """Build the Policy given on the command line, or None without limits"""
+    if not (args.older_than or args.larger_than or args.exclude):
+        return None
+    return Policy(min_age_days=args.older_than, min_size=int(args.larger_than * 1024 * 1024),
+                  exclude=args.exclude)
+
+
+def selected_targets(args):
+    """Return the targets named by --all, --section and --target"""
+    if args.all:
+        return build_targets()
+    try:
+        return select_targets(args.section, args.target)
+    except ValueError as e:
+        raise UsageError(str(e)) from None
+
+
+def resolve_selection(args):
+    """Turn the selection options into a list of targets, repeated for every root"""
+    targets = selected_targets(args)
+    roots = resolve_roots(args)
+    return targets_for_roots(targets, roots) if roots else targets
+
+
+def resolve_roots(args):
+    """Return the Roots given with --profile, --profiles-dir and --image"""
+    roots = profile_roots(args.profile)
+    for users_dir in args.profiles_dir:
+        try:
+            roots.extend(profile_roots(list_profiles(users_dir)))
+        except OSError as e:
+            raise UsageError(f"cannot list profiles in {users_dir}: {e.strerror}")
+    for image_root in args.image:
+        if not os.path.isdir(image_root):
+            raise UsageError(f"image root not found: {image_root}")
+        roots.extend(image_roots(image_root))
+    return roots
+
+
+def build_parser():
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="bat_broom",
+        description="Bat Broom - Windows Temporary Files Cleanup (non-interactive mode)",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    list_parser = subparsers.add_parser("list", help="list the cleanup catalog")
+    list_parser.set_defaults(func=command_list)
+
+    scan_parser = subparsers.add_parser(
+        "scan", help="measure the selected targets without deleting anything")
+    add_selection_arguments(scan_parser)
+    add_run_arguments(scan_parser)
+    scan_parser.set_defaults(func=command_scan)
+
+    clean_parser = subparsers.add_parser("clean", help="clean the selected targets")
+    add_selection_arguments(clean_parser)
+    add_run_arguments(clean_parser)
+    clean_parser.add_argument("--scan-first", action="store_true",
+                              help="report the reclaimable space before cleaning")
+    clean_parser.add_argument("--order", choices=("catalog", "largest"), default="catalog",
+                              help="clean in catalog order, or largest expected yield first "
+                                   "according to the scan or the run history")
+    clean_parser.add_argument("--time-budget", type=non_negative_float, default=None,
+                              metavar="SECONDS",
+                              help="reclaim as much as possible in SECONDS: clean the targets "
+                                   "with the best yield per second first and stop when time is up")
+    add_audit_arguments(clean_parser)
+    add_archive_arguments(clean_parser)
+    clean_parser.add_argument("--retry-budget", type=non_negative_float, default=RETRY_BUDGET,
+                              metavar="SECONDS",
+                              help="retry locked entries after the main pass for up to SECONDS, "
+                                   "0 to disable (default: %(default)s)")
+    clean_parser.add_argument("--delete-on-reboot", action="store_true",
+                              help="schedule entries still locked after the retries for deletion "
+                                   "at the next restart (Windows, administrator only)")
+    clean_parser.add_argument("--stage", action="store_true",
+                              help="move folders to a staging folder at once and delete them "
+                                   "in a background process")
+    add_throttle_arguments(clean_parser)
+    clean_parser.add_argument("--low-priority", action="store_true",
+                              help="run at background CPU and I/O priority")
+    clean_parser.set_defaults(func=command_clean)
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="keep the selected targets within a policy continuously")
+    add_selection_arguments(watch_parser)
+    add_policy_arguments(watch_parser)
+    watch_parser.add_argument("--max-size", type=non_negative_float, default=0, metavar="MB",
+                              help="delete the oldest files of a target while it holds more than MB megabytes")
+    watch_parser.add_argument("--interval", type=non_negative_float, default=None,
+                              metavar="SECONDS",
+                              help="seconds between evictions (default: 30)")
+    watch_parser.add_argument("--poll", action="store_true",
+                              help="poll folder timestamps instead of using change notifications")
+    add_audit_arguments(watch_parser)
+    add_metrics_arguments(watch_parser)
+    watch_parser.add_argument("--quiet", "-q", action="store_true",
+                              help="do not print log messages")
+    watch_parser.set_defaults(func=command_watch)
+
+    purge_parser = subparsers.add_parser(
+        "purge", help="delete the folders staged by earlier 'clean --stage' runs")
+    purge_parser.add_argument("--json", action="store_true",
+                              help="print the purge counts as JSON")
+    purge_parser.add_argument("--quiet", "-q", action="store_true",
+                              help="do not print log messages")
+    purge_parser.set_defaults(func=command_purge)
+
+    history_parser = subparsers.add_parser(
+        "history", help="show how fast each target refills, from the run history")
+    history_parser.add_argument("--limit", "-n", type=positive_int, default=None,
+                                help="only show the N fastest-growing targets")
+    history_parser.add_argument("--json", action="store_true",
+                                help="print the growth figures as JSON")
+    history_parser.set_defaults(func=command_history)
+
+    agent_parser = subparsers.add_parser(
+        "agent", help="serve scans and cleanups to a fleet coordinator over HTTP")
+    agent_parser.add_argument("--host", default="127.0.0.1",
+                              help="address to listen on (default: %(default)s)")
+    agent_parser.add_argument("--port", type=int, default=None,
+                              help="port to listen on (default: 8765)")
+    agent_parser.add_argument("--token", default=None,
+                              help="token callers must present (default: $BAT_BROOM_AGENT_TOKEN, "
+                                   "or a new random token)")
+    agent_parser.add_argument("--no-index", action="store_true",
+                              help="neither read nor update the persistent scan index")
+    agent_parser.add_argument("--low-priority", action="store_true",
+                              help="run the agent at background CPU and I/O priority")
+    agent_parser.add_argument("--quiet", "-q", action="store_true",
+                              help="do not print log messages")
+    agent_parser.set_defaults(func=command_agent, full=False)
+
+    fleet_parser = subparsers.add_parser(
+        "fleet", help="scan or clean many machines through their agents")
+    fleet_parser.add_argument("kind", choices=("scan", "clean"),
+                              help="job to run on every agent")
+    fleet_parser.add_argument("--agent", "-a", action="append", default=[], metavar="HOST:PORT",
+                              help="agent to drive (repeatable)")
+    fleet_parser.add_argument("--agents-file", default=None, metavar="FILE",
+                              help="read more agents from FILE, one HOST:PORT per line")
+    fleet_parser.add_argument("--token", default=None,
+                              help="token of the agents (default: $BAT_BROOM_AGENT_TOKEN)")
+    fleet_parser.add_argument("--concurrency", "-c", type=positive_int, default=None, metavar="N",
+                              help="run on up to N agents at a time (default: 8)")
+    add_selection_arguments(fleet_parser)
+    add_policy_arguments(fleet_parser)
+    fleet_parser.add_argument("--workers", "-j", type=positive_int, default=1,
+                              help="process up to N targets concurrently on each agent (default: 1)")
+    fleet_parser.add_argument("--per-volume", type=positive_int, default=None,
+                              help="limit concurrent targets on the same volume")
+    fleet_parser.add_argument("--scan-first", action="store_true",
+                              help="report the reclaimable space before cleaning")
+    fleet_parser.add_argument("--retry-budget", type=non_negative_float, default=RETRY_BUDGET,
+                              metavar="SECONDS",
+                              help="retry locked entries for up to SECONDS on each agent "
+                                   "(default: %(default)s)")
+    add_throttle_arguments(fleet_parser)
+    fleet_parser.add_argument("--json", action="store_true",
+                              help="print the aggregated report as JSON")
+    fleet_parser.add_argument("--quiet", "-q", action="store_true",
+                              help="do not print log messages")
+    fleet_parser.set_defaults(func=command_fleet)
+
+    return parser
+
+
+def command_list(args):
+    """Print every section and target with its expanded path"""
+    for section_name, paths in initialize_cleanup_sections().items():
+        print(section_name)
+        for entry in paths:
+            path, description, policy = split_entry(entry)
+            limits = f" ({policy.describe()})" if policy is not None else ""
+            print(f"  {description}: {expand_path(path)}{limits}")
+    return 0
+
+
+def install_cancel_handler(control):
+    """Stop the run gracefully on the first Ctrl+C or SIGTERM
+
+    The run finishes the entry it is working on and still prints its
+    partial summary. A second Ctrl+C interrupts immediately.
+    """
+    def handler(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        control.cancel()
+
+    signal.signal(signal.SIGINT, handler)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handler)
+
+
+def open_index(args, log):
+    """Open the persistent scan index unless disabled, warning on failure"""
+    if args.no_index:
+        return None
+    # Imported here: sqlite3 is only needed once the index is used
+    from .index import ScanIndex
+    try:
+        return ScanIndex(full=args.full)
+    except Exception as e:
+        log(f"⚠️ Scan index unavailable, listing everything: {str(e)}")
+        return None
+
+
+def open_history(args, log):
+    """Open the run history unless disabled, warning on failure"""
+    if getattr(args, "no_history", False):
+        return None
+    # Imported here: like the index, only needed once the history is used
+    from .history import RunHistory
+    try:
+        return RunHistory()
+    except Exception as e:
+        log(f"⚠️ Run history unavailable, this run is not recorded: {str(e)}")
+        return None
+
+
+def open_audit(args):
+    """Create the AuditSink requested on the command line, or None"""
+    if not getattr(args, "audit", None):
+        return None
+    return AuditSink(args.audit, max_bytes=args.audit_max_mb * 1024 * 1024,
+                     backups=args.audit_backups, compress=args.audit_gzip)
+
+
+def open_archive(args):
+    """Create the Archive requested on the command line, or None"""
+    if getattr(args, "archive", None) is None:
+        return None
+    # Imported here: only runs that archive need it
+    from .archive import ARCHIVE_KEEP, ARCHIVE_MAX_BYTES, Archive
+    max_bytes = (ARCHIVE_MAX_BYTES if args.archive_max_mb is None
+                 else args.archive_max_mb * 1024 * 1024)
+    return Archive(args.archive or None, max_bytes=max_bytes,
+                   keep=ARCHIVE_KEEP if args.archive_keep is None else args.archive_keep)
+
+
+def open_throttle(args):
+    """Create the IoThrottle requested on the command line, or None"""
+    ops = getattr(args, "max_ops", 0)
+    mbps = getattr(args, "max_mbps", 0)
+    latency = getattr(args, "max_latency", 0)
+    if not (ops or mbps or latency):
+        return None
+    # Imported here: only throttled runs need it
+    from .throttle import IoThrottle
+    return IoThrottle(ops_per_second=ops, bytes_per_second=mbps * 1024 * 1024,
+                      max_latency=latency / 1000)
+
+
+def open_stager(args):
+    """Create the Stager requested on the command line, or None"""
+    if not getattr(args, "stage", False):
+        return None
+    # Imported here: only staged runs need it
+    from .staging import Stager
+    return Stager()
+
+
+def open_retry(args):
+    """Create the RetryQueue requested on the command line, or None
+
+    With ``--delete-on-reboot`` and no retries, the queue only collects
+    the failures to schedule.
+    """
+    if not getattr(args, "retry_budget", 0) and not getattr(args, "delete_on_reboot", False):
+        return None
+    return RetryQueue(budget=args.retry_budget)
+
+
+def make_engine(args, collector=None):
+    """Create a CleanupEngine configured from the parsed arguments
+
+    ``collector`` is a MetricsCollector that receives every target's metrics.
+    """
+    control = RunControl()
+    install_cancel_handler(control)
+    log = make_logger(args.quiet or args.json)
+    engine = CleanupEngine(log=log, workers=args.workers, per_volume=args.per_volume,
+                           control=control, index=open_index(args, log),
+                           policy=make_policy(args), processes=args.processes,
+                           shard_threshold=args.shard_threshold, audit=open_audit(args),
+                           stager=open_stager(args),
+                           retry=open_retry(args),
+                           delete_on_reboot=getattr(args, "delete_on_reboot", False),
+                           archive=open_archive(args), history=open_history(args, log),
+                           order=getattr(args, "order", None),
+                           time_budget=getattr(args, "time_budget", None),
+                           throttle=open_throttle(args))
+    if args.metrics_jsonl:
+        engine.add_metrics_hook(JsonLinesExporter(args.metrics_jsonl))
+    if collector is not None:
+        engine.add_metrics_hook(collector)
+    return engine
+
+
+def export_metrics(args, collector):
+    """Write the Prometheus text file once the run is over"""
+    if args.metrics_prom:
+        try:
+            write_prometheus(args.metrics_prom, collector.metrics)
+        except OSError as e:
+            print(f"Could not write metrics: {str(e)}", file=sys.stderr)
+
+
+def command_scan(args):
+    """Measure the selected targets and report the reclaimable space"""
+    targets = resolve_selection(args)
+    if not targets:
+        print("No targets selected. Use --section, --target or --all.", file=sys.stderr)
+        return 2
+
+    collector = MetricsCollector() if args.metrics_prom else None
+    engine = make_engine(args, collector)
+    report = engine.scan(targets)
+    export_metrics(args, collector)
+
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    return EXIT_CANCELLED if engine.control.cancelled else 0
+
+
+def command_clean(args):
+    """Clean the selected targets and report the outcome"""
+    targets = resolve_selection(args)
+    if not targets:
+        print("No targets selected. Use --section, --target or --all.", file=sys.stderr)
+        return 2
+
+    if args.low_priority:
+        # Imported here: only needed on request
+        from .staging import lower_priority
+        lower_priority()
+    collector = MetricsCollector() if args.metrics_prom else None
+    engine = make_engine(args, collector)
+    scans = engine.scan(targets) if args.scan_first else None
+    try:
+        report = engine.run(targets, scans)
+    finally:
+        if engine.audit is not None:
+            engine.audit.close()
+        if engine.archive is not None:
+            engine.archive.close()
+    export_metrics(args, collector)
+
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    if report.cancelled and not report.budget_reached:
+        return EXIT_CANCELLED
+    return 0 if report.successful == report.total else 1
+
+
+def command_watch(args):
+    """Evict files from the selected targets until stopped"""
+    # Imported here: the watcher is only needed by this command
+    from .watch import WATCH_INTERVAL, WatchDaemon
+
+    targets = resolve_selection(args)
+    if not targets:
+        print("No targets selected. Use --section, --target or --all.", file=sys.stderr)
+        return 2
+    policy = make_policy(args)
+    if not args.max_size and (policy is None or not policy.min_age_days):
+        print("Watch mode needs --older-than or --max-size, otherwise every new file "
+              "would be deleted at once.", file=sys.stderr)
+        return 2
+
+    control = RunControl()
+    install_cancel_handler(control)
+    audit = open_audit(args)
+    engine = CleanupEngine(log=make_logger(args.quiet), control=control, policy=policy,
+                           audit=audit)
+    if args.metrics_jsonl:
+        engine.add_metrics_hook(JsonLinesExporter(args.metrics_jsonl))
+    latest = {}
+
+    def export(results):
+        # Keep the Prometheus file current after every cycle that evicted something
+        if args.metrics_prom and results:
+            write_prometheus(args.metrics_prom, list(latest.values()))
+    engine.add_metrics_hook(lambda metrics: latest.__setitem__((metrics.root, metrics.target), metrics))
+
+    daemon = WatchDaemon(engine, targets,
+                         interval=WATCH_INTERVAL if args.interval is None else args.interval,
+                         max_bytes=int(args.max_size * 1024 * 1024) or None, polling=args.poll)
+    try:
+        daemon.run(on_cycle=export)
+    finally:
+        if audit is not None:
+            audit.close()
+    return 0
+
+
+def command_purge(args):
+    """Delete the staged folders at background priority"""
+    # Imported here: only the purge command needs it
+    from .staging import lower_priority, purge
+
+    lower_priority()
+    log = make_logger(args.quiet or args.json)
+    log("🧺 Purging staged folders...")
+    stats = purge(log=log)
+    if stats is None:
+        return 0
+    log(f"🧺 Purge completed ({stats.files_deleted} files, {stats.dirs_deleted} folders"
+        + (f", {stats.failed} could not be deleted" if stats.failed else "") + ")")
+    if args.json:
+        print(json.dumps(stats.to_dict(), indent=2))
+    return 0 if not stats.failed else 1
+
+
+def command_history(args):
+    """Print the targets of the run history, fastest-growing first"""
+    # Imported here: sqlite3 is only needed once the history is used
+    from .history import RunHistory
+
+    history = RunHistory()
+    try:
+        growth = history.growth()
+    finally:
+        history.close()
+    if args.limit:
+        growth = growth[:args.limit]
+    if args.json:
+        print(json.dumps([item.to_dict() for item in growth], indent=2))
+        return 0
+    if not growth:
+        print("No runs recorded yet.")
+        return 0
+
+    now = time.time()
+    print(f"{'Target':<44} {'Growth/day':>11} {'Expected':>10} {'Last freed':>11} {'Took':>7}")
+    for item in growth:
+        name = f"[{item.root}] {item.target}" if item.root else item.target
+        estimate = item.estimate(now)
+        print(f"{name[:44]:<44} "
+              f"{format_size(item.bytes_per_day) if item.bytes_per_day is not None else '-':>11} "
+              f"{format_size(estimate) if estimate is not None else '-':>10} "
+              f"{format_size(item.last_bytes) if item.last_bytes is not None else '-':>11} "
+              f"{f'{item.last_seconds:.1f}s' if item.last_seconds is not None else '-':>7}")
+    return 0
+
+
+def command_agent(args):
+    """Serve jobs to coordinators until interrupted"""
+    # Imported here: the HTTP server slows down the start of every other command
+    from .agent import DEFAULT_PORT, TOKEN_ENV, Agent, create_server
+
+    log = make_logger(args.quiet)
+    token = args.token or os.environ.get(TOKEN_ENV)
+    if not token:
+        # Imported here: hashlib makes it slow to load
+        import secrets
+        token = secrets.token_urlsafe(24)
+        print(f"Agent token: {token}", flush=True)
+    if args.low_priority:
+        from .staging import lower_priority
+        lower_priority()
+    agent = Agent(token, log=log, index=open_index(args, log))
+    try:
+        server = create_server(agent, args.host,
+                               DEFAULT_PORT if args.port is None else args.port)
+    except OSError as e:
+        print(f"Cannot listen on {args.host}: {e.strerror}", file=sys.stderr)
+        return 1
+    host, port = server.server_address[:2]
+    log(f"📡 Agent listening on {host}:{port}")
+    if host not in ("127.0.0.1", "::1", "localhost"):
+        log("⚠️ The agent is reachable from other machines; traffic is not encrypted")
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        agent.cancel()
+    finally:
+        server.server_close()
+    log("📡 Agent stopped")
+    return 0
+
+
+def read_agents(args):
+    """Return the agent addresses given with --agent and --agents-file"""
+    agents = list(args.agent)
+    if args.agents_file:
+        try:
+            with open(args.agents_file, encoding="utf-8") as f:
+                lines = [line.split("#", 1)[0].strip() for line in f]
+        except OSError as e:
+            raise UsageError(f"cannot read {args.agents_file}: {e.strerror}")
+        agents.extend(line for line in lines if line)
+    return agents
+
+
+def command_fleet(args):
+    """Run a scan or a cleanup on every agent and report the fleet's totals"""
+    # Imported here: the HTTP client slows down the start of every other command
+    from .agent import TOKEN_ENV
+    from .coordinator import DEFAULT_CONCURRENCY, Coordinator
+
+    agents = read_agents(args)
+    if not agents:
+        print("No agents given. Use --agent or --agents-file.", file=sys.stderr)
+        return 2
+    if not (args.all or args.section or args.target):
+        print("No targets selected. Use --section, --target or --all.", file=sys.stderr)
+        return 2
+    # Reject unknown names here rather than once per agent
+    selected_targets(args)
+    token = args.token or os.environ.get(TOKEN_ENV)
+    if not token:
+        print(f"No token given. Use --token or set {TOKEN_ENV}.", file=sys.stderr)
+        return 2
+
+    options = {
+        "all": args.all, "sections": args.section, "targets": args.target,
+        "profiles": args.profile, "profiles_dir": args.profiles_dir, "images": args.image,
+        "older_than": args.older_than, "larger_than": args.larger_than, "exclude": args.exclude,
+        "workers": args.workers, "per_volume": args.per_volume,
+    }
+    if args.kind == "clean":
+        options.update(scan_first=args.scan_first, retry_budget=args.retry_budget,
+                       max_ops=args.max_ops, max_mbps=args.max_mbps,
+                       max_latency=args.max_latency)
+
+    log = make_logger(args.quiet or args.json)
+    coordinator = Coordinator(agents, token, concurrency=args.concurrency or DEFAULT_CONCURRENCY,
+                              log=log)
+
+    def handler(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        # Cancelling talks to the agents; keep it out of the signal handler
+        threading.Thread(target=coordinator.cancel, daemon=True).start()
+
+    signal.signal(signal.SIGINT, handler)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handler)
+
+    log(f"📡 Running {args.kind} on {len(agents)} agent(s)...")
+    try:
+        report = coordinator.run(args.kind, options)
+    finally:
+        coordinator.close()
+    totals = report.totals()
+    if args.kind == "scan":
+        summary = f"{format_size(totals['bytes'])} in {totals['files']} files"
+    else:
+        summary = f"{format_size(totals['bytes_freed'])} freed, {totals['deleted']} items deleted"
+    log(f"📡 Fleet {args.kind} completed on {report.ok}/{len(agents)} agent(s): {summary}")
+
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    if report.cancelled:
+        return EXIT_CANCELLED
+    if report.ok < len(agents):
+        return 1
+    return 0 if args.kind == "scan" or totals["successful"] == totals["total"] else 1
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except UsageError as e:
+        parser.error(str(e))
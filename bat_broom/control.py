@@ -0,0 +1,167 @@
+"""
+Run control for Bat Broom
+Cooperative cancel/pause checkpoints and progress tracking for long runs
+"""
+
+import threading
+import time
+from collections import deque
+
+# Seconds of history used to compute throughput for the ETA
+RATE_WINDOW = 5.0
+
+
+class CleanupCancelled(Exception):
+    """Raised at a checkpoint once the run has been cancelled"""
+
+
+class ProgressSnapshot:
+    """Point-in-time view of a run's progress"""
+
+    def __init__(self, items, bytes_done, total_items, total_bytes, targets_done,
+                 total_targets, items_per_second, bytes_per_second, paused):
+        self.items = items
+        self.bytes = bytes_done
+        self.total_items = total_items
+        self.total_bytes = total_bytes
+        self.targets_done = targets_done
+        self.total_targets = total_targets
+        self.items_per_second = items_per_second
+        self.bytes_per_second = bytes_per_second
+        self.paused = paused
+
+    @property
+    def fraction(self):
+        """Completed fraction between 0 and 1
+
+        Based on item counts when the totals are known from a scan,
+        otherwise on the number of finished targets.
+        """
+        if self.total_items:
+            return min(1.0, self.items / self.total_items)
+        if self.total_targets:
+            return min(1.0, self.targets_done / self.total_targets)
+        return 0.0
+
+    @property
+    def eta(self):
+        """Estimated seconds remaining, or None if it cannot be estimated"""
+        if self.total_items and self.items_per_second > 0:
+            return max(0.0, (self.total_items - self.items) / self.items_per_second)
+        return None
+
+
+def format_eta(seconds):
+    """Format a number of seconds as H:MM:SS or M:SS"""
+    seconds = int(round(seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class RunControl:
+    """Shared state between a running cleanup and whoever controls it
+
+    Walkers call checkpoint() once per processed entry. It counts
+    progress, blocks while the run is paused and raises
+    CleanupCancelled once cancel() has been called. All other methods
+    are safe to call from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self.cancelled = False
+        self.items = 0
+        self.bytes = 0
+        self.total_items = 0
+        self.total_bytes = 0
+        self.targets_done = 0
+        self.total_targets = 0
+        self._started = None
+        self._paused_at = None
+        self._samples = deque()
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def start(self, total_targets, total_items=0, total_bytes=0):
+        """Reset the counters at the beginning of a run"""
+        with self._lock:
+            self.items = 0
+            self.bytes = 0
+            self.targets_done = 0
+            self.total_targets = total_targets
+            self.total_items = total_items
+            self.total_bytes = total_bytes
+            self._started = time.monotonic()
+            self._samples.clear()
+
+    def cancel(self):
+        """Ask the run to stop at its next checkpoint"""
+        self.cancelled = True
+        self._resumed.set()  # Wake up a paused run so it can stop
+
+    def pause(self):
+        """Hold the run at its next checkpoint until resume() is called"""
+        with self._lock:
+            if self.cancelled or self.paused:
+                return
+            self._paused_at = time.monotonic()
+            self._resumed.clear()
+
+    def resume(self):
+        """Continue a paused run"""
+        with self._lock:
+            if self._paused_at is not None:
+                # Move the rate samples forward by the pause, so the ETA
+                # is based on the time spent working
+                now = time.monotonic()
+                paused = now - self._paused_at
+                self._samples = deque((min(sampled + paused, now), items, nbytes)
+                                      for sampled, items, nbytes in self._samples)
+                self._paused_at = None
+            self._resumed.set()
+
+    def checkpoint(self, items=1, nbytes=0):
+        """Count processed entries, wait while paused and stop if cancelled"""
+        # Concurrent targets and merged shards count into the same totals
+        with self._lock:
+            self.items += items
+            self.bytes += nbytes
+        if not self._resumed.is_set():
+            self._resumed.wait()
+        if self.cancelled:
+            raise CleanupCancelled()
+
+    def target_done(self):
+        """Count a finished target"""
+        with self._lock:
+            self.targets_done += 1
+
+    def snapshot(self):
+        """Return a ProgressSnapshot with throughput over the last few seconds"""
+        now = time.monotonic()
+        with self._lock:
+            items, nbytes = self.items, self.bytes
+            samples = self._samples
+            if self.paused:
+                # Paused time must not drag the rate down
+                samples.clear()
+            samples.append((now, items, nbytes))
+            while len(samples) > 2 and now - samples[0][0] > RATE_WINDOW:
+                samples.popleft()
+            first_time, first_items, first_bytes = samples[0]
+            elapsed = now - first_time
+            if elapsed > 0:
+                items_rate = (items - first_items) / elapsed
+                bytes_rate = (nbytes - first_bytes) / elapsed
+            else:
+                items_rate = bytes_rate = 0.0
+            return ProgressSnapshot(items, nbytes, self.total_items, self.total_bytes,
+                                    self.targets_done, self.total_targets,
+                                    items_rate, bytes_rate, self.paused)
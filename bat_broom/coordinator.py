@@ -0,0 +1,244 @@
+"""
+Fleet coordinator for Bat Broom
+Drives scans and cleanups on many agents at once and aggregates their reports
+"""
+
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .agent import DEFAULT_PORT
+
+DEFAULT_CONCURRENCY = 8
+
+# Seconds without any data from an agent before it is given up on; agents
+# send a progress event every second while a job runs
+AGENT_TIMEOUT = 60
+
+# Report counts added up across agents, per kind of job
+SCAN_TOTALS = ("files", "dirs", "bytes")
+CLEAN_TOTALS = ("total", "successful", "deleted", "failed", "bytes_freed", "recovered")
+
+
+class AgentError(Exception):
+    """An agent refused a request or could not be reached"""
+
+
+def parse_address(address):
+    """Split "host:port" (the port defaults to DEFAULT_PORT) into a (host, port) pair"""
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        return address, DEFAULT_PORT
+    return host.strip("[]"), int(port)
+
+
+class AgentClient:
+    """Connection to one agent
+
+    Requests reuse a single keep-alive connection; one that the agent
+    closed in the meantime is opened again transparently. Not safe to
+    share between threads.
+    """
+
+    def __init__(self, address, token, timeout=AGENT_TIMEOUT):
+        self.address = address
+        self.host, self.port = parse_address(address)
+        self.token = token
+        self.timeout = timeout
+        self._connection = None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def request(self, method, path, payload=None):
+        """Send a request and return the HTTPResponse, whose body must be read"""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Authorization": f"Bearer {self.token}"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            reused = self._connection is not None
+            if not reused:
+                self._connection = http.client.HTTPConnection(self.host, self.port,
+                                                              timeout=self.timeout)
+            try:
+                self._connection.request(method, path, body=body, headers=headers)
+                return self._connection.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                self.close()
+                # Only a kept-alive connection may have gone stale; retry it once
+                if not reused or attempt:
+                    raise AgentError(f"{self.address}: {str(e)}") from e
+
+    def call(self, method, path, payload=None):
+        """Send a request and return its decoded JSON response"""
+        response = self.request(method, path, payload)
+        try:
+            data = json.loads(response.read() or b"{}")
+        except (http.client.HTTPException, OSError, ValueError) as e:
+            self.close()
+            raise AgentError(f"{self.address}: {str(e)}") from e
+        if response.status >= 400:
+            raise AgentError(f"{self.address}: {data.get('error', response.reason)}")
+        return data
+
+    def events(self, job_id, since=0):
+        """Yield the events of a job as the agent streams them, until the job is over"""
+        response = self.request("GET", f"/events?job={job_id}&since={since}")
+        if response.status >= 400:
+            data = json.loads(response.read() or b"{}")
+            raise AgentError(f"{self.address}: {data.get('error', response.reason)}")
+        try:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        except (http.client.HTTPException, OSError, ValueError) as e:
+            self.close()
+            raise AgentError(f"{self.address}: {str(e)}") from e
+
+
+class AgentOutcome:
+    """What one agent did during a fleet run"""
+
+    def __init__(self, address):
+        self.address = address
+        self.job = None
+        self.state = "pending"
+        self.error = None
+        self.report = None
+
+    @property
+    def ok(self):
+        return self.state == "done"
+
+    def to_dict(self):
+        return {
+            "agent": self.address,
+            "job": self.job,
+            "state": self.state,
+            "error": self.error,
+            "report": self.report,
+        }
+
+
+class FleetReport:
+    """Outcome of one scan or cleanup across every agent"""
+
+    def __init__(self, kind, outcomes):
+        self.kind = kind
+        self.outcomes = outcomes
+
+    @property
+    def ok(self):
+        return sum(1 for outcome in self.outcomes if outcome.ok)
+
+    @property
+    def cancelled(self):
+        return any(outcome.state == "cancelled" for outcome in self.outcomes)
+
+    def totals(self):
+        """Add the counts of every agent's report up"""
+        keys = SCAN_TOTALS if self.kind == "scan" else CLEAN_TOTALS
+        totals = dict.fromkeys(keys, 0)
+        for outcome in self.outcomes:
+            for key in keys:
+                value = (outcome.report or {}).get(key)
+                if isinstance(value, (int, float)):
+                    totals[key] += value
+        return totals
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "agents": len(self.outcomes),
+            "ok": self.ok,
+            "totals": self.totals(),
+            "outcomes": [outcome.to_dict() for outcome in self.outcomes],
+        }
+
+
+class Coordinator:
+    """Runs the same job on a fleet of agents
+
+    At most ``concurrency`` agents run at a time; each one keeps its own
+    connection, reused from one job to the next. Agent log lines are
+    passed to ``log`` prefixed with the agent's address.
+    """
+
+    def __init__(self, addresses, token, concurrency=DEFAULT_CONCURRENCY, log=None,
+                 timeout=AGENT_TIMEOUT):
+        self.clients = [AgentClient(address, token, timeout) for address in addresses]
+        self.token = token
+        self.concurrency = concurrency
+        self.log = log or (lambda message: None)
+        self.cancelled = False
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+    def run(self, kind, options):
+        """Run a "scan" or "clean" job with options on every agent and return a FleetReport"""
+        self.cancelled = False
+        outcomes = [AgentOutcome(client.address) for client in self.clients]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(self.clients)))) as pool:
+            for client, outcome in zip(self.clients, outcomes):
+                pool.submit(self._run_agent, client, outcome, kind, options)
+        return FleetReport(kind, outcomes)
+
+    def _run_agent(self, client, outcome, kind, options):
+        """Run the job on one agent and follow its events to the end"""
+        if self.cancelled:
+            outcome.state = "cancelled"
+            return
+        try:
+            outcome.job = client.call("POST", f"/{kind}", options)["job"]
+            with self._lock:
+                self._running[client.address] = outcome.job
+            if self.cancelled:
+                self._cancel_agent(client.address)
+            outcome.state = "running"
+            for event in client.events(outcome.job):
+                if event["type"] == "log":
+                    # Section headers start with a blank line; keep one line per message
+                    message = event["message"].strip()
+                    if message:
+                        self.log(f"[{client.address}] {message}")
+                elif event["type"] == "done":
+                    outcome.state = event["state"]
+                    outcome.report = event["report"]
+                elif event["type"] == "failed":
+                    outcome.state = "failed"
+                    outcome.error = event["error"]
+            if outcome.state == "running":
+                raise AgentError(f"{client.address}: the event stream ended early")
+        except AgentError as e:
+            outcome.state = "failed"
+            outcome.error = str(e)
+            self.log(f"❌ {str(e)}")
+        finally:
+            with self._lock:
+                self._running.pop(client.address, None)
+
+    def cancel(self):
+        """Cancel the jobs still running; agents not started yet are skipped"""
+        self.cancelled = True
+        with self._lock:
+            running = list(self._running)
+        for address in running:
+            self._cancel_agent(address)
+
+    def _cancel_agent(self, address):
+        # The agent's own connection is busy streaming events
+        client = AgentClient(address, self.token, timeout=10)
+        try:
+            client.call("POST", "/cancel")
+        except AgentError:
+            pass
+        finally:
+            client.close()
@@ -0,0 +1,977 @@
+"""
+Cleanup engine for Bat Broom
+Runs cleanup targets without any GUI dependency and returns structured results
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+
+from .catalog import initialize_cleanup_sections, expand_path, split_entry
+from .control import CleanupCancelled, RunControl
+from .matcher import PatternTrie, coalesce_roots
+from .retry import delete_on_reboot
+from .sharding import SHARD_THRESHOLD, count_entries, delete_contents_sharded
+from .staging import start_purge
+from .metrics import TargetMetrics
+from .walker import DeleteStats, ScanStats, TreeDeleter, TreeScanner
+
+
+def format_size(size):
+    """Format a byte count for display"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            break
+        size /= 1024.0
+    if unit == "B":
+        return f"{int(size)} B"
+    return f"{size:.1f} {unit}"
+
+
+class Target:
+    """A single catalog entry selected for cleanup
+
+    With a Root, the pattern is expanded with the root's variables
+    instead of the engine's.
+    """
+
+    def __init__(self, section, pattern, description, policy=None, root=None):
+        self.section = section
+        self.pattern = pattern
+        self.description = description
+        self.policy = policy
+        self.root = root
+
+    @property
+    def key(self):
+        """Identity of the catalog entry, stable across Target instances"""
+        return (self.root.name if self.root is not None else None, self.section, self.pattern)
+
+    @property
+    def label(self):
+        """Description for logs, prefixed with the root if there is one"""
+        if self.root is None:
+            return self.description
+        return f"[{self.root.name}] {self.description}"
+
+    def for_root(self, root):
+        """Return the same catalog entry applied to another root"""
+        return Target(self.section, self.pattern, self.description, self.policy, root)
+
+    def __repr__(self):
+        root = f", root={self.root.name!r}" if self.root is not None else ""
+        return f"Target({self.section!r}, {self.pattern!r}, {self.description!r}{root})"
+
+
+class ScanResult:
+    """Files, folders and bytes found behind a single target"""
+
+    def __init__(self, target, path):
+        self.target = target
+        self.path = path
+        self.stats = ScanStats()
+        self.policy = None
+        self.plan = None
+        self.covered_by = []
+        self.message = ""
+        self.wall_seconds = 0.0
+
+    @property
+    def files(self):
+        return self.stats.files
+
+    @property
+    def dirs(self):
+        return self.stats.dirs
+
+    @property
+    def bytes(self):
+        return self.stats.bytes
+
+    def to_dict(self):
+        """Return the result as a plain dictionary"""
+        return {
+            "root": self.target.root.name if self.target.root is not None else None,
+            "section": self.target.section,
+            "description": self.target.description,
+            "pattern": self.target.pattern,
+            "path": self.path,
+            **self.stats.to_dict(),
+            "policy": self.policy.to_dict() if self.policy is not None else None,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "covered_by": list(self.covered_by),
+            "message": self.message,
+        }
+
+
+class ScanReport:
+    """Aggregated results of a scan, reusable by the cleanup run"""
+
+    def __init__(self, results=None):
+        self.results = list(results or [])
+
+    def get(self, target):
+        """Return the ScanResult for a target, or None if it was not scanned"""
+        for result in self.results:
+            if result.target.key == target.key:
+                return result
+        return None
+
+    @property
+    def files(self):
+        return sum(result.files for result in self.results)
+
+    @property
+    def dirs(self):
+        return sum(result.dirs for result in self.results)
+
+    @property
+    def bytes(self):
+        return sum(result.bytes for result in self.results)
+
+    def sections(self):
+        """Return ScanStats totals per section, in catalog order"""
+        totals = {}
+        for result in self.results:
+            section = totals.setdefault(result.target.section, ScanStats())
+            section.files += result.files
+            section.dirs += result.dirs
+            section.bytes += result.bytes
+            section.skipped += result.stats.skipped
+            section.errors += result.stats.errors
+            section.errnos.update(result.stats.errnos)
+        return totals
+
+    def roots(self):
+        """Return ScanStats totals per root name, empty without roots"""
+        totals = {}
+        for result in self.results:
+            if result.target.root is None:
+                continue
+            root = totals.setdefault(result.target.root.name, ScanStats())
+            root.files += result.files
+            root.dirs += result.dirs
+            root.bytes += result.bytes
+            root.skipped += result.stats.skipped
+            root.errors += result.stats.errors
+            root.errnos.update(result.stats.errnos)
+        return totals
+
+    def to_dict(self):
+        """Return the report as a plain dictionary"""
+        return {
+            "files": self.files,
+            "dirs": self.dirs,
+            "bytes": self.bytes,
+            "sections": {name: stats.to_dict() for name, stats in self.sections().items()},
+            "roots": {name: stats.to_dict() for name, stats in self.roots().items()},
+            "results": [result.to_dict() for result in self.results],
+        }
+
+
+class TargetResult:
+    """Outcome of cleaning a single target
+
+    ``bytes_measured`` is False when files were deleted without reading
+    their size, so ``bytes_freed`` falls short of the space freed.
+    """
+
+    def __init__(self, target, path):
+        self.target = target
+        self.path = path
+        self.bytes_measured = True
+        self.ok = True
+        self.cancelled = False
+        self.stats = DeleteStats()
+        self.policy = None
+        self.covered_by = []
+        self.message = ""
+        self.wall_seconds = 0.0
+
+    @property
+    def deleted(self):
+        return self.stats.deleted
+
+    @property
+    def failed(self):
+        return self.stats.failed
+
+    def to_dict(self):
+        """Return the result as a plain dictionary"""
+        return {
+            "root": self.target.root.name if self.target.root is not None else None,
+            "section": self.target.section,
+            "description": self.target.description,
+            "pattern": self.target.pattern,
+            "path": self.path,
+            "ok": self.ok,
+            "cancelled": self.cancelled,
+            "deleted": self.deleted,
+            "failed": self.failed,
+            **self.stats.to_dict(),
+            "bytes_measured": self.bytes_measured,
+            "policy": self.policy.to_dict() if self.policy is not None else None,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "covered_by": list(self.covered_by),
+            "message": self.message,
+        }
+
+
+class CleanupReport:
+    """Aggregated results of a cleanup run
+
+    ``skipped`` counts targets that were never started because the run
+    was cancelled. ``recovered`` counts entries deleted when failures were
+    retried after the main pass, and ``reboot_scheduled`` the leftovers
+    Windows will delete at the next restart. ``budget_reached`` is set
+    when the run was stopped by its time budget rather than cancelled,
+    and ``throttle`` holds what the IoThrottle of the run did, if any.
+    """
+
+    def __init__(self, results=None):
+        self.results = list(results or [])
+        self.cancelled = False
+        self.budget_reached = False
+        self.throttle = None
+        self.skipped = 0
+        self.recovered = 0
+        self.reboot_scheduled = 0
+
+    @property
+    def total(self):
+        return len(self.results)
+
+    @property
+    def successful(self):
+        return sum(1 for result in self.results if result.ok)
+
+    @property
+    def deleted(self):
+        return sum(result.deleted for result in self.results)
+
+    @property
+    def failed(self):
+        return sum(result.failed for result in self.results)
+
+    @property
+    def bytes_freed(self):
+        return sum(result.stats.bytes_freed for result in self.results)
+
+    def roots(self):
+        """Return DeleteStats totals per root name, empty without roots"""
+        totals = {}
+        for result in self.results:
+            if result.target.root is not None:
+                totals.setdefault(result.target.root.name, DeleteStats()).merge(result.stats)
+        return totals
+
+    def to_dict(self):
+        """Return the report as a plain dictionary"""
+        return {
+            "total": self.total,
+            "successful": self.successful,
+            "cancelled": self.cancelled,
+            "budget_reached": self.budget_reached,
+            "throttle": self.throttle,
+            "skipped": self.skipped,
+            "recovered": self.recovered,
+            "reboot_scheduled": self.reboot_scheduled,
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "bytes_freed": self.bytes_freed,
+            "roots": {name: stats.to_dict() for name, stats in self.roots().items()},
+            "results": [result.to_dict() for result in self.results],
+        }
+
+
+def build_targets(cleanup_sections=None):
+    """Build Target objects for every entry in the cleanup sections"""
+    if cleanup_sections is None:
+        cleanup_sections = initialize_cleanup_sections()
+    targets = []
+    for section_name, paths in cleanup_sections.items():
+        for entry in paths:
+            path, description, policy = split_entry(entry)
+            targets.append(Target(section_name, path, description, policy))
+    return targets
+
+
+def select_targets(sections=(), names=(), cleanup_sections=None):
+    """Select targets by section name and by target description or pattern
+
+    Matching is case-insensitive. Raises ValueError for unknown names.
+    """
+    all_targets = build_targets(cleanup_sections)
+    known_sections = {target.section.lower() for target in all_targets}
+
+    wanted_sections = {name.lower() for name in sections}
+    unknown = wanted_sections - known_sections
+    if unknown:
+        raise ValueError(f"Unknown section(s): {', '.join(sorted(unknown))}")
+
+    wanted_names = {name.lower() for name in names}
+    matched_names = set()
+    selected = []
+    for target in all_targets:
+        keys = {target.description.lower(), target.pattern.lower()}
+        if target.section.lower() in wanted_sections or keys & wanted_names:
+            selected.append(target)
+            matched_names |= keys & wanted_names
+
+    unknown = wanted_names - matched_names
+    if unknown:
+        raise ValueError(f"Unknown target(s): {', '.join(sorted(unknown))}")
+    return selected
+
+
+def static_prefix(path):
+    """Return the leading part of a path that contains no wildcards"""
+    drive, rest = os.path.splitdrive(path)
+    parts = rest.split(os.sep)
+    for index, part in enumerate(parts):
+        if '*' in part or '?' in part:
+            return drive + os.sep.join(parts[:index])
+    return path
+
+
+def volume_key(path):
+    """Return a key identifying the volume a path lives on
+
+    Drive letters are used where the path has one, otherwise the device
+    number of the closest existing ancestor. Returns None when nothing
+    along the path exists.
+    """
+    drive, _ = os.path.splitdrive(path)
+    if drive:
+        return drive.upper()
+    probe = static_prefix(path) or os.sep
+    while True:
+        try:
+            return os.stat(probe).st_dev
+        except OSError:
+            parent = os.path.dirname(probe)
+            if parent == probe:
+                return None
+            probe = parent
+
+
+class CleanupEngine:
+    """Delete the files behind a list of targets
+
+    ``log`` is called with one human readable message at a time and
+    ``environ`` overrides the variables used to expand catalog paths.
+    With ``workers`` greater than one, independent targets are cleaned
+    concurrently, running at most ``per_volume`` targets at a time on
+    any single volume (no limit when None). ``control`` is the RunControl
+    used to pause, cancel and follow the progress of runs. With a
+    ScanIndex, folders that were empty last time and have not changed
+    are not listed again. ``policy`` is a Policy applied to every target
+    on top of the target's own one. Every metrics hook is called with a
+    TargetMetrics once a target has been scanned or cleaned, from the
+    thread that processed it. With ``processes`` greater than one, a
+    target folder holding at least ``shard_threshold`` entries is split
+    into shards deleted by a pool of that many processes. Deleted and
+    failed entries are streamed to ``audit``, an AuditSink, if given.
+    With a Stager, folders of targets without a policy are renamed into
+    a staging folder instead of being deleted, and a background process
+    purges them once the run is over. With a RetryQueue, entries that
+    could not be deleted are tried again in bulk after the main pass;
+    with ``delete_on_reboot`` the ones still left, or all of them if its
+    budget is 0, are scheduled for deletion at the next restart (Windows, administrator only). With an
+    Archive, every deleted file is copied into it first; staging,
+    processes and deletion at restart are then not used, since they
+    would delete files the archive never saw. Every target's metrics go
+    to the RunHistory ``history``, if any. With ``order`` set to
+    "largest", targets are cleaned largest expected yield first, judged
+    by the scan or the history; with a ``time_budget`` in seconds, they
+    are ordered by yield per second and the run stops once the budget is
+    spent. An IoThrottle paces every deletion of the run; staging and
+    processes are then not used, since they would delete at full speed.
+    """
+
+    def __init__(self, environ=None, log=None, workers=1, per_volume=None, control=None,
+                 index=None, policy=None, metrics_hooks=(), processes=1,
+                 shard_threshold=SHARD_THRESHOLD, audit=None, stager=None, retry=None,
+                 delete_on_reboot=False, archive=None, history=None, order=None,
+                 time_budget=None, throttle=None):
+        self.environ = environ
+        self._log_callback = log
+        self._log_lock = threading.Lock()
+        self.workers = max(1, workers)
+        self.per_volume = per_volume
+        self.control = control if control is not None else RunControl()
+        self.index = index
+        self.policy = policy
+        self.metrics_hooks = list(metrics_hooks)
+        self.processes = processes
+        self.shard_threshold = shard_threshold
+        self.audit = audit
+        self.stager = stager
+        self.retry = retry
+        self.delete_on_reboot = delete_on_reboot
+        self.archive = archive
+        self.history = history
+        if history is not None:
+            self.metrics_hooks.append(history)
+        self.order = order
+        self.time_budget = time_budget
+        self.budget_reached = False
+        self.throttle = throttle
+        self._started_at = None
+        self._roots = {}
+        self._covered = {}
+
+    def log(self, message):
+        """Pass a message to the log callback, one caller at a time"""
+        if self._log_callback is not None:
+            with self._log_lock:
+                self._log_callback(message)
+
+    def add_metrics_hook(self, hook):
+        """Call hook with the TargetMetrics of every finished target"""
+        self.metrics_hooks.append(hook)
+
+    def emit_metrics(self, metrics):
+        """Pass a TargetMetrics to every hook, logging hooks that fail"""
+        for hook in self.metrics_hooks:
+            try:
+                hook(metrics)
+            except Exception as e:
+                self.log(f"⚠️ Metrics hook failed: {str(e)}")
+
+    def expand_path(self, path):
+        """Expand environment variables in path"""
+        return expand_path(path, self.environ)
+
+    def target_path(self, target):
+        """Expand the pattern of a target with its root's variables or the engine's"""
+        if target.root is not None:
+            return expand_path(target.pattern, target.root.environ)
+        return self.expand_path(target.pattern)
+
+    def resolve_roots(self, expanded_path):
+        """Return the (path, contents_only) pairs an expanded pattern covers
+
+        A pattern ending in *.* (or *) covers the contents of every folder
+        its other components match; any other pattern covers the matching
+        files and folders themselves.
+        """
+        trie = PatternTrie()
+        trie.add(expanded_path, expanded_path)
+        return trie.resolve()[expanded_path]
+
+    def resolve_targets(self, targets):
+        """Resolve the patterns of many targets in one file system traversal
+
+        Targets sharing a prefix share its listings. Roots that another
+        target with the same policy already deletes, because both point at
+        one folder or one is nested in the other, are then left to that
+        target alone. The roots are kept for roots_for and covered_by
+        until the next call.
+        """
+        trie = PatternTrie()
+        for target in targets:
+            trie.add(target.key, self.target_path(target))
+        roots = trie.resolve()
+
+        descriptions = {target.key: target.label for target in targets}
+        items = [(target.key, roots[target.key],
+                  target.policy.to_dict() if target.policy is not None else None)
+                 for target in targets]
+        self._roots, covered = coalesce_roots(items)
+        self._covered = {key: [descriptions[owner] for owner in owners]
+                         for key, owners in covered.items()}
+        if covered:
+            self.log(f"🔗 {len(covered)} overlapping target(s) merged into the targets covering them")
+
+    def covered_by(self, target):
+        """Return the descriptions of the targets that also delete this target's folders"""
+        return self._covered.get(target.key, [])
+
+    def roots_for(self, target, expanded_path):
+        """Return the roots of a target, resolved up front if possible"""
+        roots = self._roots.get(target.key)
+        if roots is None:
+            roots = self.resolve_roots(expanded_path)
+        return roots
+
+    def policy_for(self, target):
+        """Return the Policy that applies to a target, or None for no limits
+
+        The age cutoff is fixed at the start of the run so every target
+        of a run is judged against the same moment.
+        """
+        policy = self.policy.merge(target.policy) if self.policy is not None else target.policy
+        if policy is not None:
+            policy.refresh(self._started_at)
+        return policy
+
+    def path_missing(self, expanded_path):
+        """Return True if a non-wildcard path has no parent directory"""
+        return not os.path.exists(os.path.dirname(expanded_path)) and '*' not in expanded_path
+
+    def scan_target(self, target, progress=None):
+        """Measure what cleaning a target would delete, without deleting
+
+        ``progress`` is called with the ScanResult while it is filled in.
+        """
+        started = time.perf_counter()
+        result = self._scan_target(target, progress)
+        result.wall_seconds = time.perf_counter() - started
+        self.emit_metrics(TargetMetrics.from_scan(result))
+        return result
+
+    def _scan_target(self, target, progress):
+        """Scan one target, see scan_target"""
+        description = target.label
+        expanded_path = self.target_path(target)
+        result = ScanResult(target, expanded_path)
+        result.policy = self.policy_for(target)
+        report_progress = (lambda stats: progress(result)) if progress else None
+        target_index = self.index.target(expanded_path) if self.index is not None else None
+        scanner = TreeScanner(result.stats, report_progress, control=self.control,
+                              index=target_index, policy=result.policy)
+
+        try:
+            if self.path_missing(expanded_path):
+                result.message = "Path not found"
+                self.log(f"ℹ️ {description} - Path not found")
+                return result
+
+            roots = self.roots_for(target, expanded_path)
+            if self.report_covered(result, roots):
+                return result
+
+            for path, contents_only in roots:
+                if contents_only:
+                    scanner.scan_contents(path)
+                else:
+                    scanner.scan_path(path)
+            result.plan = scanner.plan
+            self.store_index(expanded_path, target_index)
+
+            kept = f", {result.stats.skipped} kept by policy" if result.stats.skipped else ""
+            result.message = (f"{result.files} files, {result.dirs} folders, "
+                              f"{format_size(result.bytes)}{kept}"
+                              f"{self.describe_skipped(target_index)}")
+            self.log(f"🔎 {description} - {result.message}")
+
+        except CleanupCancelled:
+            result.plan = None
+            result.message = "Cancelled"
+            self.log(f"⏹️ {description} - Scan cancelled")
+
+        except Exception as e:
+            result.plan = None
+            result.message = f"Error: {str(e)}"
+            self.log(f"❌ {description} - Error: {str(e)}")
+
+        return result
+
+    def scan(self, targets, progress=None):
+        """Scan every target and return a ScanReport
+
+        ``progress`` receives each ScanResult repeatedly while it grows,
+        so totals can be displayed before the scan finishes.
+        """
+        targets = list(targets)
+        self.log("🔎 Scanning selected targets...")
+        self.start_run()
+        self.resolve_targets(targets)
+        self.control.start(len(targets))
+
+        results = self._run_targets(targets, lambda target: self.scan_target(target, progress),
+                                    "Scanning section")
+
+        report = ScanReport(results)
+        if self.control.cancelled:
+            self.log(f"\n⏹️ Scan cancelled after {len(results)}/{len(targets)} targets")
+        if targets:
+            self.log("")
+            for section_name, stats in report.sections().items():
+                self.log(f"📁 {section_name}: {stats.files} files, {stats.dirs} folders, "
+                         f"{format_size(stats.bytes)}")
+            for root_name, stats in report.roots().items():
+                self.log(f"👤 {root_name}: {stats.files} files, {stats.dirs} folders, "
+                         f"{format_size(stats.bytes)}")
+            self.log(f"💾 Estimated reclaimable space: {format_size(report.bytes)} "
+                     f"({report.files} files, {report.dirs} folders)")
+        return report
+
+    def clean_target(self, target, scan=None):
+        """Safely delete files matching the target pattern
+
+        When ``scan`` holds a deletion plan from scan_target, the plan is
+        executed instead of walking the tree again.
+        """
+        started = time.perf_counter()
+        result = self._clean_target(target, scan)
+        result.wall_seconds = time.perf_counter() - started
+        self.emit_metrics(TargetMetrics.from_clean(result))
+        return result
+
+    def _clean_target(self, target, scan):
+        """Clean one target, see clean_target"""
+        description = target.label
+        expanded_path = self.target_path(target)
+        result = TargetResult(target, expanded_path)
+        result.policy = self.policy_for(target)
+        target_index = self.index.target(expanded_path) if self.index is not None else None
+        deleter = TreeDeleter(result.stats, self.control, target_index, result.policy,
+                              self.audit, self.retry, self.archive,
+                              measure=self.throttle is not None and self.throttle.needs_size,
+                              throttle=self.throttle)
+
+        try:
+            # Check if path exists
+            if self.path_missing(expanded_path):
+                result.message = "Path not found, skipping"
+                self.log(f"ℹ️ {description} - Path not found, skipping")
+                return result
+
+            roots = self.roots_for(target, expanded_path)
+            if self.report_covered(result, roots):
+                return result
+
+            # Staging is faster than any plan, but cannot apply a policy
+            staging = (self.stager is not None and result.policy is None and self.archive is None
+                       and self.throttle is None)
+            if scan is not None and scan.plan is not None and not staging:
+                deleter.delete_plan(scan.plan)
+            else:
+                # Sizes are only read when something already needs them
+                result.bytes_measured = not staging and deleter.sizes_known
+                try:
+                    for path, contents_only in roots:
+                        if staging and contents_only:
+                            self.stager.stage_contents(deleter, path)
+                        elif staging:
+                            self.stager.stage_path(deleter, path)
+                        elif contents_only:
+                            self.delete_contents(deleter, path, scan, description)
+                        else:
+                            deleter.delete_path(path)
+                finally:
+                    self.store_index(expanded_path, target_index)
+
+            if '*' not in expanded_path and result.failed:
+                result.ok = False
+                result.message = "Access denied or file in use"
+                self.log(f"⚠️ {description} - Access denied or file in use")
+                return result
+
+            result.message = self.describe_outcome(result) + self.describe_skipped(target_index)
+            icon = "✅" if result.deleted or result.stats.dirs_staged else "ℹ️"
+            self.log(f"{icon} {description} - {result.message}")
+
+        except CleanupCancelled:
+            result.ok = False
+            result.cancelled = True
+            stats = result.stats
+            result.message = (f"Cancelled ({stats.files_deleted} files, {stats.dirs_deleted} "
+                              f"folders deleted before stopping)")
+            self.log(f"⏹️ {description} - {result.message}")
+
+        except Exception as e:
+            result.ok = False
+            result.message = f"Error: {str(e)}"
+            self.log(f"❌ {description} - Error: {str(e)}")
+
+        return result
+
+    def delete_contents(self, deleter, path, scan, description):
+        """Delete a folder's contents, sharded across processes if it is large
+
+        The size comes from the scan when there is one, otherwise the
+        folder is counted up to the threshold.
+        """
+        if self.processes > 1 and self.archive is None and self.throttle is None:
+            if scan is not None:
+                size = scan.files + scan.dirs
+            else:
+                size = count_entries(path, self.shard_threshold)
+            if size >= self.shard_threshold:
+                self.log(f"🧩 {description} - Splitting {path} across {self.processes} processes")
+                delete_contents_sharded(deleter, path, self.processes)
+                return
+        deleter.delete_contents(path)
+
+    def report_covered(self, result, roots):
+        """Note the targets covering part of a result; return True if they cover all of it"""
+        result.covered_by = self.covered_by(result.target)
+        if not result.covered_by:
+            return False
+        owners = ", ".join(result.covered_by)
+        if roots:
+            self.log(f"🔗 {result.target.label} - Overlapping folders left to {owners}")
+            return False
+        result.message = f"Covered by {owners}"
+        self.log(f"🔗 {result.target.label} - Same folders as {owners}, skipped")
+        return True
+
+    def describe_outcome(self, result):
+        """Summarise the deletion counts of a target in one line"""
+        stats = result.stats
+        # Files refused by a full archive are failures too, but not locked ones
+        full = stats.errnos.get("EFBIG", 0)
+        failures = ", ".join(text for count, text in (
+            (stats.failed - full, f"{stats.failed - full} in use or access denied"),
+            (full, f"{full} kept as the archive is full")) if count)
+        skipped = f", {failures}" if failures else ""
+        kept = f", {stats.skipped} kept by policy" if stats.skipped else ""
+        staged = f", {stats.dirs_staged} moved to staging" if stats.dirs_staged else ""
+        if result.deleted > 0 or stats.dirs_staged:
+            freed = f", {format_size(stats.bytes_freed)}" if stats.bytes_freed else ""
+            return (f"Cleaned successfully ({stats.files_deleted} files, "
+                    f"{stats.dirs_deleted} folders{freed}{staged}{skipped}{kept})")
+        if stats.failed:
+            return f"Nothing could be deleted ({failures}{kept})"
+        if stats.skipped:
+            return f"Nothing to clean ({stats.skipped} kept by policy)"
+        return "No files to clean"
+
+    def describe_skipped(self, target_index):
+        """Mention folders the scan index allowed to skip, if any"""
+        if target_index is None or not target_index.skipped:
+            return ""
+        return f" - {target_index.skipped} unchanged empty folders skipped"
+
+    def store_index(self, root, target_index):
+        """Save the directory states recorded while walking a target"""
+        if target_index is None:
+            return
+        try:
+            self.index.store(root, target_index)
+        except Exception as e:
+            self.log(f"⚠️ Could not update the scan index: {str(e)}")
+
+    def start_run(self):
+        """Fix the moment policies are judged against and announce the global policy"""
+        self._started_at = time.time()
+        if self.policy is not None:
+            self.log(f"🛡️ Only deleting entries {self.policy.describe()}")
+
+    def _run_targets(self, targets, func, section_label):
+        """Apply func to every target, serially or on the worker pool
+
+        Stops starting new targets once the run is cancelled, so the
+        returned list only holds results of targets that were started.
+        """
+        if self.workers > 1 and len(targets) > 1:
+            results = self._run_parallel(targets, func)
+            return [result for result in results if result is not None]
+
+        results = []
+        current_section = None
+        for target in targets:
+            if self.control.cancelled:
+                break
+            if (target.root, target.section) != current_section:
+                current_section = (target.root, target.section)
+                prefix = f"[{target.root.name}] " if target.root is not None else ""
+                self.log(f"\n📁 {section_label}: {prefix}{target.section}")
+            results.append(func(target))
+            self.control.target_done()
+        return results
+
+    def run(self, targets, scans=None):
+        """Clean every target in order and return a CleanupReport
+
+        ``scans`` is an optional ScanReport whose deletion plans are
+        reused for the targets it covers.
+        """
+        report = CleanupReport()
+        targets = list(targets)
+
+        self.log("🧹 Starting cleanup process...")
+
+        if not targets:
+            self.log("⚠️ No paths selected for cleanup!")
+            return report
+
+        self.log(f"📊 Total operations to perform: {len(targets)}")
+        if self.throttle is not None:
+            self.log(f"🐢 Throttled to {self.throttle.describe()}")
+        self.start_run()
+        if self.order == "largest" or self.time_budget:
+            targets = self.schedule(targets, scans)
+        # Every target is resolved, even those with a plan, so overlaps
+        # are settled the same way the scan settled them
+        self.resolve_targets(targets)
+
+        # With a scan the run can report progress by items and bytes
+        if scans is not None:
+            self.control.start(len(targets), scans.files + scans.dirs, scans.bytes)
+        else:
+            self.control.start(len(targets))
+
+        def clean(target):
+            return self.clean_target(target, scans.get(target) if scans else None)
+
+        timer = None
+        self.budget_reached = False
+        if self.time_budget:
+            timer = threading.Timer(self.time_budget, self._budget_spent)
+            timer.daemon = True
+            timer.start()
+        try:
+            report.results.extend(self._run_targets(targets, clean, "Processing section"))
+            if self.retry is not None and len(self.retry) and not self.control.cancelled:
+                self.retry_failures(report)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if self.audit is not None:
+                self.audit.flush()
+        report.cancelled = self.control.cancelled
+        report.budget_reached = self.budget_reached
+        report.skipped = len(targets) - len(report.results)
+
+        # Summary
+        if report.budget_reached:
+            self.log(f"\n⏱️ Time budget spent! {report.skipped} target(s) were not started")
+        elif report.cancelled:
+            self.log(f"\n⏹️ Cleanup cancelled! {report.skipped} target(s) were not started")
+        else:
+            self.log(f"\n🎉 Cleanup completed!")
+        self.log(f"📊 Successful operations: {report.successful}/{len(targets)}")
+        for root_name, stats in report.roots().items():
+            self.log(f"👤 {root_name}: {stats.files_deleted} files, {stats.dirs_deleted} folders"
+                     + (f", {format_size(stats.bytes_freed)}" if stats.bytes_freed else "")
+                     + (f", {stats.failed} failed" if stats.failed else ""))
+        if report.bytes_freed:
+            self.log(f"💾 Space freed: {format_size(report.bytes_freed)}")
+        if self.archive is not None and self.archive.files:
+            self.log(f"🗄️ {self.archive.files} files ({format_size(self.archive.bytes)}) "
+                     f"archived to {self.archive.path}")
+        if self.archive is not None and self.archive.refused:
+            self.log(f"⚠️ {self.archive.refused} files were kept because the archive is full")
+        if self.throttle is not None:
+            throttle = self.throttle.to_dict()
+            latency = (f", {throttle['latency_ms']:.2f} ms per call"
+                       if throttle["latency_ms"] is not None else "")
+            self.log(f"🐢 Waited {throttle['waited_seconds']:.1f}s on the throttle over "
+                     f"{throttle['operations']} calls{latency}, {throttle['backoffs']} backoffs")
+            report.throttle = throttle
+
+        if report.successful < report.total and not report.cancelled:
+            self.log("ℹ️ Some files could not be deleted (normal for files in use)")
+
+        # Folders left over by an interrupted purge are picked up as well
+        if self.stager is not None and (self.stager.staged or self.stager.area.pending()):
+            self.purge_in_background()
+
+        return report
+
+    def schedule(self, targets, scans=None):
+        """Reorder targets largest expected yield first, see history.schedule
+
+        Sizes come from the scan where there is one, otherwise from the
+        history; durations always come from the history.
+        """
+        # Imported here: sqlite3 is only needed by runs that schedule
+        from .history import history_key, schedule
+
+        estimates = self.history.estimates() if self.history is not None else {}
+        if scans is not None:
+            for target in targets:
+                scan = scans.get(target)
+                if scan is not None:
+                    growth = estimates.get(history_key(target))
+                    estimates[history_key(target)] = (scan.bytes,
+                                                      growth.last_seconds if growth else None)
+        ordered = schedule(targets, estimates, self.time_budget, self.workers)
+        known = sum(1 for target in targets if history_key(target) in estimates)
+        within = f", within {self.time_budget:g}s" if self.time_budget else ""
+        self.log(f"📈 Largest expected yield first{within} "
+                 f"({known} of {len(targets)} targets seen before)")
+        return ordered
+
+    def _budget_spent(self):
+        """Stop the run once its time budget is spent"""
+        self.budget_reached = True
+        self.log(f"⏱️ Time budget of {self.time_budget:g}s spent, stopping")
+        self.control.cancel()
+
+    def retry_failures(self, report):
+        """Retry the queued failures and update the results they belong to"""
+        if self.retry.budget:
+            self.log(f"\n🔁 Retrying {len(self.retry)} locked or in-use entries "
+                     f"for up to {self.retry.budget:g}s...")
+        failed = [result.failed for result in report.results]
+        left = self.retry.run(self.control)
+        report.recovered = self.retry.recovered
+
+        for result, before in zip(report.results, failed):
+            if result.failed == before or result.message.startswith("Error"):
+                continue
+            result.ok = not result.failed or '*' in result.path
+            result.message = self.describe_outcome(result)
+            self.log(f"🔁 {result.target.label} - {result.message}")
+        if self.retry.budget:
+            self.log(f"🔁 {report.recovered} entries deleted on retry, {len(left)} still "
+                     f"locked ({self.retry.denied} refused access)")
+
+        if left and self.delete_on_reboot and self.archive is None:
+            report.reboot_scheduled = delete_on_reboot([path for path, *rest in left])
+            self.log(f"🔁 {report.reboot_scheduled} entries will be deleted at the next restart")
+
+    def purge_in_background(self):
+        """Start the detached process that deletes the staged folders"""
+        try:
+            start_purge()
+        except OSError as e:
+            self.log(f"⚠️ Could not start the background purge, run 'purge' later: {str(e)}")
+            return
+        self.log(f"🧺 Purging {self.stager.staged} staged folder(s) in the background")
+
+    def _run_parallel(self, targets, func):
+        """Apply func to targets on a bounded pool of worker threads
+
+        Workers pick the next pending target whose volume is below the
+        per-volume limit, so a busy volume never blocks work on another
+        one. Results are returned in the order of ``targets``.
+        """
+        worker_count = min(self.workers, len(targets))
+        self.log(f"⚙️ Running on {worker_count} workers"
+                 + (f" ({self.per_volume} per volume)" if self.per_volume else ""))
+
+        volumes = [volume_key(self.target_path(target)) for target in targets]
+        pending = list(range(len(targets)))
+        active = Counter()
+        results = [None] * len(targets)
+        condition = threading.Condition()
+
+        def next_index():
+            with condition:
+                while pending:
+                    if self.control.cancelled:
+                        return None
+                    for position, index in enumerate(pending):
+                        if self.per_volume is None or active[volumes[index]] < self.per_volume:
+                            del pending[position]
+                            active[volumes[index]] += 1
+                            return index
+                    condition.wait()
+                return None
+
+        def worker():
+            while True:
+                index = next_index()
+                if index is None:
+                    return
+                try:
+                    results[index] = func(targets[index])
+                    self.control.target_done()
+                finally:
+                    with condition:
+                        active[volumes[index]] -= 1
+                        condition.notify_all()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(worker_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,910 @@
+"""
+Bat Broom - Windows Temporary Files Cleanup GUI
+A Python tkinter application for safely cleaning Windows temporary files
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox, scrolledtext
+import threading
+import datetime
+import queue
+import os
+import time
+
+from .archive import ARCHIVE_KEEP, Archive, default_archive_dir
+from .catalog import initialize_cleanup_sections, expand_path, split_entry
+from .control import RunControl, format_eta
+from .engine import CleanupEngine, Target, format_size
+from .retry import RetryQueue
+from .staging import Stager, StagingArea, start_purge
+
+# Log pipeline tuning: how often the Tk loop drains queued messages, how
+# many lines it inserts per drain and how many lines the log widget keeps
+LOG_POLL_MS = 50
+LOG_BATCH_SIZE = 500
+MAX_LOG_LINES = 5000
+
+# How often the progress bar and throughput figures are refreshed
+PROGRESS_POLL_MS = 250
+
+# Check box glyphs of the target tree: unticked, ticked and partly ticked
+CHECK_GLYPHS = {False: "☐", True: "☑", None: "▣"}
+
+# Delay before a purge interrupted by the last session is resumed, so it
+# does not compete with drawing the first window
+RESUME_PURGE_DELAY_MS = 2000
+
+# When set to a file path, main() writes the time the first window was
+# drawn to that file and exits; used by the startup benchmark
+STARTUP_PROBE_VARIABLE = "BAT_BROOM_STARTUP_PROBE"
+
+
+def create_root():
+    """Create the main window, themed if ttkthemes is installed"""
+    # Imported here: ttkthemes is optional and slow to load
+    try:
+        from ttkthemes import ThemedTk
+    except ImportError:
+        return tk.Tk()
+    return ThemedTk(theme="arc")
+
+class BatBroomApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Bat Broom - Windows Temporary Files Cleanup")
+        self.root.geometry("900x650")  # Increased window size for better layout
+        
+        # Set theme if available
+        if hasattr(root, "set_theme"):
+            root.set_theme("arc")  # Modern, clean theme
+        
+        # Configure styles for a more modern look
+        self.configure_styles()
+        
+        # Check admin privileges
+        self.is_admin = self.check_admin()
+        
+        # Initialize variables
+        self.cleanup_sections = self.initialize_cleanup_sections()
+        self.checked = set()
+        self.section_items = {}
+        self.path_items = {}
+        self.item_entries = {}
+        self.row_stats = {}
+        # Filled by the scan worker and swapped out by the Tk thread
+        self.pending_rows = {}
+        self.pending_rows_lock = threading.Lock()
+        self.hover_item = None
+        self.is_cleaning = False
+        self.is_scanning = False
+        self.last_scan = None
+        self.control = None
+        self.tooltip = None
+        
+        # Worker threads never touch Tk directly: log lines, status text and
+        # UI callbacks are queued here and applied by drain_ui_queues
+        self.log_queue = queue.Queue()
+        self.ui_calls = queue.Queue()
+        self.pending_status = None
+        
+        # Create GUI
+        self.create_gui()
+        
+        # Start draining the log pipeline
+        self.drain_ui_queues()
+        
+        # Finish purging folders staged before the last exit
+        self.root.after(RESUME_PURGE_DELAY_MS, self.resume_purge)
+        
+        # Show admin warning if needed
+        if not self.is_admin:
+            self.show_admin_warning()
+    
+    def configure_styles(self):
+        """Configure custom styles for widgets"""
+        style = ttk.Style()
+        
+        # Configure button style
+        style.configure("Action.TButton", 
+                       font=('Arial', 10, 'bold'),
+                       padding=8)
+        
+        # Configure target tree style
+        style.configure("Targets.Treeview", 
+                       font=('Arial', 9),
+                       rowheight=22)
+        
+        # Configure header style
+        style.configure("Header.TLabel", 
+                       font=('Arial', 16, 'bold'))
+        
+        # Configure subheader style
+        style.configure("Subheader.TLabel", 
+                       font=('Arial', 10))
+        
+        # Configure frame style
+        style.configure("Card.TFrame", 
+                       background="#f8f8f8",
+                       relief="raised")
+    
+    def check_admin(self):
+        """Check if running with administrator privileges"""
+        try:
+            import ctypes
+            return ctypes.windll.shell32.IsUserAnAdmin()
+        except:
+            return False
+    
+    def show_admin_warning(self):
+        """Show warning if not running as administrator"""
+        messagebox.showwarning(
+            "Administrator Privileges Required",
+            "Some cleanup operations require administrator privileges.\n\n"
+            "For best results, please run this application as administrator."
+        )
+    
+    def initialize_cleanup_sections(self):
+        """Initialize the cleanup sections with their paths"""
+        return initialize_cleanup_sections()
+    
+    def create_gui(self):
+        """Create the main GUI interface"""
+        # Main frame with padding
+        main_frame = ttk.Frame(self.root, padding="15")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Configure grid weights
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(2, weight=1)
+        
+        # Header frame
+        header_frame = ttk.Frame(main_frame)
+        header_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 15))
+        header_frame.columnconfigure(0, weight=1)
+        
+        # Logo and title
+        title_label = ttk.Label(header_frame, text="🧹 Bat Broom", style="Header.TLabel")
+        title_label.grid(row=0, column=0, sticky=tk.W)
+        
+        # Subtitle
+        subtitle_label = ttk.Label(header_frame, text="Windows Temporary Files Cleanup Tool", style="Subheader.TLabel")
+        subtitle_label.grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        
+        # Fast delete: move folders to staging and purge them in the background
+        self.fast_delete_var = tk.BooleanVar(value=False)
+        fast_delete_cb = ttk.Checkbutton(
+            header_frame,
+            text="⚡ Fast delete",
+            variable=self.fast_delete_var
+        )
+        fast_delete_cb.grid(row=0, column=1, sticky=tk.W)
+        
+        # Archive: copy every deleted file into a tar.gz first
+        self.archive_var = tk.BooleanVar(value=False)
+        archive_cb = ttk.Checkbutton(
+            header_frame,
+            text="🗄️ Archive before delete",
+            variable=self.archive_var
+        )
+        archive_cb.grid(row=1, column=1, sticky=tk.W, pady=(5, 0))
+        
+        # Control buttons frame - now at the top
+        button_frame = ttk.Frame(main_frame, padding=(0, 10))
+        button_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(0, 15))
+        
+        # Select All / Deselect All buttons
+        select_all_btn = ttk.Button(
+            button_frame, 
+            text="Select All", 
+            command=self.select_all,
+            style="Action.TButton",
+            width=15
+        )
+        select_all_btn.grid(row=0, column=0, padx=(0, 10))
+        
+        deselect_all_btn = ttk.Button(
+            button_frame, 
+            text="Deselect All", 
+            command=self.deselect_all,
+            style="Action.TButton",
+            width=15
+        )
+        deselect_all_btn.grid(row=0, column=1, padx=(0, 10))
+        
+        # Scan button
+        self.scan_btn = ttk.Button(
+            button_frame, 
+            text="🔎 Scan", 
+            command=self.start_scan,
+            style="Action.TButton",
+            width=12
+        )
+        self.scan_btn.grid(row=0, column=2, padx=(0, 10))
+        
+        # Clean button
+        self.clean_btn = ttk.Button(
+            button_frame, 
+            text="🧹 Start Cleanup", 
+            command=self.start_cleanup,
+            style="Action.TButton",
+            width=20
+        )
+        self.clean_btn.grid(row=0, column=3, padx=(0, 10))
+        
+        # Pause and cancel buttons, only enabled while a run is active
+        self.pause_btn = ttk.Button(
+            button_frame,
+            text="⏸ Pause",
+            command=self.toggle_pause,
+            style="Action.TButton",
+            width=10,
+            state='disabled'
+        )
+        self.pause_btn.grid(row=0, column=4, padx=(0, 10))
+        
+        self.cancel_btn = ttk.Button(
+            button_frame,
+            text="⏹ Cancel",
+            command=self.cancel_run,
+            style="Action.TButton",
+            width=10,
+            state='disabled'
+        )
+        self.cancel_btn.grid(row=0, column=5, padx=(0, 10))
+        
+        # Progress bar
+        self.progress = ttk.Progressbar(button_frame, mode='indeterminate', maximum=100)
+        self.progress.grid(row=0, column=6, sticky=(tk.W, tk.E), padx=(10, 0))
+        button_frame.columnconfigure(6, weight=1)
+        
+        # Content frame - contains both sections and log
+        content_frame = ttk.Frame(main_frame)
+        content_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        content_frame.columnconfigure(0, weight=1)
+        content_frame.columnconfigure(1, weight=1)
+        content_frame.rowconfigure(0, weight=1)
+        
+        # Left panel - Cleanup sections
+        left_frame = ttk.LabelFrame(content_frame, text="Cleanup Sections", padding="10")
+        left_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(0, 8))
+        left_frame.columnconfigure(0, weight=1)
+        left_frame.rowconfigure(0, weight=1)
+        
+        # Target tree: rows are Treeview items, not widgets, so only the
+        # visible ones are drawn however long the catalog gets
+        self.tree = ttk.Treeview(left_frame, columns=("size", "files"), style="Targets.Treeview")
+        scrollbar = ttk.Scrollbar(left_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        # Create sections
+        self.create_sections(self.tree)
+        
+        # Right panel - Log
+        log_frame = ttk.LabelFrame(content_frame, text="Cleanup Log", padding="10")
+        log_frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(8, 0))
+        log_frame.columnconfigure(0, weight=1)
+        log_frame.rowconfigure(0, weight=1)
+        
+        self.log_text = scrolledtext.ScrolledText(log_frame, height=20, width=50)
+        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Status bar
+        self.status_var = tk.StringVar()
+        self.status_var.set("Ready")
+        status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.grid(row=3, column=0, sticky=(tk.W, tk.E), pady=(15, 0))
+        
+        # Initial log message
+        self.log_message("Bat Broom initialized successfully!")
+        if not self.is_admin:
+            self.log_message("⚠️ Warning: Not running as administrator. Some operations may fail.")
+        
+        # Create tooltips for hover info
+        self.create_tooltip(title_label, "Bat Broom - Windows Temporary Files Cleanup")
+        self.create_tooltip(self.scan_btn, "Measure selected temporary files without deleting them")
+        self.create_tooltip(self.clean_btn, "Start cleaning selected temporary files")
+        self.create_tooltip(fast_delete_cb, "Move folders out of the way at once and delete them "
+                                            "in a background process (ignored for targets with "
+                                            "age, size or name limits)")
+        self.create_tooltip(archive_cb, lambda: f"Copy every deleted file into a compressed "
+                                                f"archive in {default_archive_dir()} first; the "
+                                                f"last {ARCHIVE_KEEP} archives are kept "
+                                                f"(not combined with fast delete)")
+    
+    def create_sections(self, tree):
+        """Fill the target tree with one collapsed row per section"""
+        tree.heading("#0", text="Target", anchor=tk.W)
+        tree.heading("size", text="Size", anchor=tk.E)
+        tree.heading("files", text="Files", anchor=tk.E)
+        tree.column("#0", minwidth=200, stretch=True)
+        tree.column("size", width=80, minwidth=60, anchor=tk.E, stretch=False)
+        tree.column("files", width=80, minwidth=60, anchor=tk.E, stretch=False)
+        tree.tag_configure("section", font=('Arial', 10, 'bold'))
+        
+        for section_name, paths in self.cleanup_sections.items():
+            section_item = tree.insert("", tk.END, text=self.row_text(False, section_name),
+                                       values=("", ""), tags=("section",))
+            self.section_items[section_name] = section_item
+            # Path rows are only inserted the first time the section is
+            # opened; the placeholder gives it an expand arrow until then
+            if paths:
+                tree.insert(section_item, tk.END, text="")
+        
+        tree.bind("<<TreeviewOpen>>", self.on_tree_open)
+        tree.bind("<Button-1>", self.on_tree_click)
+        tree.bind("<space>", self.on_tree_space)
+        tree.bind("<Motion>", self.on_tree_motion)
+        tree.bind("<Leave>", lambda event: self.hide_row_tooltip())
+    
+    @staticmethod
+    def row_text(state, label):
+        """Return the label of a tree row with its check box glyph"""
+        return f"{CHECK_GLYPHS[state]} {label}"
+    
+    def build_path_rows(self, section_name):
+        """Insert the path rows of a section in place of its placeholder"""
+        section_item = self.section_items[section_name]
+        self.tree.delete(*self.tree.get_children(section_item))
+        for entry in self.cleanup_sections[section_name]:
+            path, description, policy = split_entry(entry)
+            key = (section_name, path)
+            item = self.tree.insert(section_item, tk.END,
+                                    text=self.row_text(key in self.checked, description),
+                                    values=self.stats_values(self.row_stats.get(key)))
+            self.path_items[key] = item
+            self.item_entries[item] = (section_name, path, description, policy)
+    
+    def on_tree_open(self, event):
+        """Build a section's path rows the first time it is opened"""
+        item = self.tree.focus()
+        for section_name, section_item in self.section_items.items():
+            if section_item == item and not self.tree.tag_has("built", item):
+                self.tree.item(item, tags=("section", "built"))
+                self.build_path_rows(section_name)
+    
+    def on_tree_click(self, event):
+        """Tick or untick the clicked row, unless the expand arrow was hit"""
+        item = self.tree.identify_row(event.y)
+        if not item or self.tree.identify_region(event.x, event.y) not in ("tree", "cell"):
+            return None
+        if "indicator" in self.tree.identify_element(event.x, event.y):
+            return None
+        self.toggle_item(item)
+        self.tree.focus(item)
+        return "break"
+    
+    def on_tree_space(self, event):
+        """Tick or untick the focused row"""
+        item = self.tree.focus()
+        if item:
+            self.toggle_item(item)
+        return "break"
+    
+    def toggle_item(self, item):
+        """Flip a path row, or every path of a section row"""
+        if item in self.item_entries:
+            section_name, path = self.item_entries[item][:2]
+            self.checked ^= {(section_name, path)}
+            self.refresh_section(section_name)
+            return
+        for section_name, section_item in self.section_items.items():
+            if section_item == item:
+                # A partly ticked section becomes fully ticked, as in Explorer
+                self.set_section(section_name, self.section_state(section_name) is not True)
+    
+    def section_state(self, section_name):
+        """Return True, False, or None when only some paths are ticked"""
+        paths = self.cleanup_sections[section_name]
+        ticked = sum(1 for entry in paths if (section_name, split_entry(entry)[0]) in self.checked)
+        if ticked == 0:
+            return False
+        return True if ticked == len(paths) else None
+    
+    def set_section(self, section_name, state):
+        """Tick or untick every path of a section"""
+        for entry in self.cleanup_sections[section_name]:
+            key = (section_name, split_entry(entry)[0])
+            if state:
+                self.checked.add(key)
+            else:
+                self.checked.discard(key)
+        self.refresh_section(section_name)
+    
+    def refresh_section(self, section_name):
+        """Redraw the glyphs of a section and of its inserted path rows"""
+        self.tree.item(self.section_items[section_name],
+                       text=self.row_text(self.section_state(section_name), section_name))
+        for entry in self.cleanup_sections[section_name]:
+            path, description = split_entry(entry)[:2]
+            item = self.path_items.get((section_name, path))
+            if item is not None:
+                self.tree.item(item, text=self.row_text((section_name, path) in self.checked,
+                                                        description))
+    
+    def path_tooltip(self, path, policy):
+        """Return the tooltip text of a catalog entry"""
+        tooltip_text = f"Path: {self.expand_path(path)}"
+        if policy is not None:
+            tooltip_text += f"\nOnly deletes entries {policy.describe()}"
+        return tooltip_text
+    
+    def shared_tooltip(self):
+        """Return the tooltip window shared by every widget, creating it on first use"""
+        if self.tooltip is None:
+            self.tooltip = ToolTip(self.root)
+        return self.tooltip
+    
+    def create_tooltip(self, widget, text):
+        """Create a tooltip for a widget"""
+        self.shared_tooltip().attach(widget, text)
+    
+    def on_tree_motion(self, event):
+        """Show the expanded path of the path row under the mouse"""
+        item = self.tree.identify_row(event.y)
+        if item == self.hover_item:
+            return
+        self.hover_item = item
+        entry = self.item_entries.get(item)
+        if entry is None:
+            self.hide_row_tooltip()
+            return
+        self.shared_tooltip().show(event.x_root + 25, event.y_root + 15,
+                          self.path_tooltip(entry[1], entry[3]))
+    
+    def hide_row_tooltip(self):
+        """Hide the tree's tooltip"""
+        self.hover_item = None
+        if self.tooltip is not None:
+            self.tooltip.on_leave()
+    
+    @staticmethod
+    def stats_values(stats):
+        """Return the size and files cells of a row from its (files, bytes, covered) stats"""
+        if stats is None:
+            return ("", "")
+        files, nbytes, covered = stats
+        if covered:
+            return ("covered", "")
+        return (format_size(nbytes), f"{files:,}")
+    
+    def set_row_stats(self, results):
+        """Show the files and bytes of scan results in their rows and section totals"""
+        sections = set()
+        for result in results:
+            key = (result.target.section, result.target.pattern)
+            stats = (result.files, result.bytes, bool(result.covered_by))
+            self.row_stats[key] = stats
+            sections.add(key[0])
+            item = self.path_items.get(key)
+            if item is not None:
+                self.tree.item(item, values=self.stats_values(stats))
+        self.refresh_section_totals(sections)
+    
+    def clear_row_stats(self, targets):
+        """Blank the size and files cells of targets whose figures are out of date"""
+        sections = set()
+        for target in targets:
+            key = (target.section, target.pattern)
+            self.row_stats.pop(key, None)
+            sections.add(target.section)
+            item = self.path_items.get(key)
+            if item is not None:
+                self.tree.item(item, values=("", ""))
+        self.refresh_section_totals(sections)
+    
+    def refresh_section_totals(self, sections):
+        """Sum the figures of the scanned paths of sections into their rows"""
+        for section_name in sections:
+            stats = [self.row_stats.get((section_name, split_entry(entry)[0]))
+                     for entry in self.cleanup_sections[section_name]]
+            stats = [stat for stat in stats if stat is not None and not stat[2]]
+            values = ("", "")
+            if stats:
+                values = self.stats_values((sum(stat[0] for stat in stats),
+                                            sum(stat[1] for stat in stats), False))
+            self.tree.item(self.section_items[section_name], values=values)
+    
+    def select_all(self):
+        """Select all sections and paths"""
+        for section_name in self.cleanup_sections:
+            self.set_section(section_name, True)
+    
+    def deselect_all(self):
+        """Deselect all sections and paths"""
+        for section_name in self.cleanup_sections:
+            self.set_section(section_name, False)
+    
+    def log_message(self, message):
+        """Add a message to the log; safe to call from any thread"""
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        self.log_queue.put(f"[{timestamp}] {message}\n")
+    
+    def set_status(self, text):
+        """Update the status bar; safe to call from any thread
+        
+        Only the latest text is shown, so fast updates are coalesced.
+        """
+        self.pending_status = text
+    
+    def call_in_ui(self, func, *args):
+        """Run func on the Tk thread once the queued log lines are shown"""
+        self.ui_calls.put((func, args))
+    
+    def drain_ui_queues(self):
+        """Apply queued log lines, status text and callbacks in one batch"""
+        lines = []
+        try:
+            while len(lines) < LOG_BATCH_SIZE:
+                lines.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if lines:
+            self.log_text.insert(tk.END, "".join(lines))
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > MAX_LOG_LINES:
+                self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES + 1}.0")
+            self.log_text.see(tk.END)
+        
+        status, self.pending_status = self.pending_status, None
+        if status is not None:
+            self.status_var.set(status)
+        
+        with self.pending_rows_lock:
+            rows, self.pending_rows = self.pending_rows, {}
+        if rows:
+            self.set_row_stats(rows.values())
+        
+        # Callbacks run only after every log line queued before them is shown
+        backlog = not self.log_queue.empty()
+        if not backlog:
+            try:
+                while True:
+                    func, args = self.ui_calls.get_nowait()
+                    func(*args)
+            except queue.Empty:
+                pass
+        
+        self.root.after(1 if backlog else LOG_POLL_MS, self.drain_ui_queues)
+    
+    def expand_path(self, path):
+        """Expand environment variables in path"""
+        return expand_path(path)
+    
+    def selected_targets(self):
+        """Return the targets whose checkboxes are ticked"""
+        targets = []
+        for section_name, paths in self.cleanup_sections.items():
+            for entry in paths:
+                path, description, policy = split_entry(entry)
+                if (section_name, path) in self.checked:
+                    targets.append(Target(section_name, path, description, policy))
+        return targets
+    
+    def begin_run(self):
+        """Create the RunControl for a new run and enable pause/cancel"""
+        self.control = RunControl()
+        self.pause_btn.config(state='normal', text='⏸ Pause')
+        self.cancel_btn.config(state='normal')
+        return self.control
+    
+    def end_run(self):
+        """Disable pause/cancel once the run has finished"""
+        self.control = None
+        self.pause_btn.config(state='disabled', text='⏸ Pause')
+        self.cancel_btn.config(state='disabled')
+        self.progress.stop()
+        self.progress.config(mode='indeterminate', value=0)
+    
+    def toggle_pause(self):
+        """Pause or resume the active run"""
+        if self.control is None:
+            return
+        if self.control.paused:
+            self.control.resume()
+            self.pause_btn.config(text='⏸ Pause')
+            self.log_message("▶️ Resumed")
+        else:
+            self.control.pause()
+            self.pause_btn.config(text='▶ Resume')
+            self.log_message("⏸️ Paused")
+    
+    def cancel_run(self):
+        """Cancel the active run at its next checkpoint"""
+        if self.control is None:
+            return
+        self.control.cancel()
+        self.pause_btn.config(state='disabled', text='⏸ Pause')
+        self.cancel_btn.config(state='disabled')
+        self.set_status("Cancelling...")
+    
+    def update_progress(self):
+        """Refresh the progress bar, throughput and ETA of the cleanup"""
+        if not self.is_cleaning or self.control is None:
+            return
+        snapshot = self.control.snapshot()
+        self.progress.config(value=snapshot.fraction * 100)
+        
+        if snapshot.paused:
+            text = f"Paused at {snapshot.fraction:.0%}"
+        elif self.control.cancelled:
+            text = "Cancelling..."
+        else:
+            text = (f"Cleaning... {snapshot.fraction:.0%} • "
+                    f"{snapshot.items_per_second:,.0f} items/s • "
+                    f"{snapshot.bytes_per_second / (1024 * 1024):.1f} MB/s")
+            if snapshot.eta is not None:
+                text += f" • ETA {format_eta(snapshot.eta)}"
+        self.status_var.set(text)
+        self.root.after(PROGRESS_POLL_MS, self.update_progress)
+    
+    def open_index(self):
+        """Open the persistent scan index, or return None if unavailable"""
+        from .index import ScanIndex
+        try:
+            return ScanIndex()
+        except Exception as e:
+            self.log_message(f"⚠️ Scan index unavailable, listing everything: {str(e)}")
+            return None
+    
+    def open_history(self):
+        """Open the run history, or return None if unavailable"""
+        from .history import RunHistory
+        try:
+            return RunHistory()
+        except Exception as e:
+            self.log_message(f"⚠️ Run history unavailable, this run is not recorded: {str(e)}")
+            return None
+    
+    def scan_worker(self, targets, control):
+        """Worker thread for scan operations"""
+        report = None
+        try:
+            engine = CleanupEngine(log=self.log_message, control=control,
+                                   index=self.open_index(), history=self.open_history())
+            report = engine.scan(targets, progress=self.scan_progress)
+        except Exception as e:
+            self.log_message(f"❌ Scan error: {str(e)}")
+        finally:
+            self.call_in_ui(self.scan_finished, report)
+    
+    def scan_progress(self, result):
+        """Show the running totals of the target being scanned"""
+        text = (f"Scanning {result.target.description}: {result.files} files, "
+                f"{format_size(result.bytes)}...")
+        self.set_status(text)
+        # Coalesced like the status text: the row shows the latest totals
+        with self.pending_rows_lock:
+            self.pending_rows[result.target.key] = result
+    
+    def start_scan(self):
+        """Start measuring the selected targets"""
+        if self.is_cleaning or self.is_scanning:
+            return
+        
+        targets = self.selected_targets()
+        if not targets:
+            messagebox.showinfo("Nothing Selected", "Select at least one path to scan.")
+            return
+        
+        self.is_scanning = True
+        self.last_scan = None
+        self.scan_btn.config(state='disabled', text='Scanning...')
+        self.clean_btn.config(state='disabled')
+        self.progress.start()
+        self.status_var.set("Scanning...")
+        self.log_text.delete(1.0, tk.END)
+        self.clear_row_stats(targets)
+        
+        scan_thread = threading.Thread(target=self.scan_worker,
+                                       args=(targets, self.begin_run()))
+        scan_thread.daemon = True
+        scan_thread.start()
+    
+    def scan_finished(self, report):
+        """Called when the scan is finished"""
+        self.is_scanning = False
+        self.last_scan = report
+        self.pending_status = None
+        self.scan_btn.config(state='normal', text='🔎 Scan')
+        self.clean_btn.config(state='normal')
+        cancelled = self.control is not None and self.control.cancelled
+        self.end_run()
+        with self.pending_rows_lock:
+            self.pending_rows = {}
+        if report is not None:
+            self.set_row_stats(report.results)
+        if cancelled:
+            # A partial scan must not be mistaken for the full picture
+            self.last_scan = None
+            self.status_var.set("Scan cancelled")
+        elif report is not None:
+            self.status_var.set(f"Estimated reclaimable space: {format_size(report.bytes)} "
+                                f"({report.files} files, {report.dirs} folders)")
+        else:
+            self.status_var.set("Scan failed")
+    
+    def matching_scan(self, targets):
+        """Return the last scan if it covers exactly these targets"""
+        if self.last_scan is None:
+            return None
+        scanned = [result.target.key for result in self.last_scan.results]
+        if scanned != [target.key for target in targets]:
+            return None
+        return self.last_scan
+    
+    def cleanup_worker(self, targets, scans, control, fast_delete, archive):
+        """Worker thread for cleanup operations"""
+        report = None
+        try:
+            engine = CleanupEngine(log=self.log_message, control=control,
+                                   index=self.open_index(), history=self.open_history(),
+                                   stager=Stager() if fast_delete else None,
+                                   retry=RetryQueue(),
+                                   archive=Archive() if archive else None)
+            try:
+                report = engine.run(targets, scans)
+            finally:
+                if engine.archive is not None:
+                    engine.archive.close()
+        except Exception as e:
+            self.log_message(f"❌ Cleanup error: {str(e)}")
+        finally:
+            # Re-enable UI
+            self.call_in_ui(self.cleanup_finished, report)
+    
+    def start_cleanup(self):
+        """Start the cleanup process"""
+        if self.is_cleaning or self.is_scanning:
+            return
+        
+        targets = self.selected_targets()
+        scans = self.matching_scan(targets)
+        if scans is not None:
+            estimate = (f"Estimated reclaimable space: {format_size(scans.bytes)} "
+                        f"in {scans.files} files and {scans.dirs} folders.\n\n")
+        else:
+            estimate = ""
+        
+        if self.archive_var.get():
+            outcome = (f"Deleted files are first copied into an archive in "
+                       f"{default_archive_dir()}; the last {ARCHIVE_KEEP} archives are kept.")
+        else:
+            outcome = "This will permanently delete selected temporary files."
+        
+        # Confirm cleanup
+        if not messagebox.askyesno("Confirm Cleanup", 
+                                  "Are you sure you want to start the cleanup process?\n\n"
+                                  + estimate + outcome):
+            return
+        
+        # Disable UI and start progress
+        self.is_cleaning = True
+        self.last_scan = None
+        self.clean_btn.config(state='disabled', text='Cleaning...')
+        self.scan_btn.config(state='disabled')
+        self.progress.config(mode='determinate', value=0)
+        self.status_var.set("Cleaning in progress...")
+        
+        # Clear log
+        self.log_text.delete(1.0, tk.END)
+        
+        # Start cleanup in separate thread
+        cleanup_thread = threading.Thread(target=self.cleanup_worker,
+                                          args=(targets, scans, self.begin_run(),
+                                                self.fast_delete_var.get(),
+                                                self.archive_var.get()))
+        cleanup_thread.daemon = True
+        cleanup_thread.start()
+        self.update_progress()
+    
+    def resume_purge(self):
+        """Restart the background purge if staged folders are left over"""
+        try:
+            if StagingArea().pending():
+                start_purge()
+                self.log_message("🧺 Purging folders staged by an earlier cleanup in the background")
+        except OSError as e:
+            self.log_message(f"⚠️ Could not start the background purge: {str(e)}")
+    
+    def cleanup_finished(self, report=None):
+        """Called when cleanup is finished"""
+        self.is_cleaning = False
+        self.pending_status = None
+        self.clean_btn.config(state='normal', text='🧹 Start Cleanup')
+        self.scan_btn.config(state='normal')
+        self.end_run()
+        if report is not None:
+            # The scanned figures of cleaned targets no longer hold
+            self.clear_row_stats([result.target for result in report.results])
+        
+        if report is not None and report.cancelled:
+            self.status_var.set(f"Cleanup cancelled ({report.deleted} items deleted)")
+            messagebox.showinfo("Cleanup Cancelled",
+                                f"The cleanup was cancelled.\n\n"
+                                f"{report.deleted} items were deleted before it stopped. "
+                                "Check the log for detailed results.")
+            return
+        
+        self.status_var.set("Cleanup completed")
+        
+        messagebox.showinfo("Cleanup Complete", 
+                          "Temporary files cleanup has been completed!\n\n"
+                          "Check the log for detailed results.")
+
+
+class ToolTip:
+    """
+    One tooltip window shared by every widget
+
+    The window is created once and only relabelled and moved on hover.
+    ``text`` may be a callable, evaluated when the tooltip is shown.
+    """
+    def __init__(self, root):
+        self.tooltip_window = tk.Toplevel(root)
+        self.tooltip_window.withdraw()
+        
+        # Make it stay on top
+        self.tooltip_window.wm_overrideredirect(True)
+        
+        # Create tooltip content
+        self.label = ttk.Label(self.tooltip_window,
+                               background="#ffffee", relief="solid", borderwidth=1,
+                               wraplength=300, justify="left", padding=(5, 3))
+        self.label.pack()
+    
+    def attach(self, widget, text):
+        """Show text while the mouse is over widget"""
+        widget.bind("<Enter>", lambda event: self.on_enter(widget, text))
+        widget.bind("<Leave>", self.on_leave)
+    
+    def on_enter(self, widget, text):
+        """Show tooltip on mouse enter"""
+        self.show(widget.winfo_rootx() + 25, widget.winfo_rooty() + 25,
+                  text() if callable(text) else text)
+    
+    def show(self, x, y, text):
+        """Show text at screen position x, y"""
+        self.label.configure(text=text)
+        self.tooltip_window.wm_geometry(f"+{x}+{y}")
+        self.tooltip_window.deiconify()
+        self.tooltip_window.lift()
+    
+    def on_leave(self, event=None):
+        """Hide tooltip on mouse leave"""
+        self.tooltip_window.withdraw()
+
+
+def main():
+    """Main application entry point"""
+    # Use themed tk if available for a more modern look
+    root = create_root()
+    
+    # Set application icon (if available)
+    try:
+        root.iconbitmap('bat_broom.ico')
+    except:
+        pass  # Icon file not found, use default
+    
+    # Create and run application
+    app = BatBroomApp(root)
+    
+    # Center window on screen
+    root.update_idletasks()
+    x = (root.winfo_screenwidth() // 2) - (root.winfo_width() // 2)
+    y = (root.winfo_screenheight() // 2) - (root.winfo_height() // 2)
+    root.geometry(f'+{x}+{y}')
+    
+    probe = os.environ.get(STARTUP_PROBE_VARIABLE)
+    if probe:
+        root.update()
+        with open(probe, "w") as f:
+            f.write(repr(time.time()))
+        root.destroy()
+        return
+    
+    root.mainloop()
@@ -0,0 +1,229 @@
+"""
+Run history for Bat Broom
+Records every scanned and cleaned target in SQLite and estimates how fast each one refills
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from .catalog import state_dir
+
+HISTORY_FILENAME = "history.sqlite3"
+
+# Rows older than this are dropped when the history is opened
+HISTORY_DAYS = 365
+
+# Cleanups averaged into a target's growth rate
+GROWTH_CLEANS = 5
+
+DAY = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    run TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    operation TEXT NOT NULL,
+    root TEXT NOT NULL,
+    section TEXT NOT NULL,
+    target TEXT NOT NULL,
+    path TEXT NOT NULL,
+    wall_seconds REAL NOT NULL,
+    files INTEGER NOT NULL,
+    dirs INTEGER NOT NULL,
+    bytes INTEGER,
+    failed INTEGER NOT NULL,
+    ok INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_target ON results (root, section, target, timestamp);
+"""
+
+
+def history_key(target):
+    """Return the (root, section, description) a target is recorded under"""
+    return (target.root.name if target.root is not None else "", target.section,
+            target.description)
+
+
+class TargetGrowth:
+    """What the history knows about one target
+
+    ``bytes_per_day`` is the space freed by the last cleanups divided by
+    the time between them, None until a target was cleaned twice with
+    its sizes measured. ``last_bytes`` is None when the last cleanup did
+    not measure them; ``last_seconds`` is its wall time.
+    """
+
+    def __init__(self, key, cleans, last_clean, last_bytes, last_seconds, bytes_per_day,
+                 scanned_at=None, scanned_bytes=None):
+        self.root, self.section, self.target = key
+        self.cleans = cleans
+        self.last_clean = last_clean
+        self.last_bytes = last_bytes
+        self.last_seconds = last_seconds
+        self.bytes_per_day = bytes_per_day
+        self.scanned_at = scanned_at
+        self.scanned_bytes = scanned_bytes
+
+    @property
+    def key(self):
+        return (self.root, self.section, self.target)
+
+    def estimate(self, now=None):
+        """Return the bytes expected in the target now, or None if unknown
+
+        A scan newer than the last cleanup is taken as it is, plus what
+        the target grew since; otherwise the growth since the last
+        cleanup, or the last cleanup's yield while no rate is known.
+        """
+        now = time.time() if now is None else now
+        rate = (self.bytes_per_day or 0) / DAY
+        if self.scanned_at is not None and (self.last_clean is None
+                                            or self.scanned_at > self.last_clean):
+            return int(self.scanned_bytes + rate * (now - self.scanned_at))
+        if self.last_clean is None:
+            return None
+        if self.bytes_per_day is None:
+            return self.last_bytes
+        return int(rate * (now - self.last_clean))
+
+    def to_dict(self, now=None):
+        return {
+            "root": self.root or None,
+            "section": self.section,
+            "target": self.target,
+            "cleans": self.cleans,
+            "last_clean": self.last_clean,
+            "last_bytes": self.last_bytes,
+            "last_seconds": self.last_seconds,
+            "bytes_per_day": self.bytes_per_day,
+            "estimated_bytes": self.estimate(now),
+        }
+
+
+class RunHistory:
+    """SQLite store of the results of every run, one row per target
+
+    Add it to a CleanupEngine as ``history`` (or as a metrics hook) and
+    every TargetMetrics is recorded under this run. The history never
+    makes a run read file sizes: cleanups that did not measure them are
+    recorded without bytes. Safe to share between threads.
+    """
+
+    def __init__(self, path=None, keep_days=HISTORY_DAYS):
+        if path is None:
+            path = os.path.join(state_dir(), HISTORY_FILENAME)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.run = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            if keep_days:
+                self._connection.execute("DELETE FROM results WHERE timestamp < ?",
+                                         (time.time() - keep_days * DAY,))
+
+    def __call__(self, metrics):
+        """Record one TargetMetrics"""
+        if metrics.operation == "clean":
+            files, dirs = metrics.files_deleted, metrics.dirs_deleted
+        else:
+            files, dirs = metrics.files_visited, metrics.dirs_visited
+        nbytes = metrics.bytes if metrics.bytes_measured else None
+        row = (self.run, metrics.timestamp, metrics.operation, metrics.root or "",
+               metrics.section, metrics.target, metrics.path, metrics.wall_seconds, files, dirs,
+               nbytes, metrics.files_failed + metrics.dirs_failed, int(metrics.ok))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO results (run, timestamp, operation, root, section, target, path, "
+                "wall_seconds, files, dirs, bytes, failed, ok) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def growth(self):
+        """Return a TargetGrowth for every recorded target, fastest-growing first"""
+        with self._lock:
+            cleans = self._connection.execute(
+                "SELECT root, section, target, timestamp, bytes, wall_seconds FROM results "
+                "WHERE operation = 'clean' AND ok ORDER BY timestamp DESC").fetchall()
+            scans = self._connection.execute(
+                "SELECT root, section, target, MAX(timestamp), bytes FROM results "
+                "WHERE operation = 'scan' AND ok GROUP BY root, section, target").fetchall()
+
+        # Newest first, at most GROWTH_CLEANS + 1 per target
+        by_target = {}
+        for root, section, target, timestamp, nbytes, seconds in cleans:
+            rows = by_target.setdefault((root, section, target), [])
+            if len(rows) <= GROWTH_CLEANS:
+                rows.append((timestamp, nbytes, seconds))
+        latest_scans = {(root, section, target): (timestamp, nbytes)
+                        for root, section, target, timestamp, nbytes in scans}
+
+        growth = []
+        for key in by_target.keys() | latest_scans.keys():
+            rows = by_target.get(key, [])
+            # What each measured cleanup freed accumulated since the one before it
+            freed = elapsed = 0
+            for (timestamp, nbytes, _), (previous, _, _) in zip(rows, rows[1:]):
+                if nbytes is not None:
+                    freed += nbytes
+                    elapsed += timestamp - previous
+            rate = freed / elapsed * DAY if elapsed > 0 else None
+            scanned_at, scanned_bytes = latest_scans.get(key, (None, None))
+            last = rows[0] if rows else (None, None, None)
+            growth.append(TargetGrowth(key, len(rows), last[0], last[1], last[2], rate,
+                                       scanned_at, scanned_bytes))
+        growth.sort(key=lambda item: (item.bytes_per_day is None, -(item.bytes_per_day or 0),
+                                      item.key))
+        return growth
+
+    def estimates(self):
+        """Return the TargetGrowth of every recorded target by history_key"""
+        return {item.key: item for item in self.growth()}
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._connection.close()
+
+
+def schedule(targets, estimates, budget=None, workers=1, now=None):
+    """Order targets largest expected yield first
+
+    ``estimates`` maps history_key(target) to a TargetGrowth or to a
+    (bytes, seconds) pair. With a time ``budget`` in seconds, targets
+    are ordered by bytes per second of cleanup instead, and the ones
+    whose last cleanup would not fit in what is left of the budget
+    (shared by ``workers``) come last. Targets without history keep
+    their relative order after the known ones.
+    """
+    now = time.time() if now is None else now
+    known, unknown = [], []
+    for position, target in enumerate(targets):
+        estimate = estimates.get(history_key(target))
+        if isinstance(estimate, TargetGrowth):
+            estimate = (estimate.estimate(now), estimate.last_seconds)
+        nbytes, seconds = estimate if estimate is not None else (None, None)
+        if nbytes is None:
+            unknown.append(target)
+        else:
+            known.append((nbytes, seconds, position, target))
+
+    if budget is None:
+        known.sort(key=lambda item: (-item[0], item[2]))
+        return [item[3] for item in known] + unknown
+
+    # Unmeasured durations count as instant, so they are tried early
+    known.sort(key=lambda item: (-item[0] / max(item[1] or 0, 0.001), item[2]))
+    left = budget * max(1, workers)
+    fitting, too_long = [], []
+    for nbytes, seconds, position, target in known:
+        if (seconds or 0) <= left:
+            fitting.append(target)
+            left -= seconds or 0
+        else:
+            too_long.append(target)
+    return fitting + unknown + too_long
@@ -0,0 +1,110 @@
+"""
+Persistent scan index for Bat Broom
+Remembers directory states between runs so unchanged empty folders are not listed again
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from .catalog import state_dir
+
+INDEX_FILENAME = "scan-index.sqlite3"
+
+# A directory modified this close to the moment it was checked may have
+# changed again within the same timestamp tick (FAT has 2 s resolution),
+# so its recorded state is not trusted
+MTIME_GRANULARITY_NS = 2 * 1000 * 1000 * 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    entries INTEGER NOT NULL,
+    bytes INTEGER,
+    checked_ns INTEGER NOT NULL,
+    PRIMARY KEY (root, path)
+)
+"""
+
+
+class TargetIndex:
+    """Directory states of one target: the previous run's and this run's
+
+    Walkers ask can_skip() before listing a directory and call record()
+    for every directory that still exists after they are done with it.
+    A skipped directory is only known to be empty; whether it is removed
+    is left to the walker's current policy.
+    """
+
+    def __init__(self, previous=None):
+        self.previous = previous or {}
+        self.records = {}
+        self.skipped = 0
+        # Run start time: anything modified after it is never trusted
+        self.checked_ns = int(time.time() * 1e9)
+
+    def can_skip(self, path, st):
+        """Return True if path was empty last time and has not changed since"""
+        previous = self.previous.get(path)
+        if previous is None:
+            return False
+        mtime_ns, entries, nbytes, checked_ns = previous
+        if entries or st.st_mtime_ns != mtime_ns:
+            return False
+        if checked_ns - mtime_ns < MTIME_GRANULARITY_NS:
+            return False
+        self.records[path] = previous
+        self.skipped += 1
+        return True
+
+    def record(self, path, st, entries, nbytes=None):
+        """Remember the state of a directory for the next run"""
+        self.records[path] = (st.st_mtime_ns, entries, nbytes, self.checked_ns)
+
+
+class ScanIndex:
+    """SQLite store of TargetIndex records, keyed by expanded target path
+
+    With ``full`` set, previous records are ignored (everything is listed
+    again) but the index is still refreshed.
+    """
+
+    def __init__(self, path=None, full=False):
+        if path is None:
+            path = os.path.join(state_dir(), INDEX_FILENAME)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.full = full
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(_SCHEMA)
+
+    def target(self, root):
+        """Return a TargetIndex preloaded with the records of root"""
+        if self.full:
+            return TargetIndex()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, mtime_ns, entries, bytes, checked_ns FROM dirs WHERE root = ?",
+                (root,)).fetchall()
+        return TargetIndex({row[0]: tuple(row[1:]) for row in rows})
+
+    def store(self, root, target_index):
+        """Replace the records of root with those of a finished walk"""
+        rows = [(root, path) + record for path, record in target_index.records.items()]
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM dirs WHERE root = ?", (root,))
+            self._connection.executemany(
+                "INSERT INTO dirs (root, path, mtime_ns, entries, bytes, checked_ns) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,213 @@
+"""
+Target pattern matcher for Bat Broom
+Compiles expanded catalog paths into a prefix trie resolved in a single traversal
+"""
+
+import fnmatch
+import os
+
+# A last component matching everything: the folder's contents are the target.
+# Windows treats *.* as "every name", dotted or not.
+CONTENTS_PATTERNS = ("*", "*.*")
+
+
+def _is_wildcard(part):
+    """Return True if a path component contains wildcard characters"""
+    return "*" in part or "?" in part or "[" in part
+
+
+def split_pattern(path):
+    """Split an expanded path into its anchor (drive and root) and components"""
+    drive, rest = os.path.splitdrive(path)
+    anchor = drive
+    while rest[:1] in (os.sep, os.altsep or os.sep) and rest:
+        anchor += rest[0]
+        rest = rest[1:]
+    return anchor, [part for part in rest.split(os.sep) if part]
+
+
+class _Node:
+    """One component position in the trie"""
+
+    __slots__ = ("literals", "wildcards", "exact", "contents")
+
+    def __init__(self):
+        self.literals = {}   # normcased name -> (name, _Node)
+        self.wildcards = {}  # pattern -> _Node
+        self.exact = []      # keys whose pattern ends exactly at this path
+        self.contents = []   # keys whose target is this folder's contents
+
+    def child(self, part):
+        """Return the node for a component, creating it if needed"""
+        if part in CONTENTS_PATTERNS:
+            # As on Windows, *.* also matches names without a dot
+            part = "*"
+        if _is_wildcard(part):
+            return self.wildcards.setdefault(part, _Node())
+        key = os.path.normcase(part)
+        if key not in self.literals:
+            self.literals[key] = (part, _Node())
+        return self.literals[key][1]
+
+    @property
+    def needs_children(self):
+        return bool(self.literals or self.wildcards or self.contents)
+
+
+class PatternTrie:
+    """Expanded catalog paths sharing their common prefixes
+
+    add() registers a path under a key and resolve() walks the file system
+    once for all of them. Every folder is listed at most once, and only
+    where a wildcard component needs it; literal components cost a single
+    existence check. The result maps each key to the same
+    ``(path, contents_only)`` pairs CleanupEngine.resolve_roots returns.
+    """
+
+    def __init__(self):
+        self._anchors = {}
+        self._keys = []
+
+    def add(self, key, path):
+        """Register the expanded path of a target under key"""
+        self._keys.append(key)
+        anchor, parts = split_pattern(path)
+        node = self._anchors.setdefault(anchor, _Node())
+        if parts and parts[-1] in CONTENTS_PATTERNS:
+            for part in parts[:-1]:
+                node = node.child(part)
+            node.contents.append(key)
+            return
+        for part in parts:
+            node = node.child(part)
+        node.exact.append(key)
+
+    def resolve(self):
+        """Return {key: [(path, contents_only), ...]} for every added path"""
+        results = {key: [] for key in self._keys}
+        listings = {}
+        stack = [(anchor, node) for anchor, node in self._anchors.items()]
+        seen = set()
+        while stack:
+            path, node = stack.pop()
+            if (path, id(node)) in seen:
+                continue
+            seen.add((path, id(node)))
+
+            for key in node.exact:
+                results[key].append((path, False))
+            if not node.needs_children:
+                continue
+            if node.contents:
+                if not os.path.isdir(path or os.curdir):
+                    continue
+                for key in node.contents:
+                    results[key].append((path, True))
+
+            if node.wildcards:
+                entries = self._list(path, listings)
+                names = {os.path.normcase(entry.name): entry for entry in entries}
+                for normalized, (name, child) in node.literals.items():
+                    entry = names.get(normalized)
+                    if entry is not None:
+                        stack.append((entry.path, child))
+                for pattern, child in node.wildcards.items():
+                    for entry in entries:
+                        if not fnmatch.fnmatch(entry.name, pattern):
+                            continue
+                        if child.needs_children and not child.exact and not entry.is_dir():
+                            continue
+                        stack.append((entry.path, child))
+            else:
+                for name, child in node.literals.values():
+                    child_path = os.path.join(path, name)
+                    if os.path.lexists(child_path):
+                        stack.append((child_path, child))
+
+        for key in results:
+            results[key].sort()
+        return results
+
+    @staticmethod
+    def _list(path, listings):
+        """List a folder once, returning [] if it cannot be listed"""
+        if path not in listings:
+            try:
+                with os.scandir(path or os.curdir) as scandir_it:
+                    listings[path] = list(scandir_it)
+            except OSError:
+                listings[path] = []
+        return listings[path]
+
+
+def _identity(path):
+    """Return (canonical path, file id) of an existing path"""
+    real = os.path.normcase(os.path.realpath(path))
+    try:
+        st = os.stat(path)
+        file_id = (st.st_dev, st.st_ino) if st.st_ino else None
+    except OSError:
+        file_id = None
+    return real, file_id
+
+
+def _covers(outer, inner):
+    """Return True if deleting root ``outer`` also deletes root ``inner``
+
+    Roots are (canonical path, file id, contents_only) triples.
+    """
+    outer_path, outer_id, outer_contents = outer
+    inner_path, inner_id, inner_contents = inner
+    same = outer_path == inner_path or (outer_id is not None and outer_id == inner_id)
+    if same:
+        # A whole folder covers its contents, contents never cover the folder
+        return inner_contents or not outer_contents
+    return inner_path.startswith(outer_path.rstrip(os.sep) + os.sep)
+
+
+def coalesce_roots(items):
+    """Drop roots that another target already deletes
+
+    ``items`` is a list of (key, roots, group) in execution order, where
+    roots are (path, contents_only) pairs and only targets of the same
+    group (e.g. the same policy) are merged. Paths are compared by their
+    canonical real path and file id, so junctions, symlinks and aliases
+    of one folder are recognised. A root identical to an earlier one is
+    dropped; a root nested in another target's root is dropped whatever
+    the order.
+
+    Returns ``(roots, covered)``: the remaining roots per key, and per key
+    the keys of the targets that cover its dropped roots.
+    """
+    identities = {}
+    for key, roots, group in items:
+        identities[key] = [(_identity(path) + (contents_only,), (path, contents_only))
+                           for path, contents_only in roots]
+
+    order = {key: position for position, (key, roots, group) in enumerate(items)}
+    groups = {key: group for key, roots, group in items}
+    remaining = {}
+    covered = {}
+    for key, roots, group in items:
+        kept = []
+        for identity, root in identities[key]:
+            owner = None
+            for other, other_roots in identities.items():
+                if other == key or groups[other] != group:
+                    continue
+                for other_identity, _ in other_roots:
+                    if not _covers(other_identity, identity):
+                        continue
+                    if _covers(identity, other_identity) and order[other] > order[key]:
+                        # Identical roots: the first target keeps it
+                        continue
+                    owner = other
+                    break
+                if owner is not None:
+                    break
+            if owner is None:
+                kept.append(root)
+            elif owner not in covered.setdefault(key, []):
+                covered[key].append(owner)
+        remaining[key] = kept
+    return remaining, covered
@@ -0,0 +1,184 @@
+"""
+Per-target metrics for Bat Broom
+Machine-readable timings and counts, exportable as JSON lines or a Prometheus text file
+"""
+
+import json
+import os
+import threading
+import time
+
+
+def _root_name(target):
+    """Return the name of a target's root, or None"""
+    return target.root.name if target.root is not None else None
+
+
+class TargetMetrics:
+    """Timings and counts of one scanned or cleaned target
+
+    ``bytes`` is the space freed by a cleanup or found by a scan, and
+    ``errnos`` maps errno names such as EACCES to failure counts.
+    ``root`` names the profile or image root of multi-root runs.
+    ``throttled_seconds`` is the time a cleanup waited on its IoThrottle.
+    ``bytes_measured`` is False when a cleanup did not read file sizes,
+    so ``bytes`` only counts the sizes it happened to know.
+    """
+
+    FIELDS = (
+        "files_visited", "dirs_visited", "files_deleted", "dirs_deleted",
+        "files_skipped", "dirs_skipped", "files_failed", "dirs_failed", "dirs_staged", "bytes",
+        "throttled_seconds",
+    )
+
+    def __init__(self, operation, section, target, path, wall_seconds, ok=True, root=None):
+        self.operation = operation
+        self.root = root
+        self.section = section
+        self.target = target
+        self.path = path
+        self.wall_seconds = wall_seconds
+        self.ok = ok
+        self.timestamp = time.time()
+        self.bytes_measured = True
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+        self.errnos = {}
+
+    @classmethod
+    def from_scan(cls, result):
+        """Build the metrics of a ScanResult"""
+        stats = result.stats
+        metrics = cls("scan", result.target.section, result.target.description, result.path,
+                      result.wall_seconds, ok=not result.message.startswith("Error"),
+                      root=_root_name(result.target))
+        metrics.files_visited = stats.files
+        metrics.dirs_visited = stats.dirs
+        metrics.files_skipped = stats.skipped
+        metrics.files_failed = stats.errors
+        metrics.bytes = stats.bytes
+        metrics.errnos = dict(stats.errnos)
+        return metrics
+
+    @classmethod
+    def from_clean(cls, result):
+        """Build the metrics of a TargetResult"""
+        stats = result.stats
+        metrics = cls("clean", result.target.section, result.target.description, result.path,
+                      result.wall_seconds, ok=result.ok, root=_root_name(result.target))
+        metrics.files_deleted = stats.files_deleted
+        metrics.dirs_deleted = stats.dirs_deleted
+        metrics.files_skipped = stats.files_skipped
+        metrics.dirs_skipped = stats.dirs_skipped
+        metrics.files_failed = stats.files_failed
+        metrics.dirs_failed = stats.dirs_failed
+        metrics.dirs_staged = stats.dirs_staged
+        metrics.files_visited = stats.files_deleted + stats.files_skipped + stats.files_failed
+        metrics.dirs_visited = stats.dirs_deleted + stats.dirs_skipped + stats.dirs_failed
+        metrics.bytes = stats.bytes_freed
+        metrics.throttled_seconds = round(stats.throttled_seconds, 6)
+        metrics.bytes_measured = result.bytes_measured
+        metrics.errnos = dict(stats.errnos)
+        return metrics
+
+    def to_dict(self):
+        """Return the metrics as a plain dictionary"""
+        return {
+            "timestamp": round(self.timestamp, 3),
+            "operation": self.operation,
+            "root": self.root,
+            "section": self.section,
+            "target": self.target,
+            "path": self.path,
+            "ok": self.ok,
+            "wall_seconds": round(self.wall_seconds, 6),
+            **{field: getattr(self, field) for field in self.FIELDS},
+            "bytes_measured": self.bytes_measured,
+            "errnos": dict(self.errnos),
+        }
+
+
+class MetricsCollector:
+    """Metrics hook that keeps every TargetMetrics it receives"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.metrics = []
+
+    def __call__(self, metrics):
+        with self._lock:
+            self.metrics.append(metrics)
+
+
+class JsonLinesExporter:
+    """Metrics hook that appends one JSON object per target to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, metrics):
+        line = json.dumps(metrics.to_dict(), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def _label_value(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    """Format a Prometheus label set, leaving out a root of None"""
+    if labels.get("root") is None:
+        labels.pop("root", None)
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+PROMETHEUS_METRICS = (
+    ("wall_seconds", "duration_seconds", "Wall time spent on the target"),
+    ("files_visited", "files_visited", "Files reached by the walk"),
+    ("dirs_visited", "dirs_visited", "Folders reached by the walk"),
+    ("files_deleted", "files_deleted", "Files deleted"),
+    ("dirs_deleted", "dirs_deleted", "Folders deleted"),
+    ("files_skipped", "files_skipped", "Files kept by the cleanup policy"),
+    ("dirs_skipped", "dirs_skipped", "Folders kept by the cleanup policy"),
+    ("files_failed", "files_failed", "Files that could not be deleted or measured"),
+    ("dirs_failed", "dirs_failed", "Folders that could not be deleted"),
+    ("dirs_staged", "dirs_staged", "Folders moved to staging for a background purge"),
+    ("bytes", "bytes", "Bytes freed by a cleanup or found by a scan"),
+    ("throttled_seconds", "throttled_seconds", "Time a cleanup waited on the I/O throttle"),
+)
+
+
+def write_prometheus(path, metrics):
+    """Write metrics in the Prometheus text format for a textfile collector
+
+    The file is replaced atomically so a collector never reads half of it.
+    """
+    lines = []
+    for attribute, name, help_text in PROMETHEUS_METRICS:
+        lines.append(f"# HELP bat_broom_target_{name} {help_text}")
+        lines.append(f"# TYPE bat_broom_target_{name} gauge")
+        for item in metrics:
+            labels = _labels(operation=item.operation, root=item.root, section=item.section,
+                             target=item.target)
+            lines.append(f"bat_broom_target_{name}{labels} {getattr(item, attribute)}")
+
+    lines.append("# HELP bat_broom_target_errors Failures by errno")
+    lines.append("# TYPE bat_broom_target_errors gauge")
+    for item in metrics:
+        for errno_name, count in sorted(item.errnos.items()):
+            labels = _labels(operation=item.operation, root=item.root, section=item.section,
+                             target=item.target, errno=errno_name)
+            lines.append(f"bat_broom_target_errors{labels} {count}")
+
+    lines.append("# HELP bat_broom_last_run_timestamp_seconds When the metrics were written")
+    lines.append("# TYPE bat_broom_last_run_timestamp_seconds gauge")
+    lines.append(f"bat_broom_last_run_timestamp_seconds {time.time():.3f}")
+
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temporary, path)
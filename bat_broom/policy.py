@@ -0,0 +1,95 @@
+"""
+Cleanup policies for Bat Broom
+Age, size and name filters evaluated inside the directory walk
+"""
+
+import fnmatch
+import time
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class Policy:
+    """Decide which entries of a target may be deleted
+
+    ``min_age_days`` keeps files (and empty folders) modified more
+    recently than that, ``min_size`` keeps files smaller than that many
+    bytes and ``exclude`` is a list of name patterns such as ``*.lock``
+    that are never deleted; an excluded folder is not entered at all.
+    Name patterns are matched case-insensitively, like Windows does.
+
+    Only the stat result the directory walk already holds is used, so
+    filtering never costs an extra pass. A stat is needed at all only
+    when an age or size limit is set.
+    """
+
+    def __init__(self, min_age_days=0, min_size=0, exclude=()):
+        self.min_age_days = min_age_days
+        self.min_size = min_size
+        self.exclude = tuple(exclude)
+        self._exclude_lower = tuple(pattern.lower() for pattern in self.exclude)
+        self.cutoff = None
+        self.refresh()
+
+    def refresh(self, now=None):
+        """Fix the age cutoff at the start of a run"""
+        if now is None:
+            now = time.time()
+        self.cutoff = now - self.min_age_days * SECONDS_PER_DAY if self.min_age_days else None
+
+    @property
+    def needs_stat(self):
+        """True if decisions require the entry's stat result"""
+        return bool(self.min_age_days or self.min_size)
+
+    def excludes(self, name):
+        """Return True if a name matches one of the exclude patterns"""
+        if not self._exclude_lower:
+            return False
+        name = name.lower()
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in self._exclude_lower)
+
+    def allows_file(self, st):
+        """Return True if a file with this stat result may be deleted"""
+        if self.min_size and st.st_size < self.min_size:
+            return False
+        if self.cutoff is not None and st.st_mtime > self.cutoff:
+            return False
+        return True
+
+    def allows_dir(self, st):
+        """Return True if an emptied folder with this stat result may be removed"""
+        return self.cutoff is None or st.st_mtime <= self.cutoff
+
+    def merge(self, other):
+        """Return a policy at least as strict as both self and other"""
+        if other is None:
+            return self
+        return Policy(
+            min_age_days=max(self.min_age_days, other.min_age_days),
+            min_size=max(self.min_size, other.min_size),
+            exclude=self.exclude + tuple(p for p in other.exclude if p not in self.exclude),
+        )
+
+    def describe(self):
+        """Describe the policy in a short phrase"""
+        parts = []
+        if self.min_age_days:
+            parts.append(f"older than {self.min_age_days:g} days")
+        if self.min_size:
+            parts.append(f"at least {self.min_size} bytes")
+        if self.exclude:
+            parts.append("excluding " + ", ".join(self.exclude))
+        return ", ".join(parts) if parts else "everything"
+
+    def to_dict(self):
+        """Return the policy as a plain dictionary"""
+        return {
+            "min_age_days": self.min_age_days,
+            "min_size": self.min_size,
+            "exclude": list(self.exclude),
+        }
+
+    def __repr__(self):
+        return (f"Policy(min_age_days={self.min_age_days!r}, min_size={self.min_size!r}, "
+                f"exclude={list(self.exclude)!r})")
@@ -0,0 +1,198 @@
+"""
+Deferred retries for Bat Broom
+Re-attempts locked and in-use entries after the main pass, with exponential backoff
+"""
+
+import os
+import threading
+import time
+
+from .walker import TreeDeleter, errno_name
+
+# Seconds spent retrying after a cleanup, and the pauses between rounds
+RETRY_BUDGET = 10.0
+RETRY_INITIAL_DELAY = 0.5
+RETRY_MAX_DELAY = 4.0
+
+# Failures no amount of waiting fixes; ESTALE marks a folder that changed
+# since the scan, which must not be deleted by path behind the plan's back
+PERMANENT_ERRNOS = frozenset(("ENAMETOOLONG", "EROFS", "ELOOP", "EFBIG", "ESTALE"))
+
+# Access errors: retried once, since Windows reports a file held open by
+# another process as EACCES, and dropped if the retry is refused the same way
+DENIED_ERRNOS = frozenset(("EACCES", "EPERM"))
+
+# Windows sharing and lock violations, the EACCES worth waiting out
+SHARING_WINERRORS = frozenset((32, 33))
+
+# Windows MoveFileEx flag: delete the file when the machine restarts
+MOVEFILE_DELAY_UNTIL_REBOOT = 0x4
+
+
+class RetryQueue:
+    """Entries a cleanup could not delete, to be tried again in bulk
+
+    TreeDeleter adds every failure with the deleter that hit it, so a
+    successful retry moves the entry from failed to deleted in that
+    deleter's DeleteStats, and the target's counts stay exact. Safe to
+    share between threads.
+    """
+
+    def __init__(self, budget=RETRY_BUDGET, initial_delay=RETRY_INITIAL_DELAY,
+                 max_delay=RETRY_MAX_DELAY):
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.recovered = 0
+        self.denied = 0
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, path, is_dir, error, deleter):
+        """Queue an entry that failed with error"""
+        name = errno_name(error)
+        if name in PERMANENT_ERRNOS:
+            return
+        with self._lock:
+            self._entries.append((path, is_dir, name, deleter))
+
+    def run(self, control=None):
+        """Retry the queued entries until they are gone or the budget is spent
+
+        Rounds are separated by pauses doubling from ``initial_delay`` up
+        to ``max_delay``. Within a round, deeper entries go first and
+        files before folders, so a folder is retried once its contents
+        are gone. Entries refused access again are not retried further.
+        Stops early when ``control`` is cancelled. Returns the entries
+        that are still there.
+        """
+        with self._lock:
+            entries, self._entries = self._entries, []
+        deadline = time.monotonic() + self.budget
+        delay = self.initial_delay
+        denied = []
+        while entries:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._wait(min(delay, remaining), control):
+                break
+            entries.sort(key=lambda entry: (-entry[0].count(os.sep), entry[1]))
+            locked = []
+            for entry in entries:
+                outcome = self.retry(*entry)
+                if outcome == "locked":
+                    locked.append(entry)
+                elif outcome == "denied":
+                    denied.append(entry)
+            entries = locked
+            delay = min(delay * 2, self.max_delay)
+        self.denied += len(denied)
+        return denied + entries
+
+    @staticmethod
+    def _wait(seconds, control):
+        """Sleep, returning False if the run is cancelled meanwhile"""
+        end = time.monotonic() + seconds
+        while True:
+            if control is not None and control.cancelled:
+                return False
+            left = end - time.monotonic()
+            if left <= 0:
+                return True
+            time.sleep(min(left, 0.1))
+
+    def retry(self, path, is_dir, name, deleter):
+        """Try one entry again
+
+        Returns "gone" once it is deleted, "denied" if it was refused
+        access again with the same error, and "locked" otherwise.
+        """
+        stats = deleter.stats
+        if is_dir and name != "ENOTEMPTY":
+            # The folder could not be listed: walk it now, counting what goes
+            errors = FailureList()
+            scratch = TreeDeleter(policy=deleter.policy, audit=deleter.audit,
+                                  archive=deleter.archive, measure=deleter.measure,
+                                  throttle=deleter.throttle, retry=errors)
+            scratch.delete_path(path)
+            stats.files_deleted += scratch.stats.files_deleted
+            stats.bytes_freed += scratch.stats.bytes_freed
+            stats.throttled_seconds += scratch.stats.throttled_seconds
+            gone = not os.path.lexists(path)
+            # The folder itself is among scratch's deleted folders
+            stats.dirs_deleted += scratch.stats.dirs_deleted - gone
+            if not gone and errors and all(errno_name(error) == name and is_denied(error)
+                                           for error in errors):
+                return "denied"
+        else:
+            try:
+                st = os.lstat(path)
+                call = os.rmdir if is_dir else os.unlink
+                if not is_dir and deleter.archive is not None:
+                    deleter.archive.add(path)
+                if deleter.throttle is not None:
+                    deleter.throttled(call, path, size=0 if is_dir else st.st_size)
+                else:
+                    call(path)
+            except FileNotFoundError:
+                st = None
+            except OSError as e:
+                return "denied" if errno_name(e) == name and is_denied(e) else "locked"
+            if not is_dir and deleter.archive is not None:
+                deleter.archive.forget(path)
+            if st is not None:
+                if is_dir:
+                    stats.dirs_deleted += 1
+                else:
+                    stats.files_deleted += 1
+                    stats.bytes_freed += st.st_size
+                if deleter.audit is not None:
+                    deleter.audit.record(path, "dir" if is_dir else "file", "deleted",
+                                         None if is_dir else st.st_size, st.st_mtime)
+            gone = True
+        if not gone:
+            return "locked"
+        if is_dir:
+            stats.dirs_failed -= 1
+        else:
+            stats.files_failed -= 1
+        stats.errnos[name] -= 1
+        if stats.errnos[name] <= 0:
+            del stats.errnos[name]
+        with self._lock:
+            self.recovered += 1
+        return "gone"
+
+
+class FailureList(list):
+    """Stands in for a RetryQueue to collect the errors of one walk"""
+
+    def add(self, path, is_dir, error, deleter):
+        self.append(error)
+
+
+def is_denied(error):
+    """Return True for an access error that waiting does not fix"""
+    return (errno_name(error) in DENIED_ERRNOS
+            and getattr(error, "winerror", None) not in SHARING_WINERRORS)
+
+
+def delete_on_reboot(paths):
+    """Ask Windows to delete paths at the next restart, returning how many were accepted
+
+    Needs administrator rights; folders are only removed if they are
+    empty by then, so they must come after their contents. Does nothing
+    on other systems.
+    """
+    if os.name != "nt":
+        return 0
+    # Imported here: Windows only
+    import ctypes
+    move_file = ctypes.windll.kernel32.MoveFileExW
+    scheduled = 0
+    for path in paths:
+        if move_file(path, None, MOVEFILE_DELAY_UNTIL_REBOOT):
+            scheduled += 1
+    return scheduled
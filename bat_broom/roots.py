@@ -0,0 +1,100 @@
+"""
+Multi-root sweeps for Bat Broom
+Runs the catalog once per user profile or mounted Windows image
+"""
+
+import os
+import re
+
+from .walker import _is_real_dir
+
+# Profile folders that belong to no user; "Default User" and "All Users"
+# are junctions on real systems and skipped as links anyway
+SHARED_PROFILES = frozenset(("public", "default", "default user", "all users", "defaultapppool"))
+
+# Variables that point into a user profile; profile_environ sets them all
+USER_VARIABLES = ("USERPROFILE", "LOCALAPPDATA", "APPDATA", "TEMP", "TMP")
+
+_USER_VARIABLE_PATTERN = re.compile(r"%(?:" + "|".join(USER_VARIABLES) + r")%", re.IGNORECASE)
+
+
+class Root:
+    """One set of variables the catalog is expanded with
+
+    ``name`` identifies the root in logs and reports, usually the profile
+    folder, and ``environ`` replaces the process environment for every
+    target of the root. A root without a ``profile`` only takes the
+    system-wide targets.
+    """
+
+    def __init__(self, name, environ, profile=True):
+        self.name = name
+        self.environ = environ
+        self.profile = profile
+
+    def __repr__(self):
+        return f"Root({self.name!r})"
+
+
+def profile_environ(profile, base=None):
+    """Return base (os.environ by default) with the user variables pointed at profile"""
+    environ = dict(os.environ if base is None else base)
+    local = os.path.join(profile, "AppData", "Local")
+    temp = os.path.join(local, "Temp")
+    environ.update(USERPROFILE=profile, LOCALAPPDATA=local, TEMP=temp, TMP=temp,
+                   APPDATA=os.path.join(profile, "AppData", "Roaming"))
+    return environ
+
+
+def is_user_target(target):
+    """Return True if a target's path lies inside a user profile"""
+    return _USER_VARIABLE_PATTERN.search(target.pattern) is not None
+
+
+def list_profiles(users_dir):
+    """Return the user profile folders in users_dir, e.g. C:\\Users, in name order"""
+    profiles = []
+    with os.scandir(users_dir) as scandir_it:
+        for entry in scandir_it:
+            if _is_real_dir(entry) and entry.name.lower() not in SHARED_PROFILES:
+                profiles.append(entry.path)
+    return sorted(profiles, key=str.lower)
+
+
+def profile_roots(profiles, base=None):
+    """Return one Root per profile folder"""
+    return [Root(profile, profile_environ(profile, base)) for profile in profiles]
+
+
+def image_roots(image_root, base=None):
+    """Return the Roots of an offline Windows image mounted at image_root
+
+    The system variables point into the image and every profile under
+    its Users folder becomes a root. An image without profiles still
+    gets one root for the system-wide targets; the user variables are
+    removed from it so nothing can resolve to the running machine's
+    profile.
+    """
+    environ = dict(os.environ if base is None else base)
+    windows = os.path.join(image_root, "Windows")
+    environ.update(SystemRoot=windows, windir=windows, SystemDrive=image_root,
+                   ProgramData=os.path.join(image_root, "ProgramData"))
+    users_dir = os.path.join(image_root, "Users")
+    profiles = list_profiles(users_dir) if os.path.isdir(users_dir) else []
+    if not profiles:
+        for name in USER_VARIABLES:
+            environ.pop(name, None)
+        return [Root(image_root, environ, profile=False)]
+    return profile_roots(profiles, environ)
+
+
+def targets_for_roots(targets, roots):
+    """Repeat targets for every root, root by root
+
+    Targets that do not depend on the user, such as the system temp
+    folder, resolve to the same folder in every root and are merged into
+    the first root's target by CleanupEngine.resolve_targets. Roots
+    without a profile skip the targets inside a user profile.
+    """
+    return [target.for_root(root) for root in roots for target in targets
+            if root.profile or not is_user_target(target)]
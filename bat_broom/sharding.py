@@ -0,0 +1,158 @@
+"""
+Process-pool sharding for Bat Broom
+Splits one very large target into shards deleted by several processes
+"""
+
+import os
+
+from .audit import AuditSink
+from .walker import TreeDeleter, _is_real_dir
+
+# Targets with fewer entries than this are cleaned in-process, where
+# starting the pool would cost more than it saves
+SHARD_THRESHOLD = 50000
+
+# Top-level files are handed out in chunks of this many paths
+FILES_PER_SHARD = 2000
+
+# Shards queued per process, so a process that finishes early picks up
+# the next one instead of waiting for the slowest subtree
+SHARDS_IN_FLIGHT = 2
+
+
+def count_entries(dir_path, limit):
+    """Count the entries below dir_path, stopping once limit is reached"""
+    count = 0
+    stack = [dir_path]
+    while stack and count < limit:
+        try:
+            with os.scandir(stack.pop()) as scandir_it:
+                for entry in scandir_it:
+                    count += 1
+                    if _is_real_dir(entry):
+                        stack.append(entry.path)
+        except OSError:
+            continue
+    return count
+
+
+def plan_shards(dir_path):
+    """Split the contents of dir_path into lists of paths, one list per shard
+
+    Every top-level folder is a shard of its own; top-level files are
+    grouped FILES_PER_SHARD at a time.
+    """
+    shards = []
+    files = []
+    with os.scandir(dir_path) as scandir_it:
+        for entry in scandir_it:
+            if _is_real_dir(entry):
+                shards.append([entry.path])
+            else:
+                files.append(entry.path)
+    for start in range(0, len(files), FILES_PER_SHARD):
+        shards.append(files[start:start + FILES_PER_SHARD])
+    return shards
+
+
+class ShardFailures:
+    """Stands in for the RetryQueue inside a pool process
+
+    Collects the failures of a shard as (path, is_dir, errno, strerror)
+    so they can be sent back to the parent and queued there.
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, path, is_dir, error, deleter):
+        """Record an entry that failed with error"""
+        self.entries.append((path, is_dir, error.errno, error.strerror))
+
+
+def delete_shard(paths, policy=None, audit_settings=None, collect_failures=False, measure=False):
+    """Delete a list of files and folder trees, runs in a pool process
+
+    With ``audit_settings``, the shard writes its own audit file, named
+    after the main one with the process id added. Returns the shard's
+    DeleteStats and, with ``collect_failures``, the list of its failures.
+    """
+    audit = AuditSink.for_process(audit_settings) if audit_settings else None
+    failures = ShardFailures() if collect_failures else None
+    deleter = TreeDeleter(policy=policy, audit=audit, retry=failures, measure=measure)
+    try:
+        for path in paths:
+            deleter.delete_path(path)
+    finally:
+        if audit is not None:
+            audit.close()
+    if not deleter.sizes_known:
+        # delete_path saw the size of the top-level files only; report
+        # no bytes at all, like a walk that reads no sizes
+        deleter.stats.bytes_freed = 0
+    return deleter.stats, failures.entries if failures is not None else []
+
+
+def merge_shard(deleter, result):
+    """Merge a shard's result into deleter, queueing its failures for retry"""
+    stats, failures = result
+    deleter.stats.merge(stats)
+    if deleter.retry is not None:
+        for path, is_dir, number, strerror in failures:
+            deleter.retry.add(path, is_dir, OSError(number, strerror, path), deleter)
+    return stats
+
+
+def delete_contents_sharded(deleter, dir_path, processes):
+    """Delete everything inside dir_path on a pool of processes
+
+    Shards are pulled from a shared queue as processes become free, so
+    uneven subtrees balance out. Their counts are merged into
+    ``deleter.stats`` and their failures queued on ``deleter.retry``, if
+    any. The RunControl is only honoured between shards, since the pool
+    processes do not share it: pausing stops handing out new ones, and
+    cancelling waits for the running shards (whole top-level subtrees),
+    merges them and raises CleanupCancelled. Returns the number of
+    shards.
+    """
+    # Imported here: loading the pool machinery slows down every start
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    shards = plan_shards(dir_path)
+    pending = iter(shards)
+    audit_settings = deleter.audit.settings() if deleter.audit is not None else None
+    collect_failures = deleter.retry is not None
+    control = deleter.control
+    running = set()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        try:
+            while True:
+                while len(running) < processes * SHARDS_IN_FLIGHT:
+                    paths = next(pending, None)
+                    if paths is None:
+                        break
+                    if control is not None:
+                        control.checkpoint(0)
+                    running.add(executor.submit(delete_shard, paths, deleter.policy, audit_settings,
+                                                collect_failures, deleter.measure))
+                if not running:
+                    return len(shards)
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                items = nbytes = 0
+                for future in done:
+                    stats = merge_shard(deleter, future.result())
+                    items += stats.deleted + stats.failed + stats.skipped
+                    nbytes += stats.bytes_freed
+                if control is not None:
+                    control.checkpoint(items, nbytes)
+        except BaseException:
+            # Shards already running cannot be interrupted; count what they did
+            for future in running:
+                future.cancel()
+            for future in running:
+                if not future.cancelled():
+                    try:
+                        merge_shard(deleter, future.result())
+                    except Exception:
+                        pass
+            raise
@@ -0,0 +1,309 @@
+"""
+Rename-to-staging for Bat Broom
+Moves folders out of cleanup targets instantly and purges them later in a background process
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from .catalog import state_dir
+from .walker import TreeDeleter, _is_real_dir
+
+# Staging folder created next to a target when the state directory is on another volume
+STAGING_NAME = ".bat-broom-staging"
+
+# Files in the state directory listing the staging folders, guarding the list,
+# and held by the running purge
+MANIFEST_NAME = "staging.json"
+MANIFEST_LOCK_NAME = "staging.lock"
+PURGE_LOCK_NAME = "purge.lock"
+
+
+class FileLock:
+    """Exclusive lock on a file, shared between processes
+
+    Used as a context manager it waits for the lock; acquire(blocking=False)
+    returns False instead when another process holds it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """Take the lock, returning False if it is held and not blocking"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                # Imported here: Windows only
+                import msvcrt
+                mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), mode, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ten attempts
+                        if not blocking:
+                            raise
+            else:
+                # Imported here: POSIX only
+                import fcntl
+                fcntl.flock(self._file.fileno(),
+                            fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+        return True
+
+    def release(self):
+        """Give the lock up"""
+        if self._file is None:
+            return
+        if os.name == "nt":
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def _device(path):
+    """Return the st_dev of path, or of its nearest existing parent"""
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except FileNotFoundError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                raise
+            path = parent
+
+
+class StagingArea:
+    """Staging folders of one state directory and their manifest
+
+    The manifest lists every staging folder in use, so a purge started
+    after a crash or a reboot still finds them. Everything inside a
+    staging folder is garbage and may be deleted at any time.
+    """
+
+    def __init__(self, directory=None, environ=None):
+        self.directory = directory or state_dir(environ)
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+        self.lock = FileLock(os.path.join(self.directory, MANIFEST_LOCK_NAME))
+        self._thread_lock = threading.Lock()
+
+    def roots(self):
+        """Return the staging folders listed in the manifest"""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f).get("roots", [])
+        except (OSError, ValueError):
+            return []
+
+    def _write_roots(self, roots):
+        """Replace the manifest; the lock must be held"""
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"roots": roots}, f, indent=2)
+        os.replace(temporary, self.manifest_path)
+
+    def create_batch(self, root, name):
+        """Create root/name for a run's staged entries and list root in the manifest"""
+        with self._thread_lock, self.lock:
+            batch = os.path.join(root, name)
+            os.makedirs(batch, exist_ok=True)
+            roots = self.roots()
+            if root not in roots:
+                self._write_roots(roots + [root])
+        return batch
+
+    def forget_if_empty(self, root):
+        """Remove an emptied staging folder and drop it from the manifest
+
+        Returns True if the folder is gone.
+        """
+        with self._thread_lock, self.lock:
+            try:
+                os.rmdir(root)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                return False
+            self._write_roots([other for other in self.roots() if other != root])
+        return True
+
+    def pending(self):
+        """Return True if any staging folder still waits to be purged"""
+        return bool(self.roots())
+
+
+class Stager:
+    """Move the folders inside cleanup targets into a staging folder
+
+    A rename within one volume takes the same time however large the
+    folder is, so the target is logically clean at once. Each folder is
+    moved into a staging folder on the same volume: the state directory
+    if it is on that volume, otherwise STAGING_NAME next to the target.
+    Files, links and folders that cannot be moved are deleted in place.
+    One Stager is used for one run and may be shared between threads.
+    """
+
+    def __init__(self, area=None):
+        self.area = area if area is not None else StagingArea()
+        self.staged = 0
+        self._run_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._batches = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def batch_for(self, dir_path):
+        """Return the batch folder on the volume of dir_path, or None if there is none"""
+        device = os.stat(dir_path).st_dev
+        with self._lock:
+            if device in self._batches:
+                return self._batches[device]
+        batch = None
+        candidates = (os.path.join(self.area.directory, "staging"),
+                      os.path.join(os.path.dirname(os.path.normpath(dir_path)), STAGING_NAME))
+        for root in candidates:
+            try:
+                if _device(root) != device:
+                    continue
+                batch = self.area.create_batch(root, self._run_name)
+                if os.stat(batch).st_dev == device:
+                    break
+                batch = None
+            except OSError:
+                continue
+        with self._lock:
+            return self._batches.setdefault(device, batch)
+
+    def stage_contents(self, deleter, dir_path):
+        """Empty dir_path by moving its folders out and deleting the rest in place"""
+        batch = self.batch_for(dir_path)
+        with os.scandir(dir_path) as scandir_it:
+            entries = list(scandir_it)
+        for entry in entries:
+            if batch is not None and _is_real_dir(entry) and self.stage(deleter, entry.path, batch):
+                continue
+            deleter.delete_path(entry.path)
+
+    def stage_path(self, deleter, path):
+        """Move a whole folder out, or delete it in place if it cannot be moved"""
+        parent = os.path.dirname(os.path.normpath(path))
+        batch = self.batch_for(parent) if os.path.isdir(path) and not os.path.islink(path) else None
+        if batch is None or not self.stage(deleter, path, batch):
+            deleter.delete_path(path)
+
+    def stage(self, deleter, path, batch):
+        """Rename one folder into batch, returning False if it could not be moved"""
+        name = f"{next(self._counter)}-{os.path.basename(path)}"
+        try:
+            os.rename(path, os.path.join(batch, name))
+        except OSError:
+            # In use, locked or on another volume: fall back to deleting
+            return False
+        with self._lock:
+            self.staged += 1
+        deleter.stats.dirs_staged += 1
+        if deleter.audit is not None:
+            deleter.audit.record(path, "dir", "staged")
+        if deleter.control is not None:
+            deleter.control.checkpoint(1)
+        return True
+
+
+def lower_priority():
+    """Run the current process at background CPU and I/O priority, where supported"""
+    try:
+        if os.name == "nt":
+            # Imported here: Windows only
+            import ctypes
+            PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), PROCESS_MODE_BACKGROUND_BEGIN)
+        else:
+            os.nice(10)
+    except (OSError, AttributeError):
+        pass
+
+
+def purge(area=None, log=None):
+    """Delete everything in the staging folders of the manifest
+
+    Only one purge runs at a time: returns None at once if another one
+    holds the purge lock, otherwise the DeleteStats of what was removed.
+    Passes are repeated while they still find staged folders, so folders
+    staged during the purge are not left behind.
+    """
+    area = area if area is not None else StagingArea()
+    log = log or (lambda message: None)
+    purge_lock = FileLock(os.path.join(area.directory, PURGE_LOCK_NAME))
+    if not purge_lock.acquire(blocking=False):
+        log("ℹ️ Another purge is already running")
+        return None
+    deleter = TreeDeleter()
+    try:
+        while True:
+            found = 0
+            before = deleter.stats.deleted
+            for root in area.roots():
+                try:
+                    with os.scandir(root) as scandir_it:
+                        batches = [entry.path for entry in scandir_it]
+                except FileNotFoundError:
+                    batches = []
+                except OSError as e:
+                    log(f"⚠️ Cannot read staging folder {root}: {str(e)}")
+                    continue
+                for batch in batches:
+                    found += 1
+                    deleter.delete_path(batch)
+                area.forget_if_empty(root)
+            # Stop once a pass finds nothing, or cannot delete anything more
+            if not found or deleter.stats.deleted == before:
+                break
+    finally:
+        purge_lock.release()
+    return deleter.stats
+
+
+def start_purge():
+    """Start a detached purge process that outlives this one"""
+    # Imported here: only needed once something has been staged
+    import subprocess
+
+    if getattr(sys, "frozen", False):
+        command = [sys.executable, "purge", "--quiet"]
+        cwd = None
+    else:
+        command = [sys.executable, "-m", "bat_broom", "purge", "--quiet"]
+        cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    options = {}
+    if os.name == "nt":
+        options["creationflags"] = (subprocess.DETACHED_PROCESS
+                                    | subprocess.CREATE_NEW_PROCESS_GROUP
+                                    | subprocess.BELOW_NORMAL_PRIORITY_CLASS)
+    else:
+        options["start_new_session"] = True
+    subprocess.Popen(command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, close_fds=True, **options)
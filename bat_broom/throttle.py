@@ -0,0 +1,146 @@
+"""
+I/O throttle for Bat Broom
+Paces deletions with token buckets and backs off while the disk answers slowly
+"""
+
+import threading
+import time
+
+# Weight of each new latency sample in the running average
+LATENCY_WEIGHT = 0.1
+
+# Pause added to every operation while the latency is too high, doubled
+# from MIN_DELAY up to MAX_DELAY and halved again once it recovers
+MIN_DELAY = 0.001
+MAX_DELAY = 0.25
+
+# Seconds between two changes of the pause, so one slow call does not count twice
+ADJUST_INTERVAL = 0.25
+
+# Longest single sleep, so a cancelled run stops promptly
+SLEEP_SLICE = 0.1
+
+
+class TokenBucket:
+    """Allows ``rate`` units per second, in bursts of up to ``burst`` units
+
+    reserve() may overdraw the bucket, so an operation larger than the
+    burst (a big file) is allowed and paid for by waiting. Not safe to
+    share between threads on its own.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(self.rate, 1.0))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now=None):
+        """Take amount units and return the seconds to wait before using them"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class IoThrottle:
+    """Paces the unlink and rmdir calls of a run
+
+    ``ops_per_second`` caps the deleted entries and ``bytes_per_second``
+    the size of the deleted files, across every worker of the run. With
+    ``max_latency`` in seconds, the average duration of the calls is
+    watched: while it is above the limit, a pause that doubles every
+    ADJUST_INTERVAL is added to each call, and it shrinks again once the
+    disk keeps up. Safe to share between threads.
+    """
+
+    def __init__(self, ops_per_second=None, bytes_per_second=None, max_latency=None):
+        self.ops_per_second = ops_per_second or None
+        self.bytes_per_second = bytes_per_second or None
+        self.max_latency = max_latency or None
+        self._ops = TokenBucket(ops_per_second) if ops_per_second else None
+        self._bytes = TokenBucket(bytes_per_second) if bytes_per_second else None
+        self.delay = 0.0
+        self.latency = None
+        self.operations = 0
+        self.waited = 0.0
+        self.backoffs = 0
+        self._adjusted = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def needs_size(self):
+        """True if file sizes must be known to apply the byte cap"""
+        return self._bytes is not None
+
+    def acquire(self, nbytes=0, control=None):
+        """Wait until one operation on nbytes may run, returning the seconds waited
+
+        The wait ends early once ``control`` is cancelled.
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = 0.0
+            if self._ops is not None:
+                wait = self._ops.reserve(1, now)
+            if self._bytes is not None and nbytes:
+                wait = max(wait, self._bytes.reserve(nbytes, now))
+            wait += self.delay
+        if wait <= 0:
+            return 0.0
+        end = now + wait
+        while not (control is not None and control.cancelled):
+            left = end - time.monotonic()
+            if left <= 0:
+                break
+            time.sleep(min(left, SLEEP_SLICE))
+        waited = time.monotonic() - now
+        with self._lock:
+            self.waited += waited
+        return waited
+
+    def record(self, seconds):
+        """Feed the duration of one operation to the latency average and the backoff"""
+        with self._lock:
+            self.operations += 1
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += LATENCY_WEIGHT * (seconds - self.latency)
+            if self.max_latency is None:
+                return
+            now = time.monotonic()
+            if now - self._adjusted < ADJUST_INTERVAL:
+                return
+            self._adjusted = now
+            if self.latency > self.max_latency:
+                self.delay = min(MAX_DELAY, max(MIN_DELAY, self.delay * 2))
+                self.backoffs += 1
+            elif self.delay:
+                self.delay = self.delay / 2 if self.delay / 2 >= MIN_DELAY else 0.0
+
+    def describe(self):
+        """Return the limits in a short human-readable form"""
+        parts = []
+        if self.ops_per_second:
+            parts.append(f"{self.ops_per_second:g} entries/s")
+        if self.bytes_per_second:
+            parts.append(f"{self.bytes_per_second / (1024 * 1024):g} MB/s")
+        if self.max_latency:
+            parts.append(f"backing off above {self.max_latency * 1000:g} ms per call")
+        return ", ".join(parts) or "no limits"
+
+    def to_dict(self):
+        """Return the limits and what the throttle did as a plain dictionary"""
+        with self._lock:
+            return {
+                "ops_per_second": self.ops_per_second,
+                "bytes_per_second": self.bytes_per_second,
+                "max_latency_ms": self.max_latency * 1000 if self.max_latency else None,
+                "operations": self.operations,
+                "waited_seconds": round(self.waited, 3),
+                "backoffs": self.backoffs,
+                "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+                "delay_ms": round(self.delay * 1000, 3),
+            }
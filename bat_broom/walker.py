@@ -0,0 +1,811 @@
+"""
+Single-pass deletion walker for Bat Broom
+Lists every directory once with os.scandir and deletes bottom-up
+"""
+
+import errno
+import os
+import stat
+import time
+from array import array
+from collections import Counter
+
+# Descriptor-relative operations avoid re-resolving long paths for every
+# entry and are immune to a parent directory being swapped mid-walk
+USE_DIR_FD = (
+    os.scandir in os.supports_fd
+    and os.open in os.supports_dir_fd
+    and os.unlink in os.supports_dir_fd
+    and os.rmdir in os.supports_dir_fd
+)
+
+_DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_CLOEXEC", 0)
+
+# Seconds between progress callbacks while scanning
+PROGRESS_INTERVAL = 0.1
+
+# Scans of larger trees do not keep a deletion plan, to bound memory
+PLAN_LIMIT = 1000000
+
+
+def errno_name(error):
+    """Return the symbolic errno of an OSError, such as EACCES"""
+    if error.errno is None:
+        return "UNKNOWN"
+    return errno.errorcode.get(error.errno, str(error.errno))
+
+
+class DeleteStats:
+    """Exact success and failure counts of a deletion walk
+
+    ``errnos`` counts the failures by errno name. ``dirs_staged`` counts
+    folders moved to a staging folder instead of being deleted; their
+    contents are not counted. ``throttled_seconds`` is the time spent
+    waiting on an IoThrottle.
+    """
+
+    def __init__(self):
+        self.files_deleted = 0
+        self.files_failed = 0
+        self.dirs_deleted = 0
+        self.dirs_failed = 0
+        self.files_skipped = 0
+        self.dirs_skipped = 0
+        self.dirs_staged = 0
+        self.bytes_freed = 0
+        self.throttled_seconds = 0.0
+        self.errnos = Counter()
+
+    @property
+    def deleted(self):
+        return self.files_deleted + self.dirs_deleted
+
+    @property
+    def failed(self):
+        return self.files_failed + self.dirs_failed
+
+    @property
+    def skipped(self):
+        return self.files_skipped + self.dirs_skipped
+
+    def merge(self, other):
+        """Add the counts of another DeleteStats, e.g. from a shard"""
+        self.files_deleted += other.files_deleted
+        self.files_failed += other.files_failed
+        self.dirs_deleted += other.dirs_deleted
+        self.dirs_failed += other.dirs_failed
+        self.files_skipped += other.files_skipped
+        self.dirs_skipped += other.dirs_skipped
+        self.dirs_staged += other.dirs_staged
+        self.bytes_freed += other.bytes_freed
+        self.throttled_seconds += other.throttled_seconds
+        self.errnos.update(other.errnos)
+
+    def to_dict(self):
+        """Return the counts as a plain dictionary"""
+        return {
+            "files_deleted": self.files_deleted,
+            "files_failed": self.files_failed,
+            "files_skipped": self.files_skipped,
+            "dirs_deleted": self.dirs_deleted,
+            "dirs_failed": self.dirs_failed,
+            "dirs_skipped": self.dirs_skipped,
+            "dirs_staged": self.dirs_staged,
+            "bytes_freed": self.bytes_freed,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "errnos": dict(self.errnos),
+        }
+
+
+class ScanStats:
+    """Files, directories and bytes found by a scan"""
+
+    def __init__(self):
+        self.files = 0
+        self.dirs = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.errors = 0
+        self.errnos = Counter()
+
+    def record_error(self, error):
+        """Count an entry that could not be measured"""
+        self.errors += 1
+        self.errnos[errno_name(error)] += 1
+
+    def to_dict(self):
+        """Return the counts as a plain dictionary"""
+        return {
+            "files": self.files,
+            "dirs": self.dirs,
+            "bytes": self.bytes,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "errnos": dict(self.errnos),
+        }
+
+
+def _is_link(st):
+    """Return True if an lstat result is a symlink or reparse point"""
+    if stat.S_ISLNK(st.st_mode):
+        return True
+    return os.name == "nt" and bool(st.st_file_attributes & stat.FILE_ATTRIBUTE_REPARSE_POINT)
+
+
+def _is_real_dir(entry):
+    """Return True for directories that should be descended into
+
+    Symlinks and, on Windows, junctions and other reparse points are
+    removed as links rather than followed. The type information comes
+    from the directory listing, so this normally costs no system call.
+    """
+    if not entry.is_dir(follow_symlinks=False):
+        return False
+    if os.name != "nt":
+        return True
+    attributes = entry.stat(follow_symlinks=False).st_file_attributes
+    return not attributes & stat.FILE_ATTRIBUTE_REPARSE_POINT
+
+
+class TreeDeleter:
+    """Delete directory trees, recording each outcome in ``stats``
+
+    If a RunControl is given, its checkpoint is called after every entry
+    so the walk can be paused or cancelled between two deletions. With a
+    TargetIndex, directories known to be empty and unchanged since the
+    previous run are not listed, and every directory that survives the
+    walk is recorded for the next run. A Policy keeps the entries it
+    does not allow; folders that still hold kept entries are left in
+    place without counting as failures. Every deleted or failed entry is
+    passed to the AuditSink, if any, and failures are queued on the
+    RetryQueue, if any. With an Archive, every file is copied into it
+    before it is unlinked, and files the archive refuses are kept as
+    failures. With ``measure``, file sizes are read even when nothing
+    else needs them, so ``bytes_freed`` is exact. With an IoThrottle,
+    every unlink and rmdir waits for its turn and is timed.
+    """
+
+    def __init__(self, stats=None, control=None, index=None, policy=None, audit=None,
+                 retry=None, archive=None, measure=False, throttle=None):
+        self.stats = stats if stats is not None else DeleteStats()
+        self.control = control
+        self.index = index
+        self.policy = policy
+        self.audit = audit
+        self.retry = retry
+        self.archive = archive
+        self.measure = measure
+        self.throttle = throttle
+
+    @property
+    def sizes_known(self):
+        """True if the walk reads the size of every file it deletes"""
+        return (self.measure or self.audit is not None or self.archive is not None
+                or (self.policy is not None and self.policy.needs_stat))
+
+    def delete_contents(self, dir_path):
+        """Delete everything inside dir_path, keeping dir_path itself
+
+        Returns the number of entries left in dir_path.
+        """
+        if USE_DIR_FD:
+            # The top directory may itself be a link (e.g. a junction
+            # target), so it is opened following symlinks
+            flags = _DIR_OPEN_FLAGS & ~getattr(os, "O_NOFOLLOW", 0)
+            top_fd = os.open(dir_path, flags)
+            try:
+                if self.index is not None and self.index.can_skip(dir_path, os.fstat(top_fd)):
+                    return 0
+                remaining = self._walk_fd(top_fd, dir_path)
+                if self.index is not None:
+                    self.index.record(dir_path, os.fstat(top_fd), remaining)
+            finally:
+                os.close(top_fd)
+        else:
+            if self.index is not None and self.index.can_skip(dir_path, os.stat(dir_path)):
+                return 0
+            remaining = self._walk_path(dir_path)
+            if self.index is not None:
+                self.index.record(dir_path, os.stat(dir_path), remaining)
+        return remaining
+
+    def delete_path(self, path):
+        """Delete a single file, link or directory tree"""
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            self.record_failure(path, e, is_dir=False)
+            return
+
+        policy = self.policy
+        is_dir = stat.S_ISDIR(st.st_mode)
+        if policy is not None and policy.excludes(os.path.basename(path)):
+            self._skip(is_dir)
+            return
+
+        if is_dir and not _is_link(st):
+            try:
+                remaining = self.delete_contents(path)
+            except OSError as e:
+                self.record_failure(path, e, is_dir=True)
+                return
+            if policy is not None and (remaining or not policy.allows_dir(st)):
+                self._skip(is_dir=True)
+                return
+            self._rmdir(path, mtime=st.st_mtime)
+        elif is_dir:
+            self._rmdir(path, mtime=st.st_mtime)
+        elif policy is not None and not policy.allows_file(st):
+            self._skip(is_dir=False)
+        else:
+            self._unlink(path, size=st.st_size, mtime=st.st_mtime)
+
+    def delete_plan(self, plan):
+        """Delete the entries recorded by a TreeScanner without listing again
+
+        Directories whose identity changed since the scan are left alone,
+        and entries that have already disappeared are ignored.
+        """
+        for dir_path, inode, names, sizes, remove_dir in plan:
+            if names:
+                self._unlink_names(dir_path, inode, names, sizes)
+            if remove_dir:
+                self._rmdir(dir_path)
+
+    def _unlink_names(self, dir_path, inode, names, sizes):
+        """Delete the named files of one planned directory"""
+        if not USE_DIR_FD:
+            for name, size in zip(names, sizes):
+                self._unlink(os.path.join(dir_path, name), size=size)
+            return
+
+        try:
+            fd = os.open(dir_path, _DIR_OPEN_FLAGS & ~getattr(os, "O_NOFOLLOW", 0))
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            self._fail_names(dir_path, names, sizes, e)
+            return
+        try:
+            if inode is not None and os.fstat(fd).st_ino != inode:
+                error = OSError(errno.ESTALE, "Directory changed since the scan", dir_path)
+                self._fail_names(dir_path, names, sizes, error)
+                return
+            for name, size in zip(names, sizes):
+                self._unlink(name, fd, os.path.join(dir_path, name), size)
+        finally:
+            os.close(fd)
+
+    def remove_dir(self, path, mtime=None):
+        """Delete one folder expected to be empty, returning False if it is still there
+
+        A folder that gained entries meanwhile is kept without counting
+        as a failure; other errors are recorded like any failed rmdir.
+        """
+        try:
+            if self.throttle is None:
+                os.rmdir(path)
+            else:
+                self.throttled(os.rmdir, path)
+        except FileNotFoundError:
+            return True
+        except OSError as e:
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                self.record_failure(path, e, is_dir=True)
+            return False
+        self.stats.dirs_deleted += 1
+        if self.audit is not None:
+            self.audit.record(path, "dir", "deleted", mtime=mtime)
+        return True
+
+    def _fail_names(self, dir_path, names, sizes, error):
+        """Count every planned file of a directory as failed"""
+        for name in names:
+            self.record_failure(os.path.join(dir_path, name), error, is_dir=False)
+        if self.control is not None:
+            self.control.checkpoint(len(names), sum(sizes))
+
+    def record_failure(self, path, error, is_dir):
+        """Count an entry that could not be deleted"""
+        name = errno_name(error)
+        self.stats.errnos[name] += 1
+        if is_dir:
+            self.stats.dirs_failed += 1
+        else:
+            self.stats.files_failed += 1
+        if self.audit is not None:
+            self.audit.record(path, "dir" if is_dir else "file", "failed", error=name)
+        if self.retry is not None:
+            self.retry.add(path, is_dir, error, self)
+
+    def _skip(self, is_dir):
+        """Count an entry kept because of the policy"""
+        if is_dir:
+            self.stats.dirs_skipped += 1
+        else:
+            self.stats.files_skipped += 1
+        if self.control is not None:
+            self.control.checkpoint()
+
+    def _unlink(self, name, dir_fd=None, path=None, size=0, mtime=None):
+        """Delete one file or link, returning False if it is still there"""
+        gone = True
+        try:
+            if self.archive is not None:
+                size = self.archive.add(name, dir_fd, path or name)
+            if self.throttle is None:
+                os.unlink(name, dir_fd=dir_fd)
+            else:
+                self.throttled(os.unlink, name, dir_fd, size)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.record_failure(path or name, e, is_dir=False)
+            gone = False
+        else:
+            self.stats.files_deleted += 1
+            self.stats.bytes_freed += size
+            if self.audit is not None:
+                self.audit.record(path or name, "file", "deleted", size, mtime)
+        if gone and self.archive is not None:
+            self.archive.forget(path or name)
+        if self.control is not None:
+            self.control.checkpoint(1, size)
+        return gone
+
+    def _rmdir(self, name, dir_fd=None, path=None, mtime=None):
+        """Delete one empty directory, returning False if it is still there"""
+        gone = True
+        try:
+            if self.throttle is None:
+                os.rmdir(name, dir_fd=dir_fd)
+            else:
+                self.throttled(os.rmdir, name, dir_fd)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.record_failure(path or name, e, is_dir=True)
+            gone = False
+        else:
+            self.stats.dirs_deleted += 1
+            if self.audit is not None:
+                self.audit.record(path or name, "dir", "deleted", mtime=mtime)
+        if self.control is not None:
+            self.control.checkpoint()
+        return gone
+
+    def throttled(self, call, name, dir_fd=None, size=0):
+        """Run an unlink or rmdir once the throttle allows it, reporting its duration"""
+        self.stats.throttled_seconds += self.throttle.acquire(size, self.control)
+        started = time.monotonic()
+        try:
+            call(name, dir_fd=dir_fd)
+        finally:
+            self.throttle.record(time.monotonic() - started)
+
+    def _unchanged_empty(self, entry, path):
+        """Return the stat result of a subdirectory the index knows is empty and unchanged
+
+        Returns None when the subdirectory has to be listed.
+        """
+        if self.index is None or path not in self.index.previous:
+            return None
+        st = entry.stat(follow_symlinks=False)
+        return st if self.index.can_skip(path, st) else None
+
+    def _settle_empty(self, name, dir_fd, path, st):
+        """Keep or remove an empty subdirectory without listing it
+
+        The current policy decides, not the one of the run that recorded
+        it. Returns "gone", "failed" or "kept" like _finish_dir.
+        """
+        if self.policy is not None and not self.policy.allows_dir(st):
+            self._skip(is_dir=True)
+            return "kept"
+        return "gone" if self._rmdir(name, dir_fd, path, st.st_mtime) else "failed"
+
+    def _file_info(self, entry):
+        """Return (size, mtime) to account for a listed file, or None to keep it
+
+        The stat result is only fetched when the policy, the audit trail or
+        ``measure`` needs it, and on Windows it comes with the directory
+        listing for free.
+        """
+        policy = self.policy
+        if policy is not None and policy.excludes(entry.name):
+            return None
+        if self.audit is None and not self.measure and (policy is None or not policy.needs_stat):
+            return 0, None
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            return 0, None
+        if policy is not None and not policy.allows_file(st):
+            return None
+        return st.st_size, st.st_mtime
+
+    def _enter_dir(self, entry):
+        """Return (enter, stat) for a listed subdirectory
+
+        ``stat`` is only fetched when the policy needs the folder's age or
+        the audit trail its mtime, which must be read before its contents
+        are deleted.
+        """
+        policy = self.policy
+        if policy is not None and policy.excludes(entry.name):
+            return False, None
+        if self.audit is None and (policy is None or policy.cutoff is None):
+            return True, None
+        try:
+            return True, entry.stat(follow_symlinks=False)
+        except OSError:
+            return True, None
+
+    def _finish_dir(self, name, dir_fd, path, failed_left, kept_left, dir_stat, own_fd=None):
+        """Remove a walked subdirectory if possible
+
+        Returns "gone", "failed" or "kept" so the parent can account for it.
+        """
+        if failed_left:
+            error = OSError(errno.ENOTEMPTY, "Folder still holds entries that could not be deleted", path)
+            self.record_failure(path, error, is_dir=True)
+            outcome = "failed"
+        elif kept_left or (dir_stat is not None and self.policy is not None
+                           and not self.policy.allows_dir(dir_stat)):
+            self.stats.dirs_skipped += 1
+            outcome = "kept"
+            if not kept_left:
+                # Only its age keeps it: a later run with another policy
+                # must list it again, so it is not recorded as skippable
+                if self.control is not None:
+                    self.control.checkpoint()
+                return outcome
+        elif self._rmdir(name, dir_fd, path, dir_stat.st_mtime if dir_stat is not None else None):
+            return "gone"
+        else:
+            return self._record_dir(path, own_fd, failed_left + kept_left, "failed")
+
+        if self.control is not None:
+            self.control.checkpoint()
+        return self._record_dir(path, own_fd, failed_left + kept_left, outcome)
+
+    def _record_dir(self, path, fd, entries, outcome):
+        """Remember a surviving directory in the index"""
+        if self.index is not None:
+            try:
+                st = os.fstat(fd) if fd is not None else os.lstat(path)
+            except OSError:
+                return outcome
+            self.index.record(path, st, entries)
+        return outcome
+
+    def _walk_fd(self, top_fd, top_path):
+        """Bottom-up walk using descriptor-relative calls
+
+        Returns the number of entries left in the top directory.
+        """
+        with os.scandir(top_fd) as scandir_it:
+            entries = list(scandir_it)
+        # Each frame: [dir fd, dir path, entries, next index, name in parent,
+        #              entries failed, entries kept, stat for the age check]
+        stack = [[top_fd, top_path, entries, 0, None, 0, 0, None]]
+        try:
+            while stack:
+                frame = stack[-1]
+                fd, path, entries, index = frame[:4]
+                descended = False
+                while index < len(entries):
+                    entry = entries[index]
+                    index += 1
+                    entry_path = os.path.join(path, entry.name)
+                    if _is_real_dir(entry):
+                        enter, dir_stat = self._enter_dir(entry)
+                        if not enter:
+                            self._skip(is_dir=True)
+                            frame[6] += 1
+                            continue
+                        empty_stat = self._unchanged_empty(entry, entry_path)
+                        if empty_stat is not None:
+                            outcome = self._settle_empty(entry.name, fd, entry_path, empty_stat)
+                            frame[5] += outcome == "failed"
+                            frame[6] += outcome == "kept"
+                            continue
+                        try:
+                            child_fd = os.open(entry.name, _DIR_OPEN_FLAGS, dir_fd=fd)
+                        except OSError:
+                            # Unreadable directory, it can only go if it is empty
+                            frame[5] += not self._rmdir(entry.name, fd, entry_path)
+                            continue
+                        try:
+                            with os.scandir(child_fd) as scandir_it:
+                                child_entries = list(scandir_it)
+                        except OSError:
+                            os.close(child_fd)
+                            frame[5] += not self._rmdir(entry.name, fd, entry_path)
+                            continue
+                        frame[3] = index
+                        stack.append([child_fd, entry_path, child_entries, 0, entry.name,
+                                      0, 0, dir_stat])
+                        descended = True
+                        break
+                    info = self._file_info(entry)
+                    if info is None:
+                        self._skip(is_dir=False)
+                        frame[6] += 1
+                        continue
+                    frame[5] += not self._unlink(entry.name, fd, entry_path, *info)
+                if descended:
+                    continue
+
+                # Directory fully processed, remove it from its parent
+                stack.pop()
+                name = frame[4]
+                if name is None:
+                    return frame[5] + frame[6]
+                try:
+                    outcome = self._finish_dir(name, stack[-1][0], path, frame[5], frame[6],
+                                               frame[7], own_fd=fd)
+                finally:
+                    os.close(fd)
+                if outcome == "failed":
+                    stack[-1][5] += 1
+                elif outcome == "kept":
+                    stack[-1][6] += 1
+        finally:
+            # Close descriptors left open if the walk was interrupted
+            for frame in stack[1:]:
+                os.close(frame[0])
+
+    def _walk_path(self, top_path):
+        """Bottom-up walk using full paths
+
+        Returns the number of entries left in the top directory.
+        """
+        with os.scandir(top_path) as scandir_it:
+            entries = list(scandir_it)
+        # Each frame: [dir path, entries, next index, is top,
+        #              entries failed, entries kept, stat for the age check]
+        stack = [[top_path, entries, 0, True, 0, 0, None]]
+        while stack:
+            frame = stack[-1]
+            path, entries, index, is_top = frame[:4]
+            descended = False
+            while index < len(entries):
+                entry = entries[index]
+                index += 1
+                if _is_real_dir(entry):
+                    enter, dir_stat = self._enter_dir(entry)
+                    if not enter:
+                        self._skip(is_dir=True)
+                        frame[5] += 1
+                        continue
+                    empty_stat = self._unchanged_empty(entry, entry.path)
+                    if empty_stat is not None:
+                        outcome = self._settle_empty(entry.path, None, entry.path, empty_stat)
+                        frame[4] += outcome == "failed"
+                        frame[5] += outcome == "kept"
+                        continue
+                    try:
+                        with os.scandir(entry.path) as scandir_it:
+                            child_entries = list(scandir_it)
+                    except OSError:
+                        frame[4] += not self._rmdir(entry.path)
+                        continue
+                    frame[2] = index
+                    stack.append([entry.path, child_entries, 0, False, 0, 0, dir_stat])
+                    descended = True
+                    break
+                info = self._file_info(entry)
+                if info is None:
+                    self._skip(is_dir=entry.is_dir(follow_symlinks=False))
+                    frame[5] += 1
+                elif entry.is_dir(follow_symlinks=False):
+                    # Junction or directory symlink: remove the link only
+                    frame[4] += not self._rmdir(entry.path, mtime=info[1])
+                else:
+                    frame[4] += not self._unlink(entry.path, None, None, *info)
+            if descended:
+                continue
+
+            stack.pop()
+            if is_top:
+                return frame[4] + frame[5]
+            outcome = self._finish_dir(path, None, path, frame[4], frame[5], frame[6])
+            if outcome == "failed":
+                stack[-1][4] += 1
+            elif outcome == "kept":
+                stack[-1][5] += 1
+
+
+class TreeScanner:
+    """Measure directory trees without deleting anything
+
+    ``progress`` is called with the running ScanStats as the walk goes,
+    at most every PROGRESS_INTERVAL seconds. The scan also records a
+    deletion plan, a post-order list of
+    ``(dir_path, inode, file_names, file_sizes, remove_dir)`` tuples that
+    TreeDeleter.delete_plan executes without listing the tree again.
+    The plan is dropped (``plan`` becomes None) once it would hold more
+    than ``plan_limit`` entries. A RunControl checkpoint is called after
+    each directory listing. With a TargetIndex, directories known to be
+    empty and unchanged are not listed and every listed directory is
+    recorded. Entries a Policy keeps are counted as skipped and left out
+    of the plan, and so are the folders that still hold them.
+    """
+
+    def __init__(self, stats=None, progress=None, plan_limit=PLAN_LIMIT, control=None,
+                 index=None, policy=None):
+        self.stats = stats if stats is not None else ScanStats()
+        self.progress = progress
+        self.control = control
+        self.index = index
+        self.policy = policy
+        self.plan = []
+        self.plan_limit = plan_limit
+        self._planned = 0
+        self._last_progress = None
+
+    def scan_contents(self, dir_path):
+        """Measure everything inside dir_path"""
+        if self.index is None or not self.index.can_skip(dir_path, os.stat(dir_path)):
+            self._walk(dir_path, remove_top=False)
+        self._report_progress(force=True)
+
+    def scan_path(self, path):
+        """Measure a single file, link or directory tree"""
+        try:
+            st = os.lstat(path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            self.stats.record_error(e)
+            return
+
+        policy = self.policy
+        if policy is not None and policy.excludes(os.path.basename(path)):
+            self.stats.skipped += 1
+        elif stat.S_ISDIR(st.st_mode) and not _is_link(st):
+            self.stats.dirs += 1
+            self._walk(path, remove_top=True, top_young=self._too_young(st))
+        elif stat.S_ISDIR(st.st_mode):
+            self.stats.dirs += 1
+            self._add_to_plan((path, None, [], array("q"), True), 1)
+        elif policy is not None and not policy.allows_file(st):
+            self.stats.skipped += 1
+        else:
+            self.stats.files += 1
+            self.stats.bytes += st.st_size
+            self._add_to_plan((os.path.dirname(path), None, [os.path.basename(path)],
+                               array("q", [st.st_size]), False), 1)
+        self._report_progress(force=True)
+
+    def _too_young(self, st):
+        """Return True if the policy keeps an emptied folder with this stat result"""
+        return self.policy is not None and not self.policy.allows_dir(st)
+
+    def _add_to_plan(self, item, count):
+        """Append one directory to the plan unless the limit is reached"""
+        if self.plan is None:
+            return
+        self._planned += count
+        if self._planned > self.plan_limit:
+            self.plan = None
+        else:
+            self.plan.append(item)
+
+    def _report_progress(self, force=False):
+        """Call the progress callback if enough time has passed"""
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if force or self._last_progress is None or now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress(self.stats)
+
+    def _list(self, path, st=None, removable=True):
+        """List one directory into (subdirectories, file names, file sizes, kept)
+
+        ``st`` is the directory's own stat result, used to record it in
+        the index. ``kept`` counts the entries the policy keeps. An empty
+        ``removable`` folder that only the policy's age limit keeps is not
+        recorded, so a run with another policy lists it again.
+        """
+        subdirs = []
+        names = []
+        sizes = array("q")
+        kept = 0
+        stats = self.stats
+        policy = self.policy
+        with os.scandir(path) as scandir_it:
+            for entry in scandir_it:
+                if policy is not None and policy.excludes(entry.name):
+                    stats.skipped += 1
+                    kept += 1
+                    continue
+                if _is_real_dir(entry):
+                    subdirs.append(entry)
+                    stats.dirs += 1
+                    continue
+                try:
+                    entry_stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    entry_stat = None
+                size = entry_stat.st_size if entry_stat is not None else 0
+                if entry.is_dir(follow_symlinks=False):
+                    # Junction: removed with rmdir, counted as a folder
+                    stats.dirs += 1
+                    self._add_to_plan((entry.path, None, [], array("q"), True), 1)
+                    continue
+                if policy is not None and entry_stat is not None and not policy.allows_file(entry_stat):
+                    stats.skipped += 1
+                    kept += 1
+                    continue
+                names.append(entry.name)
+                sizes.append(size)
+                stats.files += 1
+                stats.bytes += size
+        entries = len(subdirs) + len(names) + kept
+        if self.index is not None and st is not None and not (
+                removable and not entries and self._too_young(st)):
+            self.index.record(path, st, entries, sum(sizes))
+        if self.control is not None:
+            self.control.checkpoint(len(subdirs) + len(names), sum(sizes))
+        return subdirs, names, sizes, kept
+
+    def _walk(self, top_path, remove_top, top_young=False):
+        """Top-down listing that emits plan entries in post-order"""
+        try:
+            top_stat = os.stat(top_path)
+            top_inode = top_stat.st_ino if USE_DIR_FD else None
+            subdirs, names, sizes, kept = self._list(top_path, top_stat, remove_top)
+        except OSError as e:
+            self.stats.record_error(e)
+            return
+        self._report_progress()
+
+        # Each frame: (dir path, inode, subdirectories, next index, names, sizes,
+        #              remove, entries kept, too young to remove)
+        stack = [[top_path, top_inode, subdirs, 0, names, sizes, remove_top, kept, top_young]]
+        while stack:
+            frame = stack[-1]
+            path, inode, subdirs, index, names, sizes, remove_dir, kept, young = frame
+            if index < len(subdirs):
+                entry = subdirs[index]
+                frame[3] = index + 1
+                try:
+                    child_inode = entry.inode() if USE_DIR_FD else None
+                    need_stat = self.index is not None or (self.policy is not None
+                                                           and self.policy.cutoff is not None)
+                    child_stat = entry.stat(follow_symlinks=False) if need_stat else None
+                    if self.index is not None and self.index.can_skip(entry.path, child_stat):
+                        # Known empty: the current policy decides whether it goes
+                        if self._too_young(child_stat):
+                            self.stats.dirs -= 1
+                            self.stats.skipped += 1
+                            frame[7] += 1
+                        else:
+                            self._add_to_plan((entry.path, child_inode, [], array("q"), True), 1)
+                        continue
+                    child = self._list(entry.path, child_stat if self.index is not None else None)
+                except OSError as e:
+                    self.stats.record_error(e)
+                    # Only an empty directory could still be removed
+                    self._add_to_plan((entry.path, None, [], array("q"), True), 1)
+                    continue
+                child_young = child_stat is not None and self._too_young(child_stat)
+                stack.append([entry.path, child_inode, child[0], 0, child[1], child[2], True,
+                              child[3], child_young])
+                self._report_progress()
+                continue
+
+            stack.pop()
+            if remove_dir and (kept or young):
+                # The folder stays, and so does every parent up to the target
+                remove_dir = False
+                self.stats.dirs -= 1
+                self.stats.skipped += 1
+                if stack:
+                    stack[-1][7] += 1
+            self._add_to_plan((path, inode, names, sizes, remove_dir), len(names) + 1)
@@ -0,0 +1,489 @@
+"""
+Watch mode for Bat Broom
+Keeps targets within their policy continuously, driven by change notifications
+"""
+
+import errno
+import heapq
+import os
+import select
+import struct
+import sys
+import time
+
+from .engine import TargetResult, format_size
+from .metrics import TargetMetrics
+from .walker import TreeDeleter, _is_real_dir
+
+# Seconds between eviction cycles
+WATCH_INTERVAL = 30.0
+
+# Longest sleep before the RunControl is checked again
+WAIT_SLICE = 0.5
+
+# Stale entries a heap may hold beyond twice the live files before it is rebuilt
+HEAP_SLACK = 64
+
+# inotify event bits, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Change notifications from the Linux kernel, through ctypes
+
+    wait() returns the changed entries as (folder, name) pairs; name is
+    None when the whole folder must be listed again, e.g. after the
+    kernel's event queue overflowed.
+    """
+
+    name = "inotify"
+
+    def __init__(self):
+        # Imported here: only needed on Linux
+        import ctypes
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._get_errno = ctypes.get_errno
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+        self._folders = {}
+
+    def _raise(self, path=None):
+        code = self._get_errno()
+        raise OSError(code, os.strerror(code), path)
+
+    def watch(self, path):
+        """Start reporting changes inside the folder path"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            self._raise(path)
+        self._folders[wd] = path
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds and return the changed (folder, name) pairs"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        changes = set()
+        if not ready:
+            return changes
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    changes.update((folder, None) for folder in self._folders.values())
+                    continue
+                folder = self._folders.get(wd)
+                if folder is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The folder is gone; its parent reports the removal
+                    del self._folders[wd]
+                elif name:
+                    changes.add((folder, os.fsdecode(name)))
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    changes.add((folder, None))
+        return changes
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback that compares the modification time of every watched folder
+
+    A folder's mtime changes when entries are added, removed or renamed,
+    so each poll costs one stat per folder, not per file. Files that are
+    rewritten in place are noticed when they are about to be evicted.
+    """
+
+    name = "polling"
+
+    def __init__(self, poll_interval=WATCH_INTERVAL):
+        self.poll_interval = poll_interval
+        self._folders = {}
+        self._next_poll = time.monotonic() + poll_interval
+
+    def watch(self, path):
+        """Start reporting changes inside the folder path"""
+        self._folders[path] = self._stamp(path)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def wait(self, timeout):
+        """Sleep for timeout seconds and return the changed (folder, None) pairs
+
+        The folders are only compared once every poll_interval.
+        """
+        time.sleep(timeout)
+        changes = set()
+        if time.monotonic() < self._next_poll:
+            return changes
+        self._next_poll = time.monotonic() + self.poll_interval
+        for path, stamp in list(self._folders.items()):
+            current = self._stamp(path)
+            if current != stamp:
+                changes.add((path, None))
+                if current is None:
+                    del self._folders[path]
+                else:
+                    self._folders[path] = current
+        return changes
+
+    def close(self):
+        self._folders.clear()
+
+
+def create_watcher(polling=False, poll_interval=WATCH_INTERVAL):
+    """Return the best available watcher, or a PollingWatcher if polling is set"""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(poll_interval)
+
+
+class WatchedTarget:
+    """In-memory view of the files behind one target
+
+    ``files`` maps each file to its (size, mtime) and ``children`` each
+    folder to the names it holds; ``empty`` holds folders emptied by
+    evictions that are still too young to be removed. Files the policy could evict are kept
+    in a heap ordered by mtime, so every cycle only looks at the oldest
+    ones; entries of the heap that no longer match ``files`` are stale
+    and dropped when they come up. Once stale entries outnumber the live
+    files, the heap is rebuilt from ``files``, so its size follows the
+    number of files rather than the number of writes.
+    """
+
+    def __init__(self, target, policy, roots):
+        self.target = target
+        self.policy = policy
+        self.roots = roots
+        self.files = {}
+        self.children = {}
+        self.total = 0
+        self.heap = []
+        self.empty = set()
+
+    def evictable(self, name, size):
+        """Return True if a file may ever be evicted by the policy"""
+        policy = self.policy
+        if policy is None:
+            return True
+        return not policy.excludes(name) and size >= policy.min_size
+
+    def set_file(self, path, size, mtime):
+        """Record a new or changed file"""
+        old = self.files.get(path)
+        if old is not None:
+            self.total -= old[0]
+        self.files[path] = (size, mtime)
+        self.total += size
+        if self.evictable(os.path.basename(path), size):
+            heapq.heappush(self.heap, (mtime, path))
+            if len(self.heap) > 2 * len(self.files) + HEAP_SLACK:
+                self.compact()
+
+    def compact(self):
+        """Rebuild the heap from the live files, dropping every stale entry"""
+        self.heap = [(mtime, path) for path, (size, mtime) in self.files.items()
+                     if self.evictable(os.path.basename(path), size)]
+        heapq.heapify(self.heap)
+
+    def drop(self, path):
+        """Forget a file, or a folder and everything below it"""
+        stack = [path]
+        while stack:
+            path = stack.pop()
+            old = self.files.pop(path, None)
+            if old is not None:
+                self.total -= old[0]
+                continue
+            stack.extend(os.path.join(path, name) for name in self.children.pop(path, ()))
+
+
+class WatchDaemon:
+    """Evict files from targets as they cross their policy thresholds
+
+    The folders of every target are listed once at start. From then on,
+    only entries reported by the watcher are looked at again, and every
+    ``interval`` seconds the files older than the policy's age limit are
+    deleted, oldest first. With ``max_bytes``, the oldest files of a
+    target are also deleted while it holds more than that, whatever their
+    age; exclusions and the size limit still apply. Each cycle costs in
+    proportion to the changes and evictions, not to the size of the
+    trees. Deletions go through a TreeDeleter with the engine's audit,
+    and every target that evicted something is reported to the engine's
+    metrics hooks as a "watch" operation.
+    """
+
+    def __init__(self, engine, targets, interval=WATCH_INTERVAL, max_bytes=None, polling=False):
+        self.engine = engine
+        self.targets = list(targets)
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.polling = polling
+        self.watcher = None
+        self.watched = []
+        self._owners = {}
+
+    def start(self):
+        """Resolve the targets, list their folders and start watching them"""
+        engine = self.engine
+        engine.start_run()
+        engine.resolve_targets(self.targets)
+        self.watcher = create_watcher(self.polling, self.interval)
+        for target in self.targets:
+            expanded_path = engine.target_path(target)
+            roots = [path for path, contents_only in engine.roots_for(target, expanded_path)
+                     if os.path.isdir(path)]
+            if not roots:
+                continue
+            watched = WatchedTarget(target, engine.policy_for(target), roots)
+            self.watched.append(watched)
+            for root in roots:
+                self.add_tree(watched, root)
+        folders = sum(len(watched.children) for watched in self.watched)
+        engine.log(f"👀 Watching {folders} folders of {len(self.watched)} targets "
+                   f"with {self.watcher.name}, evicting every {self.interval:g}s")
+
+    def add_tree(self, watched, top):
+        """List a folder tree into the view and watch all its folders"""
+        stack = [top]
+        while stack:
+            folder = stack.pop()
+            self._watch(watched, folder)
+            for entry in self._list(folder):
+                self.add_entry(watched, folder, entry, stack)
+
+    def _watch(self, watched, folder):
+        """Watch one folder, switching to polling if the kernel refuses"""
+        watched.children.setdefault(folder, set())
+        self._owners[folder] = watched
+        try:
+            self.watcher.watch(folder)
+        except OSError as e:
+            if isinstance(self.watcher, PollingWatcher) or e.errno == errno.ENOENT:
+                return
+            self.engine.log(f"⚠️ {self.watcher.name} unavailable ({str(e)}), polling instead")
+            self.watcher.close()
+            self.watcher = PollingWatcher(self.interval)
+            for known in self._owners:
+                self.watcher.watch(known)
+
+    @staticmethod
+    def _list(folder):
+        try:
+            with os.scandir(folder) as scandir_it:
+                return list(scandir_it)
+        except OSError:
+            return []
+
+    def add_entry(self, watched, folder, entry, stack):
+        """Add one listed entry of folder to the view"""
+        policy = watched.policy
+        if _is_real_dir(entry):
+            if policy is not None and policy.excludes(entry.name):
+                return
+            watched.children[folder].add(entry.name)
+            stack.append(entry.path)
+            return
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            return
+        watched.children[folder].add(entry.name)
+        watched.set_file(entry.path, st.st_size, st.st_mtime)
+
+    def refresh(self, folder, name):
+        """Update the view for one reported change"""
+        watched = self._owners.get(folder)
+        if watched is None:
+            return
+        if name is None:
+            # List the folder again and reconcile its entries
+            entries = {entry.name: entry for entry in self._list(folder)}
+            for old in watched.children.get(folder, set()) - set(entries):
+                self.drop(watched, os.path.join(folder, old))
+            stack = []
+            for entry in entries.values():
+                path = entry.path
+                if path in watched.children:
+                    continue
+                known = watched.files.get(path)
+                if known is not None:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if known != (st.st_size, st.st_mtime):
+                        watched.set_file(path, st.st_size, st.st_mtime)
+                    continue
+                self.add_entry(watched, folder, entry, stack)
+            for subfolder in stack:
+                self.add_tree(watched, subfolder)
+            return
+
+        path = os.path.join(folder, name)
+        try:
+            st = os.lstat(path)
+        except OSError:
+            self.drop(watched, path)
+            return
+        if path in watched.children:
+            return
+        if os.path.isdir(path) and not os.path.islink(path):
+            if watched.policy is None or not watched.policy.excludes(name):
+                watched.children[folder].add(name)
+                self.add_tree(watched, path)
+            return
+        watched.children.setdefault(folder, set()).add(name)
+        if watched.files.get(path) != (st.st_size, st.st_mtime):
+            watched.set_file(path, st.st_size, st.st_mtime)
+
+    def drop(self, watched, path):
+        """Forget a vanished file or folder tree"""
+        watched.drop(path)
+        folder, name = os.path.split(path)
+        watched.children.get(folder, set()).discard(name)
+        prefix = path + os.sep
+        for known in [known for known in self._owners if known == path or known.startswith(prefix)]:
+            del self._owners[known]
+
+    def evict(self, watched):
+        """Delete the files of a target that crossed its limits; return the TargetResult"""
+        policy = watched.policy
+        if policy is not None:
+            policy.refresh()
+        cutoff = policy.cutoff if policy is not None else None
+        result = TargetResult(watched.target, watched.roots[0])
+        result.policy = policy
+        deleter = TreeDeleter(result.stats, audit=self.engine.audit)
+        retained = []
+        while watched.heap:
+            mtime, path = watched.heap[0]
+            too_big = self.max_bytes is not None and watched.total > self.max_bytes
+            if not too_big and (cutoff is None or mtime > cutoff):
+                break
+            heapq.heappop(watched.heap)
+            known = watched.files.get(path)
+            if known is None or known[1] != mtime:
+                continue
+            try:
+                st = os.lstat(path)
+            except FileNotFoundError:
+                self.drop(watched, path)
+                continue
+            except OSError:
+                retained.append((mtime, path))
+                continue
+            if st.st_mtime != mtime or st.st_size != known[0]:
+                # Rewritten since it was seen: judge it again later
+                watched.set_file(path, st.st_size, st.st_mtime)
+                continue
+            failed = deleter.stats.failed
+            deleter.delete_path(path)
+            if deleter.stats.failed > failed:
+                retained.append((mtime, path))
+                continue
+            self.drop(watched, path)
+            self.remove_empty(watched, os.path.dirname(path), deleter)
+        for item in retained:
+            heapq.heappush(watched.heap, item)
+        for folder in list(watched.empty):
+            watched.empty.discard(folder)
+            if folder in watched.children:
+                self.remove_empty(watched, folder, deleter)
+        return result
+
+    def remove_empty(self, watched, folder, deleter):
+        """Remove folders emptied by evictions, up to the target's roots"""
+        while folder not in watched.roots and not watched.children.get(folder):
+            try:
+                st = os.lstat(folder)
+            except OSError:
+                return
+            if watched.policy is not None and not watched.policy.allows_dir(st):
+                watched.empty.add(folder)
+                return
+            if not deleter.remove_dir(folder, st.st_mtime):
+                return
+            watched.empty.discard(folder)
+            watched.children.pop(folder, None)
+            self._owners.pop(folder, None)
+            parent, name = os.path.split(folder)
+            watched.children.get(parent, set()).discard(name)
+            folder = parent
+
+    def cycle(self):
+        """Apply the pending changes and evict; return the TargetResults with evictions"""
+        results = []
+        for watched in self.watched:
+            result = self.evict(watched)
+            stats = result.stats
+            if not (stats.deleted or stats.failed):
+                continue
+            result.message = (f"Evicted {stats.files_deleted} files, {stats.dirs_deleted} folders"
+                              + (f", {stats.failed} in use or access denied" if stats.failed else "")
+                              + f", {format_size(watched.total)} left")
+            self.engine.log(f"♻️ {watched.target.label} - {result.message}")
+            metrics = TargetMetrics.from_clean(result)
+            metrics.operation = "watch"
+            self.engine.emit_metrics(metrics)
+            results.append(result)
+        return results
+
+    def run(self, on_cycle=None):
+        """Watch and evict until the engine's RunControl is cancelled
+
+        ``on_cycle`` is called with the TargetResults of every cycle.
+        """
+        control = self.engine.control
+        self.start()
+        try:
+            next_cycle = time.monotonic()
+            while not control.cancelled:
+                remaining = next_cycle - time.monotonic()
+                if remaining <= 0:
+                    results = self.cycle()
+                    if on_cycle is not None:
+                        on_cycle(results)
+                    next_cycle = time.monotonic() + self.interval
+                    continue
+                for folder, name in sorted(self.watcher.wait(min(remaining, WAIT_SLICE)),
+                                           key=lambda change: change[1] is not None):
+                    self.refresh(folder, name)
+        finally:
+            self.watcher.close()
+        self.engine.log("⏹️ Watch stopped")
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Build script for creating Bat Broom executable
+
+Run with --fast for the startup-optimised profile: a one-folder build that
+starts without unpacking itself to the temp directory on every launch.
 """
 
 import os
@@ -8,6 +11,13 @@ import sys
 import subprocess
 import shutil
 
+# Standard library modules Bat Broom never uses, left out of the fast build
+FAST_EXCLUDES = [
+    "unittest", "doctest", "pydoc", "pdb", "lib2to3", "distutils",
+    "setuptools", "pip", "test", "tkinter.test", "idlelib", "turtle",
+    "turtledemo", "xmlrpc",
+]
+
 def check_pyinstaller():
     """Check if PyInstaller is installed"""
     try:
@@ -21,20 +31,27 @@ def install_pyinstaller():
     print("Installing PyInstaller...")
     subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
 
-def build_executable():
+def build_executable(fast=False):
     """Build the executable using PyInstaller"""
-    print("Building Bat Broom executable...")
+    print("Building Bat Broom executable" + (" (fast startup profile)..." if fast else "..."))
     
     # PyInstaller command
     cmd = [
         "pyinstaller",
-        "--onefile",
+        "--onedir" if fast else "--onefile",
         "--windowed",
         "--name=BatBroom",
         "--icon=broom.ico",  # Optional: if icon file exists
-        "bat_broom.py"
+        "--paths=.",
+        "bat_broom/__main__.py"
     ]
     
+    if fast:
+        # UPX-compressed binaries are decompressed on every start
+        cmd.insert(-1, "--noupx")
+        for module in FAST_EXCLUDES:
+            cmd.insert(-1, f"--exclude-module={module}")
+    
     # Remove icon parameter if file doesn't exist
     if not os.path.exists("broom.ico"):
         cmd.remove("--icon=broom.ico")
@@ -42,7 +59,7 @@ def build_executable():
     try:
         subprocess.check_call(cmd)
         print("✅ Build completed successfully!")
-        print("📁 Executable location: dist/BatBroom.exe")
+        print(f"📁 Executable location: {executable_path(fast)}")
         
         # Clean up build files
         if os.path.exists("build"):
@@ -59,8 +76,16 @@ def build_executable():
     
     return True
 
+def executable_path(fast=False):
+    """Return where PyInstaller puts the executable"""
+    if fast:
+        return os.path.join("dist", "BatBroom", "BatBroom.exe")
+    return os.path.join("dist", "BatBroom.exe")
+
 def main():
     """Main build function"""
+    fast = "--fast" in sys.argv[1:]
+    
     print("🧹 Bat Broom Build Script")
     print("=" * 30)
     
@@ -74,14 +99,15 @@ def main():
             return 1
     
     # Check if main file exists
-    if not os.path.exists("bat_broom.py"):
-        print("❌ bat_broom.py not found in current directory")
+    if not os.path.exists(os.path.join("bat_broom", "__main__.py")):
+        print("❌ bat_broom package not found in current directory")
         return 1
     
     # Build executable
-    if build_executable():
+    if build_executable(fast):
         print("\n🎉 Build completed successfully!")
-        print("You can now run: dist/BatBroom.exe")
+        print(f"You can now run: {executable_path(fast)}")
+        print(f"Measure its startup with: python -m bat_broom.bench --startup --exe {executable_path(fast)}")
         return 0
     else:
         print("\n❌ Build failed")
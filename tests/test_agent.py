@@ -0,0 +1,136 @@
+"""Job options accepted by the agent"""
+
+import http.client
+import json
+import math
+import threading
+import time
+
+import pytest
+
+from bat_broom.agent import (Agent, create_server, job_policy, job_settings, job_throttle,
+                             option_number, option_strings)
+
+TOKEN = "secret"
+
+
+def wait_finished(job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        job.wait_events(len(job.events), 0.1)
+    return job.finished
+
+
+def test_option_number_converts_and_defaults():
+    assert option_number({}, "workers", 1, int) == 1
+    assert option_number({"workers": None}, "workers", 1, int) == 1
+    assert option_number({"workers": "4"}, "workers", 1, int) == 4
+    assert option_number({"max_mbps": 2.5}, "max_mbps", 0) == 2.5
+
+
+@pytest.mark.parametrize("value", [True, "many", [], math.inf, "nan", -1])
+def test_option_number_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        option_number({"max_ops": value}, "max_ops", 0)
+
+
+def test_job_settings():
+    assert job_settings({}) == {"workers": 1, "per_volume": None, "retry_budget": 0,
+                                "scan_first": False}
+    settings = job_settings({"workers": 3, "per_volume": "2", "retry_budget": 1.5,
+                             "scan_first": 1})
+    assert settings == {"workers": 3, "per_volume": 2, "retry_budget": 1.5, "scan_first": True}
+    for options in ({"workers": 0}, {"per_volume": 0}, {"retry_budget": -1}):
+        with pytest.raises(ValueError):
+            job_settings(options)
+
+
+def test_job_throttle_is_none_without_limits():
+    assert job_throttle({}) is None
+    assert job_throttle({"max_ops": 100}).ops_per_second == 100
+
+
+def test_list_options_must_be_lists_of_strings():
+    assert option_strings({}, "exclude") == []
+    assert option_strings({"exclude": ["*.log"]}, "exclude") == ["*.log"]
+    for value in ("*.log", ["*.log", 3], {"*.log": True}):
+        with pytest.raises(ValueError):
+            option_strings({"exclude": value}, "exclude")
+
+
+def test_job_policy_takes_exclude_patterns_as_they_are():
+    assert job_policy({}) is None
+    assert job_policy({"exclude": ["*.log"]}).exclude == ("*.log",)
+    with pytest.raises(ValueError):
+        job_policy({"exclude": "*.log"})
+
+
+def test_start_rejects_bad_options_without_starting_a_job():
+    agent = Agent(TOKEN)
+    with pytest.raises(ValueError):
+        agent.start("clean", {"targets": ["User Temp Directory"], "workers": "many"})
+    with pytest.raises(ValueError):
+        agent.start("clean", {"targets": ["No Such Target"]})
+    assert agent.job is None
+    assert not agent.status()["busy"]
+
+
+def test_clean_job_runs_and_frees_the_agent(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    (temp / "a.tmp").write_text("x")
+    monkeypatch.setenv("TEMP", str(temp))
+    agent = Agent(TOKEN)
+    job = agent.start("clean", {"targets": ["User Temp Directory"], "workers": 2})
+    assert wait_finished(job)
+    assert job.state == "done"
+    assert job.events[-1]["type"] == "done"
+    assert list(temp.iterdir()) == []
+    assert job.report["deleted"] == 1
+    assert not agent.status()["busy"]
+
+
+@pytest.fixture
+def server():
+    server = create_server(Agent(TOKEN), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, path, payload, token=TOKEN):
+    host, port = server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        connection.request("POST", path, json.dumps(payload),
+                           {"Authorization": f"Bearer {token}",
+                            "Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_bad_options_are_answered_with_400(server):
+    for options in ({"targets": ["User Temp Directory"], "per_volume": "nan"},
+                    {"targets": ["User Temp Directory"], "max_ops": -5},
+                    {"targets": ["User Temp Directory"], "workers": True},
+                    {"targets": ["User Temp Directory"], "exclude": "*.log"},
+                    {"targets": "User Temp Directory"}):
+        status, body = post(server, "/clean", options)
+        assert status == 400
+        assert "error" in body
+    assert server.agent.job is None
+
+
+def test_unknown_targets_are_answered_with_400(server):
+    status, body = post(server, "/clean", {"targets": ["No Such Target"]})
+    assert status == 400
+    assert server.agent.job is None
+
+
+def test_requests_need_the_token(server):
+    status, body = post(server, "/scan", {"targets": ["User Temp Directory"]}, token="wrong")
+    assert status == 401
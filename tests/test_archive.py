@@ -0,0 +1,92 @@
+"""Archiving deleted files before they are unlinked"""
+
+import errno
+import os
+import tarfile
+
+from bat_broom.archive import Archive, archive_name
+from bat_broom.retry import RetryQueue
+from bat_broom.walker import TreeDeleter
+
+
+def make_files(root, sizes):
+    for name, size in sizes.items():
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(os.urandom(size))
+
+
+def archived_names(path):
+    with tarfile.open(path, "r:gz") as tar:
+        return sorted(member.name for member in tar.getmembers())
+
+
+def test_archive_holds_every_deleted_file(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir()
+    make_files(str(target), {"a.log": 3000, "b.log": 5000})
+    archive = Archive(str(tmp_path / "archives"), member_size=1024)
+    deleter = TreeDeleter(archive=archive)
+    deleter.delete_contents(str(target))
+    path = archive.close()
+    assert os.listdir(target) == []
+    assert deleter.stats.bytes_freed == 8000
+    assert archived_names(path) == sorted(archive_name(str(target / name))
+                                          for name in ("a.log", "b.log"))
+    assert (archive.files, archive.bytes) == (2, 8000)
+
+
+def test_locked_file_is_archived_once_across_retries(tmp_path, monkeypatch):
+    target = tmp_path / "target"
+    target.mkdir()
+    make_files(str(target), {"locked.log": 1000, "other.log": 1000})
+    real_unlink = os.unlink
+    failures = []
+
+    def unlink(name, *, dir_fd=None):
+        if os.path.basename(name) == "locked.log" and len(failures) < 3:
+            failures.append(name)
+            raise OSError(errno.EBUSY, "Device or resource busy", name)
+        return real_unlink(name, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", unlink)
+    archive = Archive(str(tmp_path / "archives"))
+    retry = RetryQueue(budget=5, initial_delay=0.01, max_delay=0.01)
+    deleter = TreeDeleter(archive=archive, retry=retry)
+    deleter.delete_contents(str(target))
+    assert retry.run() == []
+    path = archive.close()
+
+    assert len(failures) == 3
+    assert os.listdir(target) == []
+    assert deleter.stats.files_deleted == 2
+    assert deleter.stats.failed == 0
+    assert archive.files == 2
+    assert archived_names(path) == sorted(archive_name(str(target / name))
+                                          for name in ("locked.log", "other.log"))
+
+
+def test_file_changed_before_its_retry_is_archived_again(tmp_path):
+    path = tmp_path / "changing.log"
+    path.write_bytes(b"x" * 100)
+    archive = Archive(str(tmp_path / "archives"))
+    archive.add(str(path))
+    archive.add(str(path))
+    assert archive.files == 1
+    path.write_bytes(b"y" * 200)
+    archive.add(str(path))
+    assert archive.files == 2
+    archive.forget(str(path))
+    archive.close()
+
+
+def test_files_past_the_cap_are_refused_and_kept(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir()
+    make_files(str(target), {"big.bin": 64 * 1024})
+    archive = Archive(str(tmp_path / "archives"), max_bytes=16 * 1024)
+    deleter = TreeDeleter(archive=archive)
+    deleter.delete_contents(str(target))
+    assert os.listdir(target) == ["big.bin"]
+    assert deleter.stats.errnos == {"EFBIG": 1}
+    assert archive.refused == 1
+    assert archive.close() is None
@@ -0,0 +1,94 @@
+"""The JSON lines audit trail: batching, rotation and compression"""
+
+import gzip
+import json
+import os
+
+from bat_broom.audit import AuditSink
+
+
+def read_lines(path, compressed=False):
+    opener = gzip.open if compressed else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_a_batch_at_a_time(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    sink = AuditSink(str(path), batch_size=3)
+    sink.record("/t/a.log", "file", "deleted", 10, 1.0)
+    sink.record("/t/b.log", "file", "failed", error="EACCES")
+    assert not path.exists()
+    sink.record("/t/c", "dir", "deleted")
+    assert sink._buffer == []
+    sink.flush()
+    assert len(read_lines(path)) == 3
+    sink.record("/t/d.log", "file", "deleted", 5)
+    sink.close()
+    lines = read_lines(path)
+    assert [line["path"] for line in lines] == ["/t/a.log", "/t/b.log", "/t/c", "/t/d.log"]
+    assert lines[1] == dict(lines[1], type="file", outcome="failed", size=None,
+                            errno="EACCES")
+
+
+def test_written_counts_encoded_bytes(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    sink = AuditSink(str(path), batch_size=1)
+    for name in ("café.log", "日本語.tmp", "plain.log"):
+        sink.record(f"/t/{name}", "file", "deleted")
+    sink.flush()
+    assert sink._written == os.path.getsize(path)
+    sink.close()
+    assert read_lines(path)[1]["path"] == "/t/日本語.tmp"
+
+
+def test_full_files_are_rotated_and_old_ones_dropped(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    sink = AuditSink(str(path), max_bytes=200, backups=2, batch_size=2)
+    for index in range(40):
+        sink.record(f"/t/file{index}.log", "file", "deleted", index)
+    sink.close()
+    assert sorted(os.listdir(tmp_path)) == ["audit.jsonl", "audit.jsonl.1", "audit.jsonl.2"]
+    newest = read_lines(path)
+    assert newest[-1]["path"] == "/t/file39.log"
+    # Every rotated file stopped at the first batch past the limit
+    for name in ("audit.jsonl.1", "audit.jsonl.2"):
+        size = os.path.getsize(tmp_path / name)
+        assert 200 <= size < 200 + 2 * 100
+    kept = read_lines(tmp_path / "audit.jsonl.2") + read_lines(tmp_path / "audit.jsonl.1")
+    indexes = [line["size"] for line in kept + newest]
+    assert indexes == list(range(indexes[0], 40))
+
+
+def test_reopened_file_keeps_its_size(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    first = AuditSink(str(path), batch_size=1)
+    first.record("/t/a.log", "file", "deleted")
+    first.close()
+    size = os.path.getsize(path)
+
+    second = AuditSink(str(path), max_bytes=size, batch_size=1)
+    second.record("/t/b.log", "file", "deleted")
+    second.close()
+    assert [line["path"] for line in read_lines(tmp_path / "audit.jsonl.1")] == ["/t/a.log"]
+    assert [line["path"] for line in read_lines(path)] == ["/t/b.log"]
+
+
+def test_gzip_trail_appends_members_and_counts_from_the_file(tmp_path):
+    path = tmp_path / "audit.jsonl.gz"
+    first = AuditSink(str(path), compress=True, batch_size=2)
+    for index in range(3):
+        first.record(f"/t/file{index}.log", "file", "deleted", index)
+    first.close()
+
+    second = AuditSink(str(path), compress=True, batch_size=2)
+    second.record("/t/file3.log", "file", "deleted", 3)
+    second.close()
+    assert [line["size"] for line in read_lines(path, compressed=True)] == [0, 1, 2, 3]
+
+    # The reopened file already holds max_bytes, so the first batch rotates it
+    third = AuditSink(str(path), compress=True, max_bytes=os.path.getsize(path))
+    third.record("/t/file4.log", "file", "deleted", 4)
+    third.close()
+    assert len(read_lines(f"{path}.1", compressed=True)) == 4
+    assert [line["size"] for line in read_lines(path, compressed=True)] == [4]
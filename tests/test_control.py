@@ -0,0 +1,171 @@
+"""Pausing, cancelling and progress of a run"""
+
+import os
+import threading
+import types
+
+import pytest
+
+from bat_broom import control
+from bat_broom.control import CleanupCancelled, RunControl, format_eta
+from bat_broom.engine import CleanupEngine, select_targets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(control, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def run_checkpoint(run_control):
+    """Call checkpoint() in a thread, returning the thread and what it raised"""
+    raised = []
+
+    def target():
+        try:
+            run_control.checkpoint()
+        except CleanupCancelled as e:
+            raised.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread, raised
+
+
+def test_paused_run_waits_at_its_checkpoint():
+    run_control = RunControl()
+    run_control.pause()
+    assert run_control.paused
+    thread, raised = run_checkpoint(run_control)
+    thread.join(0.2)
+    assert thread.is_alive()
+    run_control.resume()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert raised == []
+    assert run_control.items == 1
+
+
+def test_cancel_wakes_a_paused_run_and_stops_it():
+    run_control = RunControl()
+    run_control.pause()
+    thread, raised = run_checkpoint(run_control)
+    run_control.cancel()
+    thread.join(5)
+    assert len(raised) == 1
+    # A cancelled run cannot be paused again
+    run_control.pause()
+    assert not run_control.paused
+    with pytest.raises(CleanupCancelled):
+        run_control.checkpoint()
+
+
+def test_checkpoints_count_items_and_bytes_from_every_thread():
+    run_control = RunControl()
+    run_control.start(2, total_items=4000, total_bytes=8000)
+
+    def work():
+        for _ in range(1000):
+            run_control.checkpoint(1, 2)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    run_control.target_done()
+    snapshot = run_control.snapshot()
+    assert (snapshot.items, snapshot.bytes) == (4000, 8000)
+    assert snapshot.fraction == 1.0
+    assert snapshot.targets_done == 1
+
+
+def test_eta_leaves_paused_time_out(clock):
+    run_control = RunControl()
+    run_control.start(1, total_items=1000)
+    run_control.snapshot()
+    clock.now = 1.0
+    run_control.checkpoint(100)
+    assert run_control.snapshot().eta == pytest.approx(9.0)
+
+    run_control.pause()
+    clock.now = 61.0
+    assert run_control.snapshot().paused
+    run_control.resume()
+    clock.now = 62.0
+    run_control.checkpoint(100)
+    snapshot = run_control.snapshot()
+    assert snapshot.items_per_second == pytest.approx(100)
+    assert snapshot.eta == pytest.approx(8.0)
+
+
+def test_eta_after_a_pause_without_snapshots(clock):
+    run_control = RunControl()
+    run_control.start(1, total_items=1000)
+    run_control.snapshot()
+    clock.now = 2.0
+    run_control.checkpoint(200)
+    run_control.pause()
+    clock.now = 300.0
+    run_control.resume()
+    clock.now = 301.0
+    run_control.checkpoint(100)
+    # 300 items in 3 seconds of work
+    assert run_control.snapshot().eta == pytest.approx(7.0)
+
+
+def test_fraction_falls_back_on_targets():
+    run_control = RunControl()
+    run_control.start(4)
+    run_control.target_done()
+    snapshot = run_control.snapshot()
+    assert snapshot.fraction == 0.25
+    assert snapshot.eta is None
+
+
+def test_format_eta():
+    assert format_eta(59.6) == "1:00"
+    assert format_eta(3725) == "1:02:05"
+
+
+def test_clean_checks_in_once_per_entry(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    (temp / "sub").mkdir(parents=True)
+    for name in ("a.tmp", "b.tmp", os.path.join("sub", "c.tmp")):
+        (temp / name).write_text("x")
+    monkeypatch.setenv("TEMP", str(temp))
+    run_control = RunControl()
+    report = CleanupEngine(control=run_control, log=lambda message: None).run(
+        select_targets([], ["User Temp Directory"]))
+    assert report.deleted == 4
+    assert run_control.items == 4
+    assert run_control.targets_done == 1
+
+
+def test_cancelled_clean_stops_and_reports_it(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    for index in range(10):
+        (temp / f"{index}.tmp").write_text("x")
+    monkeypatch.setenv("TEMP", str(temp))
+    run_control = RunControl()
+    real_unlink = os.unlink
+
+    def unlink(path, *, dir_fd=None):
+        run_control.cancel()
+        return real_unlink(path, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", unlink)
+    report = CleanupEngine(control=run_control, log=lambda message: None).run(
+        select_targets([], ["User Temp Directory"]))
+    assert report.cancelled
+    assert len(os.listdir(temp)) == 9
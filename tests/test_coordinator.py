@@ -0,0 +1,109 @@
+"""Fleet runs against several agents on localhost"""
+
+import json
+import signal
+import socket
+import threading
+
+import pytest
+
+from bat_broom import cli
+from bat_broom.agent import Agent, create_server
+from bat_broom.coordinator import Coordinator
+
+TOKEN = "secret"
+USER_TEMP = "User Temp Directory"
+
+
+@pytest.fixture
+def temp(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    (temp / "sub").mkdir(parents=True)
+    (temp / "a.tmp").write_bytes(b"x" * 100)
+    (temp / "sub" / "b.tmp").write_bytes(b"x" * 50)
+    monkeypatch.setenv("TEMP", str(temp))
+    return temp
+
+
+@pytest.fixture
+def agents():
+    servers = [create_server(Agent(TOKEN), port=0) for _ in range(3)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05},
+                         daemon=True).start()
+    yield [f"127.0.0.1:{server.server_address[1]}" for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def unreachable():
+    """Return the address of a port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"127.0.0.1:{port}"
+
+
+@pytest.fixture
+def signals():
+    """Restore the handlers the fleet command installs"""
+    saved = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+    yield
+    for signum, handler in saved.items():
+        signal.signal(signum, handler)
+
+
+def run(addresses, kind, options, concurrency=8):
+    coordinator = Coordinator(addresses, TOKEN, concurrency=concurrency, timeout=10)
+    try:
+        return coordinator.run(kind, options)
+    finally:
+        coordinator.close()
+
+
+def test_scan_adds_up_every_agent(temp, agents):
+    report = run(agents, "scan", {"targets": [USER_TEMP]})
+    assert report.ok == 3
+    assert report.totals() == {"files": 6, "dirs": 3, "bytes": 450}
+    assert [outcome.state for outcome in report.outcomes] == ["done"] * 3
+
+
+def test_clean_adds_up_every_agent(temp, agents):
+    # The agents share one folder: one at a time, the first one empties it
+    report = run(agents, "clean", {"targets": [USER_TEMP]}, concurrency=1)
+    assert report.ok == 3
+    assert list(temp.iterdir()) == []
+    totals = report.totals()
+    assert (totals["total"], totals["successful"]) == (3, 3)
+    assert (totals["deleted"], totals["failed"]) == (3, 0)
+
+
+def test_unreachable_agent_fails_alone(temp, agents, unreachable):
+    report = run([agents[0], unreachable], "scan", {"targets": [USER_TEMP]})
+    assert report.ok == 1
+    assert [outcome.state for outcome in report.outcomes] == ["done", "failed"]
+    assert report.outcomes[1].error.startswith(unreachable)
+    assert report.totals()["files"] == 2
+
+
+def test_refused_options_fail_every_agent(temp, agents):
+    report = run(agents, "clean", {"targets": [USER_TEMP], "workers": 0})
+    assert report.ok == 0
+    assert all("workers" in outcome.error for outcome in report.outcomes)
+    assert sorted(path.name for path in temp.iterdir()) == ["a.tmp", "sub"]
+
+
+def fleet(*arguments):
+    return cli.main(["fleet", *arguments, "--token", TOKEN, "--json", "-t", USER_TEMP])
+
+
+def test_fleet_exit_status(temp, agents, unreachable, signals, capsys):
+    addresses = [argument for address in agents for argument in ("--agent", address)]
+    assert fleet("scan", *addresses) == 0
+    assert json.loads(capsys.readouterr().out)["totals"]["files"] == 6
+
+    assert fleet("scan", "--agent", agents[0], "--agent", unreachable) == 1
+    output = json.loads(capsys.readouterr().out)
+    assert (output["agents"], output["ok"]) == (2, 1)
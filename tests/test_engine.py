@@ -0,0 +1,108 @@
+"""Cleanup runs of the engine and how overlapping targets are merged"""
+
+import os
+
+from bat_broom.engine import CleanupEngine, select_targets
+from bat_broom.matcher import coalesce_roots
+
+USER_TEMP = "User Temp Directory"
+LOCAL_TEMP = "User AppData Local Temp"
+
+
+def make_profile(tmp_path):
+    """Return an environment whose user variables point into tmp_path, with its temp filled"""
+    profile = tmp_path / "profile"
+    temp = profile / "AppData" / "Local" / "Temp"
+    (temp / "sub").mkdir(parents=True)
+    (temp / "a.tmp").write_bytes(b"x" * 100)
+    (temp / "sub" / "b.tmp").write_bytes(b"x" * 50)
+    environ = dict(os.environ, USERPROFILE=str(profile), TEMP=str(temp), TMP=str(temp))
+    return environ, temp
+
+
+def test_clean_deletes_the_contents_of_a_target(tmp_path):
+    environ, temp = make_profile(tmp_path)
+    engine = CleanupEngine(environ=environ)
+    report = engine.run(select_targets([], [USER_TEMP]))
+    assert os.listdir(temp) == []
+    assert temp.is_dir()
+    assert (report.total, report.successful) == (1, 1)
+    assert report.deleted == 3
+    assert report.failed == 0
+
+
+def test_scan_then_clean_reports_the_scanned_sizes(tmp_path):
+    environ, temp = make_profile(tmp_path)
+    engine = CleanupEngine(environ=environ)
+    targets = select_targets([], [USER_TEMP])
+    scans = engine.scan(targets)
+    assert (scans.files, scans.dirs, scans.bytes) == (2, 1, 150)
+
+    report = engine.run(targets, scans)
+    assert os.listdir(temp) == []
+    assert report.bytes_freed == 150
+    assert report.results[0].bytes_measured
+
+
+def test_plain_clean_does_not_claim_measured_sizes(tmp_path):
+    environ, temp = make_profile(tmp_path)
+    report = CleanupEngine(environ=environ).run(select_targets([], [USER_TEMP]))
+    assert report.deleted == 3
+    assert not report.results[0].bytes_measured
+
+
+def test_targets_sharing_a_folder_clean_it_once(tmp_path):
+    environ, temp = make_profile(tmp_path)
+    engine = CleanupEngine(environ=environ)
+    report = engine.run(select_targets([], [USER_TEMP, LOCAL_TEMP]))
+    assert os.listdir(temp) == []
+    assert report.deleted == 3
+    by_name = {result.target.description: result for result in report.results}
+    assert by_name[USER_TEMP].covered_by == []
+    assert by_name[LOCAL_TEMP].covered_by == [USER_TEMP]
+
+
+def test_missing_target_folder_is_not_a_failure(tmp_path):
+    environ = dict(os.environ, TEMP=str(tmp_path / "missing"))
+    report = CleanupEngine(environ=environ).run(select_targets([], [USER_TEMP]))
+    assert report.successful == report.total == 1
+    assert report.deleted == 0
+
+
+def test_coalesce_roots_drops_identical_and_nested_roots(tmp_path):
+    outer = str(tmp_path)
+    inner = str(tmp_path / "inner")
+    os.mkdir(inner)
+    items = [
+        ("inner", [(inner, True)], None),
+        ("outer", [(outer, True)], None),
+        ("again", [(outer, True)], None),
+    ]
+    roots, covered = coalesce_roots(items)
+    assert roots == {"inner": [], "outer": [(outer, True)], "again": []}
+    assert covered == {"inner": ["outer"], "again": ["outer"]}
+
+
+def test_coalesce_roots_sees_through_links(tmp_path):
+    real = tmp_path / "real"
+    real.mkdir()
+    alias = tmp_path / "alias"
+    os.symlink(str(real), str(alias))
+    roots, covered = coalesce_roots([
+        ("real", [(str(real), True)], None),
+        ("alias", [(str(alias), True)], None),
+    ])
+    assert roots["real"] == [(str(real), True)]
+    assert roots["alias"] == []
+    assert covered == {"alias": ["real"]}
+
+
+def test_coalesce_roots_keeps_roots_of_other_groups(tmp_path):
+    inner = str(tmp_path / "inner")
+    os.mkdir(inner)
+    roots, covered = coalesce_roots([
+        ("outer", [(str(tmp_path), True)], "older than 7 days"),
+        ("inner", [(inner, True)], None),
+    ])
+    assert roots["inner"] == [(inner, True)]
+    assert covered == {}
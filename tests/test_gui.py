@@ -0,0 +1,47 @@
+"""The GUI builds, and every method it calls exists"""
+
+import ast
+import inspect
+
+import pytest
+
+tk = pytest.importorskip("tkinter")
+
+from bat_broom import gui
+
+
+def self_references(cls):
+    """Return (used, defined): the self attributes a class reads and the ones it has"""
+    tree = ast.parse(inspect.getsource(cls))
+    defined = {node.name for node in tree.body[0].body
+               if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    defined.update(name for name in vars(cls) if not name.startswith("__"))
+    used = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+                and node.value.id == "self"):
+            if isinstance(node.ctx, ast.Store):
+                defined.add(node.attr)
+            else:
+                used.add(node.attr)
+    return used, defined
+
+
+@pytest.mark.parametrize("cls", [gui.BatBroomApp, gui.ToolTip])
+def test_every_self_attribute_is_defined(cls):
+    used, defined = self_references(cls)
+    assert sorted(used - defined) == []
+
+
+def test_app_builds_and_closes(tmp_path, monkeypatch):
+    monkeypatch.setenv("BAT_BROOM_STATE_DIR", str(tmp_path))
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        pytest.skip(f"no display: {e}")
+    try:
+        app = gui.BatBroomApp(root)
+        root.update()
+        assert app.cleanup_sections
+    finally:
+        root.destroy()
@@ -0,0 +1,138 @@
+"""Run history, growth estimates and largest-first scheduling"""
+
+import os
+import time
+
+import pytest
+
+from bat_broom.engine import CleanupEngine, build_targets
+from bat_broom.history import DAY, RunHistory, TargetGrowth, history_key, schedule
+from bat_broom.metrics import TargetMetrics
+from bat_broom.policy import Policy
+
+SECTIONS = {"Temp": [("%A%\\*.*", "A"), ("%B%\\*.*", "B"), ("%C%\\*.*", "C")]}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = RunHistory(str(tmp_path / "history.sqlite3"))
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def folders(tmp_path):
+    """Give each target a folder holding one 100 byte file"""
+    environ = dict(os.environ)
+    for name in "ABC":
+        folder = tmp_path / name
+        folder.mkdir()
+        (folder / f"{name}.tmp").write_bytes(b"x" * 100)
+        environ[name] = str(folder)
+    return environ
+
+
+def record_clean(history, target, timestamp, nbytes, seconds=1.0):
+    metrics = TargetMetrics("clean", "Temp", target, f"/{target}", seconds)
+    metrics.timestamp = timestamp
+    metrics.files_deleted = 1
+    if nbytes is None:
+        metrics.bytes_measured = False
+    else:
+        metrics.bytes = nbytes
+    history(metrics)
+
+
+def rows(history):
+    return history._connection.execute(
+        "SELECT operation, target, files, dirs, bytes, ok FROM results ORDER BY rowid").fetchall()
+
+
+def test_runs_are_recorded_without_reading_sizes(history, folders):
+    engine = CleanupEngine(environ=folders, history=history, log=lambda message: None)
+    engine.scan(build_targets(SECTIONS)[:1])
+    engine.run(build_targets(SECTIONS)[:1])
+    engine = CleanupEngine(environ=folders, history=history, log=lambda message: None,
+                           policy=Policy(min_size=1))
+    engine.run(build_targets(SECTIONS)[1:2])
+    assert rows(history) == [("scan", "A", 1, 0, 100, 1),
+                             ("clean", "A", 1, 0, None, 1),
+                             ("clean", "B", 1, 0, 100, 1)]
+
+
+def test_growth_averages_measured_cleanups(history):
+    now = time.time()
+    record_clean(history, "A", now - 3 * DAY, 500)
+    record_clean(history, "A", now - 2 * DAY, 1000)
+    # Unmeasured cleanups are left out of the rate
+    record_clean(history, "A", now - 1.5 * DAY, None)
+    record_clean(history, "A", now - DAY, 3000)
+    record_clean(history, "B", now - DAY, 700)
+    growth = history.estimates()
+
+    a = growth[("", "Temp", "A")]
+    assert (a.cleans, a.last_bytes) == (4, 3000)
+    # 1000 bytes over one day, then 3000 over half a day after an unmeasured cleanup
+    assert a.bytes_per_day == pytest.approx(4000 / 1.5)
+    assert a.estimate(now) == pytest.approx(4000 / 1.5, abs=1)
+    # Seen once: no rate yet, the last yield is expected again
+    b = growth[("", "Temp", "B")]
+    assert b.bytes_per_day is None
+    assert b.estimate(now) == 700
+    assert [item.target for item in history.growth()] == ["A", "B"]
+
+
+def test_newer_scan_is_the_base_of_the_estimate():
+    growth = TargetGrowth(("", "Temp", "A"), 2, 1000.0, 50, 1.0, DAY, scanned_at=2000.0,
+                          scanned_bytes=300)
+    assert growth.estimate(now=2500.0) == 800
+    growth.scanned_at = 500.0
+    assert growth.estimate(now=2500.0) == 1500
+
+
+def test_largest_yield_first():
+    targets = build_targets(SECTIONS)
+    a, b, c = targets
+    estimates = {history_key(a): (100, 1.0), history_key(c): (900, 1.0)}
+    assert schedule(targets, estimates) == [c, a, b]
+
+
+def test_budget_orders_by_yield_per_second_and_puts_long_targets_last():
+    targets = build_targets(SECTIONS)
+    a, b, c = targets
+    # 100, 200 and 250 bytes per second
+    estimates = {history_key(a): (100, 1.0), history_key(b): (10000, 50.0),
+                 history_key(c): (500, 2.0)}
+    assert schedule(targets, estimates) == [b, c, a]
+    assert schedule(targets, estimates, budget=10) == [c, a, b]
+    # Two workers share a budget long enough for everything
+    assert schedule(targets, estimates, budget=30, workers=2) == [c, b, a]
+
+
+def test_engine_orders_largest_from_the_history(history, folders):
+    now = time.time()
+    for target, nbytes in (("A", 10), ("B", 500), ("C", 50)):
+        record_clean(history, target, now - DAY, nbytes)
+    logs = []
+    engine = CleanupEngine(environ=folders, history=history, order="largest", log=logs.append)
+    report = engine.run(build_targets(SECTIONS))
+    assert [result.target.description for result in report.results] == ["B", "C", "A"]
+    assert any("3 of 3 targets seen before" in message for message in logs)
+
+
+def test_time_budget_stops_starting_targets(history, folders, monkeypatch):
+    real_unlink = os.unlink
+
+    def slow_unlink(path, *, dir_fd=None):
+        time.sleep(0.3)
+        return real_unlink(path, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", slow_unlink)
+    engine = CleanupEngine(environ=folders, history=history, time_budget=0.1,
+                           log=lambda message: None)
+    report = engine.run(build_targets(SECTIONS))
+    assert report.budget_reached
+    assert [result.target.description for result in report.results] == ["A"]
+    assert report.skipped == 2
+    assert os.listdir(folders["B"]) == ["B.tmp"]
+    assert [row[1] for row in rows(history)] == ["A"]
@@ -0,0 +1,107 @@
+"""Scan index skipping and its interaction with cleanup policies"""
+
+import os
+import time
+
+from bat_broom.index import MTIME_GRANULARITY_NS, ScanIndex, TargetIndex
+from bat_broom.policy import Policy
+from bat_broom.walker import TreeDeleter, TreeScanner
+
+DAY = 24 * 60 * 60
+
+
+def make_empty_dir(root, age_days):
+    """Create root/empty with an mtime age_days in the past"""
+    path = os.path.join(root, "empty")
+    os.mkdir(path)
+    then = time.time() - age_days * DAY
+    os.utime(path, (then, then))
+    return path
+
+
+def stale_record(path):
+    """Return a previous-run record saying path was empty and unchanged"""
+    mtime_ns = os.stat(path).st_mtime_ns
+    return {path: (mtime_ns, 0, 0, mtime_ns + 2 * MTIME_GRANULARITY_NS)}
+
+
+def test_folder_kept_by_age_is_removed_by_a_looser_policy(tmp_path):
+    root = str(tmp_path)
+    empty = make_empty_dir(root, age_days=3)
+    index = ScanIndex(str(tmp_path / "index.sqlite3"))
+
+    first = index.target(root)
+    TreeDeleter(index=first, policy=Policy(min_age_days=7)).delete_contents(root)
+    index.store(root, first)
+    assert os.path.isdir(empty)
+
+    second = index.target(root)
+    deleter = TreeDeleter(index=second, policy=Policy(min_age_days=1))
+    deleter.delete_contents(root)
+    assert not os.path.exists(empty)
+    assert deleter.stats.dirs_deleted == 1
+
+
+def test_skipped_empty_folder_follows_the_current_policy(tmp_path):
+    root = str(tmp_path)
+    empty = make_empty_dir(root, age_days=3)
+
+    strict = TreeDeleter(index=TargetIndex(stale_record(empty)), policy=Policy(min_age_days=7))
+    strict.delete_contents(root)
+    assert os.path.isdir(empty)
+    assert strict.stats.dirs_skipped == 1
+
+    loose = TreeDeleter(index=TargetIndex(stale_record(empty)), policy=Policy(min_age_days=1))
+    loose.delete_contents(root)
+    assert not os.path.exists(empty)
+    assert loose.stats.dirs_deleted == 1
+
+
+def test_skipped_empty_folder_without_policy_is_removed_unlisted(tmp_path):
+    root = str(tmp_path)
+    empty = make_empty_dir(root, age_days=3)
+    target_index = TargetIndex(stale_record(empty))
+    deleter = TreeDeleter(index=target_index)
+    deleter.delete_contents(root)
+    assert not os.path.exists(empty)
+    assert target_index.skipped == 1
+
+
+def test_scan_plan_keeps_a_skipped_folder_the_policy_keeps(tmp_path):
+    root = str(tmp_path)
+    empty = make_empty_dir(root, age_days=3)
+
+    scanner = TreeScanner(index=TargetIndex(stale_record(empty)), policy=Policy(min_age_days=7))
+    scanner.scan_contents(root)
+    TreeDeleter(policy=Policy(min_age_days=7)).delete_plan(scanner.plan)
+    assert os.path.isdir(empty)
+    assert scanner.stats.skipped == 1
+
+    scanner = TreeScanner(index=TargetIndex(stale_record(empty)), policy=Policy(min_age_days=1))
+    scanner.scan_contents(root)
+    TreeDeleter(policy=Policy(min_age_days=1)).delete_plan(scanner.plan)
+    assert not os.path.exists(empty)
+
+
+def test_young_empty_folder_is_not_recorded_as_skippable(tmp_path):
+    root = str(tmp_path)
+    empty = make_empty_dir(root, age_days=3)
+    target_index = TargetIndex()
+    TreeScanner(index=target_index, policy=Policy(min_age_days=7)).scan_contents(root)
+    assert empty not in target_index.records
+    assert root in target_index.records
+
+
+def test_unchanged_empty_target_is_not_listed_again(tmp_path):
+    root = str(tmp_path / "target")
+    os.mkdir(root)
+    then = time.time() - DAY
+    os.utime(root, (then, then))
+    index = ScanIndex(str(tmp_path / "index.sqlite3"))
+    first = index.target(root)
+    TreeDeleter(index=first).delete_contents(root)
+    index.store(root, first)
+
+    second = index.target(root)
+    TreeDeleter(index=second).delete_contents(root)
+    assert second.skipped == 1
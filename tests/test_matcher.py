@@ -0,0 +1,82 @@
+"""Resolving expanded catalog paths with the pattern trie"""
+
+import os
+from collections import Counter
+
+from bat_broom.matcher import PatternTrie
+
+
+def make_packages(root):
+    """Lay out a Packages folder like %LOCALAPPDATA%\\Packages"""
+    packages = root / "Packages"
+    for name in ("Microsoft.Photos_8wekyb", "Contoso", "NoTemp.App"):
+        (packages / name).mkdir(parents=True)
+    for name in ("Microsoft.Photos_8wekyb", "Contoso"):
+        (packages / name / "TempState").mkdir()
+        (packages / name / "TempState" / "cache.tmp").write_text("x")
+        (packages / name / "TempState" / "README").write_text("x")
+        (packages / name / "AC" / "Temp").mkdir(parents=True)
+    # A file named like a package is not a folder to look into
+    (packages / "stray.dat").write_text("x")
+    return packages
+
+
+def resolve(**paths):
+    trie = PatternTrie()
+    for key, path in paths.items():
+        trie.add(key, path)
+    return trie.resolve()
+
+
+def test_wildcard_segments_match_every_package(tmp_path):
+    packages = make_packages(tmp_path)
+    results = resolve(temp=os.path.join(str(packages), "*", "TempState", "*.*"))
+    assert results == {"temp": [(str(packages / "Contoso" / "TempState"), True),
+                                (str(packages / "Microsoft.Photos_8wekyb" / "TempState"), True)]}
+
+
+def test_star_dot_star_matches_names_without_an_extension(tmp_path):
+    packages = make_packages(tmp_path)
+    results = resolve(tempstate=os.path.join(str(packages), "*.*", "TempState", "*.*"),
+                      dotted=os.path.join(str(packages), "*.?*", "TempState", "*.*"))
+    # "Contoso" has no dot, but *.* means every name as on Windows
+    assert results["tempstate"] == [
+        (str(packages / "Contoso" / "TempState"), True),
+        (str(packages / "Microsoft.Photos_8wekyb" / "TempState"), True)]
+    assert results["dotted"] == [(str(packages / "Microsoft.Photos_8wekyb" / "TempState"), True)]
+
+
+def test_contents_patterns_and_exact_paths(tmp_path):
+    packages = make_packages(tmp_path)
+    photos = packages / "Microsoft.Photos_8wekyb"
+    results = resolve(stars=os.path.join(str(photos), "TempState", "*"),
+                      tmp_files=os.path.join(str(packages), "*", "TempState", "*.tmp"),
+                      literal=os.path.join(str(photos), "AC", "Temp"),
+                      missing=os.path.join(str(packages), "Gone", "TempState", "*.*"))
+    assert results["stars"] == [(str(photos / "TempState"), True)]
+    assert results["tmp_files"] == [(str(packages / "Contoso" / "TempState" / "cache.tmp"), False),
+                                    (str(photos / "TempState" / "cache.tmp"), False)]
+    assert results["literal"] == [(str(photos / "AC" / "Temp"), False)]
+    assert results["missing"] == []
+
+
+def test_each_folder_is_listed_once(tmp_path, monkeypatch):
+    packages = make_packages(tmp_path)
+    real_scandir = os.scandir
+    listed = Counter()
+
+    def scandir(path="."):
+        listed[os.fspath(path)] += 1
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir)
+    results = resolve(
+        temp=os.path.join(str(packages), "*", "TempState", "*.*"),
+        ac_temp=os.path.join(str(packages), "*", "AC", "Temp", "*.*"),
+        photos=os.path.join(str(packages), "Microsoft.Photos_8wekyb", "TempState", "*"),
+        tmp_files=os.path.join(str(packages), "*", "TempState", "*.tmp"))
+    assert len(results["ac_temp"]) == 2
+    assert listed[str(packages)] == 1
+    assert max(listed.values()) == 1
+    # Literal components are checked, not listed
+    assert str(tmp_path) not in listed
@@ -0,0 +1,186 @@
+"""Deferred retries of locked entries after the main pass"""
+
+import argparse
+import errno
+import os
+import types
+
+import pytest
+
+from bat_broom import cli, engine, retry
+from bat_broom.engine import CleanupEngine, select_targets
+from bat_broom.retry import RetryQueue
+from bat_broom.walker import TreeDeleter
+
+
+class FakeClock:
+    """Stands in for the time module so the backoff runs instantly"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(retry, "time", types.SimpleNamespace(monotonic=clock.monotonic,
+                                                             sleep=clock.sleep))
+    return clock
+
+
+def fail_unlink(monkeypatch, name, error, times=None):
+    """Make os.unlink of name raise error, ``times`` times or forever"""
+    real_unlink = os.unlink
+    attempts = []
+
+    def unlink(path, *, dir_fd=None):
+        if os.path.basename(path) == name and (times is None or len(attempts) < times):
+            attempts.append(path)
+            raise error
+        return real_unlink(path, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", unlink)
+    return attempts
+
+
+def access_error(winerror=None):
+    error = PermissionError(errno.EACCES, "Permission denied")
+    if winerror is not None:
+        error.winerror = winerror
+    return error
+
+
+def clean_folder(tmp_path, queue):
+    folder = tmp_path / "target"
+    folder.mkdir()
+    (folder / "locked.log").write_bytes(b"x" * 10)
+    (folder / "other.log").write_bytes(b"x" * 10)
+    deleter = TreeDeleter(retry=queue)
+    deleter.delete_contents(str(folder))
+    return folder, deleter
+
+
+def test_rounds_back_off_until_the_budget_is_spent(tmp_path, monkeypatch, clock):
+    attempts = fail_unlink(monkeypatch, "locked.log", OSError(errno.EBUSY, "busy"))
+    queue = RetryQueue(budget=10, initial_delay=0.5, max_delay=4)
+    folder, deleter = clean_folder(tmp_path, queue)
+    failing_unlink = os.unlink
+    times = []
+
+    def unlink(path, *, dir_fd=None):
+        times.append(clock.now)
+        return failing_unlink(path, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", unlink)
+    left = queue.run()
+    # Pauses of 0.5, 1, 2 and 4 seconds, then the rest of the budget
+    assert times == pytest.approx([0.5, 1.5, 3.5, 7.5, 10.0])
+    assert len(attempts) == 6
+    assert [path for path, *rest in left] == [str(folder / "locked.log")]
+    assert (deleter.stats.files_deleted, deleter.stats.files_failed) == (1, 1)
+    assert deleter.stats.errnos == {"EBUSY": 1}
+    assert (queue.recovered, queue.denied) == (0, 0)
+
+
+def test_recovered_entries_move_from_failed_to_deleted(tmp_path, monkeypatch, clock):
+    attempts = fail_unlink(monkeypatch, "locked.log", OSError(errno.EBUSY, "busy"), times=3)
+    queue = RetryQueue(budget=10, initial_delay=0.5)
+    folder, deleter = clean_folder(tmp_path, queue)
+    assert queue.run() == []
+    assert clock.now == pytest.approx(3.5)
+    assert len(attempts) == 3
+    assert os.listdir(folder) == []
+    assert (deleter.stats.files_deleted, deleter.stats.files_failed) == (2, 0)
+    assert deleter.stats.errnos == {}
+    assert queue.recovered == 1
+
+
+def test_access_denied_twice_is_not_retried_further(tmp_path, monkeypatch, clock):
+    attempts = fail_unlink(monkeypatch, "locked.log", access_error())
+    queue = RetryQueue(budget=10, initial_delay=0.5)
+    folder, deleter = clean_folder(tmp_path, queue)
+    left = queue.run()
+    assert clock.now == pytest.approx(0.5)
+    assert len(attempts) == 2
+    assert [path for path, *rest in left] == [str(folder / "locked.log")]
+    assert deleter.stats.errnos == {"EACCES": 1}
+    assert queue.denied == 1
+
+
+def test_sharing_violations_are_waited_out(tmp_path, monkeypatch, clock):
+    attempts = fail_unlink(monkeypatch, "locked.log", access_error(winerror=32), times=3)
+    queue = RetryQueue(budget=10, initial_delay=0.5)
+    folder, deleter = clean_folder(tmp_path, queue)
+    assert queue.run() == []
+    assert len(attempts) == 3
+    assert deleter.stats.failed == 0
+    assert (queue.recovered, queue.denied) == (1, 0)
+
+
+def test_unlistable_folder_denied_again_is_given_up(tmp_path, monkeypatch, clock):
+    folder = tmp_path / "private"
+    folder.mkdir()
+    (folder / "a.log").write_text("x")
+    real_open = os.open
+
+    def open_(path, flags, mode=0o777, *, dir_fd=None):
+        if path == str(folder):
+            raise access_error()
+        return real_open(path, flags, mode, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "open", open_)
+    queue = RetryQueue(budget=10, initial_delay=0.5)
+    deleter = TreeDeleter(retry=queue)
+    deleter.delete_path(str(folder))
+    assert deleter.stats.dirs_failed == 1
+    assert [path for path, *rest in queue.run()] == [str(folder)]
+    assert clock.now == pytest.approx(0.5)
+    assert deleter.stats.errnos == {"EACCES": 1}
+    assert queue.denied == 1
+
+
+def test_permanent_errors_are_counted_but_not_queued(tmp_path, monkeypatch):
+    fail_unlink(monkeypatch, "locked.log", OSError(errno.ENAMETOOLONG, "too long"))
+    queue = RetryQueue()
+    folder, deleter = clean_folder(tmp_path, queue)
+    assert len(queue) == 0
+    assert deleter.stats.errnos == {"ENAMETOOLONG": 1}
+    assert deleter.stats.files_failed == 1
+
+
+def test_cancelled_run_stops_waiting(tmp_path, monkeypatch, clock):
+    fail_unlink(monkeypatch, "locked.log", OSError(errno.EBUSY, "busy"))
+    queue = RetryQueue(budget=10)
+    clean_folder(tmp_path, queue)
+    assert len(queue.run(types.SimpleNamespace(cancelled=True))) == 1
+    assert clock.now == 0
+
+
+def test_reboot_without_retries(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    (temp / "locked.log").write_text("x")
+    monkeypatch.setenv("TEMP", str(temp))
+    fail_unlink(monkeypatch, "locked.log", OSError(errno.EBUSY, "busy"))
+    scheduled = []
+
+    def schedule(paths):
+        scheduled.extend(paths)
+        return len(paths)
+
+    monkeypatch.setattr(engine, "delete_on_reboot", schedule)
+
+    queue = cli.open_retry(argparse.Namespace(retry_budget=0, delete_on_reboot=True))
+    assert queue.budget == 0
+    assert cli.open_retry(argparse.Namespace(retry_budget=0, delete_on_reboot=False)) is None
+    report = CleanupEngine(retry=queue, delete_on_reboot=True, log=lambda message: None).run(
+        select_targets([], ["User Temp Directory"]))
+    assert scheduled == [str(temp / "locked.log")]
+    assert report.reboot_scheduled == 1
+    assert report.recovered == 0
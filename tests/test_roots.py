@@ -0,0 +1,56 @@
+"""Profiles and offline images as roots of a sweep"""
+
+import os
+
+from bat_broom.engine import select_targets
+from bat_broom.roots import (USER_VARIABLES, image_roots, is_user_target, list_profiles,
+                             targets_for_roots)
+
+HOST = {"USERPROFILE": "/host/profile", "TEMP": "/host/temp", "TMP": "/host/temp",
+        "LOCALAPPDATA": "/host/local", "APPDATA": "/host/roaming", "PATH": "/bin"}
+
+
+def make_image(tmp_path, profiles=()):
+    image = tmp_path / "image"
+    (image / "Windows" / "Temp").mkdir(parents=True)
+    for name in profiles:
+        (image / "Users" / name / "AppData" / "Local" / "Temp").mkdir(parents=True)
+    return str(image)
+
+
+def test_list_profiles_skips_shared_profiles(tmp_path):
+    for name in ("bob", "Public", "alice", "Default"):
+        (tmp_path / name).mkdir()
+    (tmp_path / "notes.txt").write_text("")
+    assert list_profiles(str(tmp_path)) == [str(tmp_path / "alice"), str(tmp_path / "bob")]
+
+
+def test_image_roots_point_into_the_image(tmp_path):
+    image = make_image(tmp_path, ["alice", "bob"])
+    roots = image_roots(image, base=HOST)
+    assert [root.name for root in roots] == [os.path.join(image, "Users", name)
+                                             for name in ("alice", "bob")]
+    alice = roots[0].environ
+    assert alice["SystemRoot"] == os.path.join(image, "Windows")
+    assert alice["TEMP"] == os.path.join(image, "Users", "alice", "AppData", "Local", "Temp")
+    assert all(root.profile for root in roots)
+
+
+def test_image_without_profiles_drops_the_host_user_variables(tmp_path):
+    image = make_image(tmp_path)
+    roots = image_roots(image, base=HOST)
+    assert len(roots) == 1
+    root = roots[0]
+    assert not root.profile
+    assert not any(name in root.environ for name in USER_VARIABLES)
+    assert root.environ["PATH"] == "/bin"
+    assert root.environ["SystemRoot"] == os.path.join(image, "Windows")
+
+
+def test_image_without_profiles_only_takes_system_targets(tmp_path):
+    roots = image_roots(make_image(tmp_path), base=HOST)
+    targets = select_targets([], ["User Temp Directory", "System Temp Directory"])
+    assert [is_user_target(target) for target in targets] == [True, False]
+    per_root = targets_for_roots(targets, roots)
+    assert [target.description for target in per_root] == ["System Temp Directory"]
+    assert per_root[0].root is roots[0]
@@ -0,0 +1,68 @@
+"""Large targets split across a process pool"""
+
+import errno
+import os
+
+from bat_broom import sharding
+from bat_broom.engine import CleanupEngine, select_targets
+from bat_broom.policy import Policy
+from bat_broom.retry import RetryQueue
+from bat_broom.walker import TreeDeleter
+
+
+def make_target(temp):
+    """Fill temp with 25 top-level files and 3 folders of 5 files, 10 bytes each"""
+    for index in range(25):
+        (temp / f"top{index}.tmp").write_bytes(b"x" * 10)
+    for folder in range(3):
+        sub = temp / f"sub{folder}"
+        sub.mkdir()
+        for index in range(5):
+            (sub / f"file{index}.tmp").write_bytes(b"x" * 10)
+
+
+def clean(tmp_path, monkeypatch, **options):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    make_target(temp)
+    monkeypatch.setattr(sharding, "FILES_PER_SHARD", 10)
+    logs = []
+    engine = CleanupEngine(environ=dict(os.environ, TEMP=str(temp)), log=logs.append,
+                           processes=2, shard_threshold=20, **options)
+    report = engine.run(select_targets([], ["User Temp Directory"]))
+    assert any("Splitting" in message for message in logs)
+    assert os.listdir(temp) == []
+    return report
+
+
+def test_sharded_clean_merges_the_counts(tmp_path, monkeypatch):
+    report = clean(tmp_path, monkeypatch)
+    result = report.results[0]
+    assert (result.stats.files_deleted, result.stats.dirs_deleted) == (40, 3)
+    assert result.failed == 0
+    # Sizes were not read, so none are reported, not just the top-level ones
+    assert not result.bytes_measured
+    assert result.stats.bytes_freed == 0
+
+
+def test_sharded_clean_reports_sizes_the_policy_read(tmp_path, monkeypatch):
+    report = clean(tmp_path, monkeypatch, policy=Policy(min_size=1))
+    result = report.results[0]
+    assert result.stats.files_deleted == 40
+    assert result.bytes_measured
+    assert result.stats.bytes_freed == 400
+
+
+def test_shard_failures_are_queued_for_retry(tmp_path):
+    path = tmp_path / "locked.tmp"
+    path.write_text("x")
+    retry = RetryQueue(budget=1, initial_delay=0.01)
+    deleter = TreeDeleter(retry=retry)
+    stats = sharding.delete_shard([])[0]
+    stats.files_failed = 1
+    stats.errnos["EBUSY"] = 1
+    sharding.merge_shard(deleter, (stats, [(str(path), False, errno.EBUSY, "busy")]))
+    assert len(retry) == 1
+    assert retry.run() == []
+    assert not path.exists()
+    assert (deleter.stats.files_deleted, deleter.stats.files_failed) == (1, 0)
@@ -0,0 +1,130 @@
+"""Rename-to-staging and the purge of staged folders"""
+
+import json
+import os
+
+import pytest
+
+from bat_broom import staging
+from bat_broom.staging import STAGING_NAME, StagingArea, Stager, purge
+from bat_broom.walker import TreeDeleter
+
+
+def make_target(root):
+    """Fill root with a loose file and two folders of three files"""
+    root.mkdir()
+    (root / "loose.tmp").write_text("x")
+    for folder in ("cache", "logs"):
+        (root / folder).mkdir()
+        for index in range(3):
+            (root / folder / f"{index}.tmp").write_text("x")
+
+
+def count_files(root):
+    return sum(len(files) for _, _, files in os.walk(root))
+
+
+@pytest.fixture
+def area(tmp_path):
+    return StagingArea(directory=str(tmp_path / "state"))
+
+
+def test_folders_are_renamed_into_staging_on_the_same_volume(tmp_path, area):
+    target = tmp_path / "target"
+    make_target(target)
+    stager = Stager(area)
+    deleter = TreeDeleter()
+    stager.stage_contents(deleter, str(target))
+
+    assert os.listdir(target) == []
+    assert stager.staged == 2
+    assert (deleter.stats.dirs_staged, deleter.stats.files_deleted) == (2, 1)
+    root = os.path.join(area.directory, "staging")
+    assert area.roots() == [root]
+    [batch] = os.listdir(root)
+    assert sorted(name.split("-", 1)[1] for name in os.listdir(os.path.join(root, batch))) == [
+        "cache", "logs"]
+    assert count_files(root) == 6
+
+
+def test_staging_falls_back_next_to_the_target(tmp_path, area, monkeypatch):
+    real_device = staging._device
+
+    def device(path):
+        # The state directory is on another volume
+        return -1 if path.startswith(area.directory) else real_device(path)
+
+    monkeypatch.setattr(staging, "_device", device)
+    target = tmp_path / "target"
+    make_target(target)
+    stager = Stager(area)
+    stager.stage_path(TreeDeleter(), str(target / "cache"))
+    root = str(tmp_path / STAGING_NAME)
+    assert area.roots() == [root]
+    assert sorted(os.listdir(target)) == ["logs", "loose.tmp"]
+    assert count_files(root) == 3
+
+
+def test_manifest_lists_each_root_once_until_it_is_emptied(tmp_path, area):
+    root = str(tmp_path / "staging")
+    batch = area.create_batch(root, "run1")
+    area.create_batch(root, "run2")
+    with open(area.manifest_path, encoding="utf-8") as f:
+        assert json.load(f) == {"roots": [root]}
+    assert area.pending()
+
+    (tmp_path / "staging" / "run1" / "left.tmp").write_text("x")
+    assert not area.forget_if_empty(root)
+    assert area.roots() == [root]
+    os.remove(os.path.join(batch, "left.tmp"))
+    os.rmdir(batch)
+    os.rmdir(os.path.join(root, "run2"))
+    assert area.forget_if_empty(root)
+    assert area.roots() == []
+    assert not area.pending()
+
+
+def test_unreadable_manifest_lists_nothing(area):
+    os.makedirs(area.directory)
+    with open(area.manifest_path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert area.roots() == []
+
+
+def test_interrupted_purge_resumes_from_the_manifest(tmp_path, area, monkeypatch):
+    target = tmp_path / "target"
+    make_target(target)
+    Stager(area).stage_contents(TreeDeleter(), str(target))
+    root = os.path.join(area.directory, "staging")
+    real_unlink = os.unlink
+    unlinked = []
+
+    def unlink(path, *, dir_fd=None):
+        if len(unlinked) == 2:
+            raise KeyboardInterrupt
+        unlinked.append(path)
+        return real_unlink(path, dir_fd=dir_fd)
+
+    monkeypatch.setattr(os, "unlink", unlink)
+    with pytest.raises(KeyboardInterrupt):
+        purge(area)
+    monkeypatch.setattr(os, "unlink", real_unlink)
+    assert count_files(root) == 4
+
+    # A later purge, say after a restart, finds the folder in the manifest
+    stats = purge(StagingArea(directory=area.directory))
+    assert stats.files_deleted == 4
+    assert not os.path.exists(root)
+    assert area.roots() == []
+
+
+def test_only_one_purge_runs_at_a_time(area):
+    lock = staging.FileLock(os.path.join(area.directory, staging.PURGE_LOCK_NAME))
+    assert lock.acquire(blocking=False)
+    try:
+        messages = []
+        assert purge(area, log=messages.append) is None
+        assert messages == ["ℹ️ Another purge is already running"]
+    finally:
+        lock.release()
+    assert purge(area).deleted == 0
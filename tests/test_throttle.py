@@ -0,0 +1,132 @@
+"""Token buckets, latency backoff and the time a cleanup waits on them"""
+
+import os
+import types
+
+import pytest
+
+from bat_broom import throttle
+from bat_broom.engine import CleanupEngine, select_targets
+from bat_broom.throttle import ADJUST_INTERVAL, MAX_DELAY, MIN_DELAY, IoThrottle, TokenBucket
+from bat_broom.walker import TreeDeleter
+
+
+class FakeClock:
+    """Stands in for the time module so waits take no time"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(throttle, "time", types.SimpleNamespace(monotonic=clock.monotonic,
+                                                                sleep=clock.sleep))
+    return clock
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(10)
+    assert bucket.reserve(10, now=0.0) == 0
+    assert bucket.reserve(1, now=0.0) == pytest.approx(0.1)
+    # One second refills ten tokens, the one overdrawn included
+    assert bucket.reserve(5, now=1.0) == 0
+    assert bucket.tokens == pytest.approx(4)
+    # Larger than the burst: allowed, paid for by waiting
+    assert bucket.reserve(25, now=1.0) == pytest.approx(2.1)
+    # Idle time never banks more than the burst
+    bucket.reserve(0, now=100.0)
+    assert bucket.tokens == 10
+
+
+def test_operations_are_paced_to_the_rate(clock):
+    limiter = IoThrottle(ops_per_second=100)
+    waited = sum(limiter.acquire() for _ in range(300))
+    # The first 100 are the burst, the next 200 take two seconds
+    assert clock.now == pytest.approx(2.0)
+    assert waited == pytest.approx(2.0)
+    assert limiter.waited == pytest.approx(2.0)
+
+
+def test_bytes_are_paced_by_file_size(clock):
+    limiter = IoThrottle(bytes_per_second=1000)
+    assert limiter.needs_size
+    assert limiter.acquire(0) == 0
+    assert limiter.acquire(3000) == pytest.approx(2.0)
+    assert limiter.acquire(1000) == pytest.approx(1.0)
+
+
+def test_cancelled_wait_ends_early(clock):
+    limiter = IoThrottle(ops_per_second=1)
+    limiter.acquire()
+    assert limiter.acquire(control=types.SimpleNamespace(cancelled=True)) == 0
+    assert clock.now == 0
+
+
+def test_slow_calls_back_off_then_recover(clock):
+    limiter = IoThrottle(max_latency=0.01)
+    limiter.record(0.05)
+    # Too soon after the start to adjust the pause
+    assert limiter.delay == 0
+    delays = []
+    for _ in range(10):
+        clock.now += ADJUST_INTERVAL
+        limiter.record(0.05)
+        delays.append(limiter.delay)
+    assert delays[:3] == [MIN_DELAY, 2 * MIN_DELAY, 4 * MIN_DELAY]
+    assert delays[-1] == MAX_DELAY
+    assert limiter.backoffs == 10
+    # Samples within one interval change nothing
+    limiter.record(0.05)
+    assert (limiter.delay, limiter.backoffs) == (MAX_DELAY, 10)
+
+    # The pause is added to every call
+    clock.now += 1
+    assert limiter.acquire() == pytest.approx(MAX_DELAY)
+
+    while limiter.latency > 0.01:
+        limiter.record(0.0)
+    delays = []
+    for _ in range(20):
+        clock.now += ADJUST_INTERVAL
+        limiter.record(0.0)
+        delays.append(limiter.delay)
+    assert delays[:2] == [MAX_DELAY / 2, MAX_DELAY / 4]
+    assert delays[-1] == 0
+    assert limiter.to_dict()["delay_ms"] == 0
+
+
+def test_waits_are_reported_as_throttled_seconds(tmp_path, clock):
+    folder = tmp_path / "target"
+    folder.mkdir()
+    for index in range(30):
+        (folder / f"{index}.tmp").write_text("x")
+    limiter = IoThrottle(ops_per_second=10)
+    deleter = TreeDeleter(throttle=limiter)
+    deleter.delete_contents(str(folder))
+    assert os.listdir(folder) == []
+    assert deleter.stats.throttled_seconds == pytest.approx(2.0)
+    assert limiter.operations == 30
+
+
+def test_engine_reports_the_throttle(tmp_path, monkeypatch, clock):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    for index in range(5):
+        (temp / f"{index}.tmp").write_text("x")
+    monkeypatch.setenv("TEMP", str(temp))
+    metrics = []
+    engine = CleanupEngine(throttle=IoThrottle(ops_per_second=2), metrics_hooks=[metrics.append],
+                           log=lambda message: None)
+    report = engine.run(select_targets([], ["User Temp Directory"]))
+    # Two in the burst, then three at half a second each
+    assert [metric.throttled_seconds for metric in metrics] == [pytest.approx(1.5)]
+    assert report.throttle["waited_seconds"] == pytest.approx(1.5)
+    assert report.throttle["operations"] == 5
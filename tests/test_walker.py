@@ -0,0 +1,119 @@
+"""Tree deletion, scanning and the counts they report"""
+
+import os
+import time
+
+from bat_broom.policy import Policy
+from bat_broom.walker import TreeDeleter, TreeScanner
+
+DAY = 24 * 60 * 60
+
+
+def make_tree(root):
+    """Create a small tree of 4 files (600 bytes) in 3 folders below root"""
+    os.makedirs(os.path.join(root, "a", "b"))
+    os.mkdir(os.path.join(root, "c"))
+    for name, size in (("top.txt", 100), ("a/one.txt", 100), ("a/b/two.txt", 200),
+                       ("c/three.log", 200)):
+        with open(os.path.join(root, name), "wb") as f:
+            f.write(b"x" * size)
+
+
+def set_age(path, age_days):
+    then = time.time() - age_days * DAY
+    os.utime(path, (then, then))
+
+
+def test_delete_contents_counts_every_entry(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    deleter = TreeDeleter(measure=True)
+    assert deleter.delete_contents(root) == 0
+    assert os.listdir(root) == []
+    assert deleter.stats.files_deleted == 4
+    assert deleter.stats.dirs_deleted == 3
+    assert deleter.stats.bytes_freed == 600
+    assert deleter.stats.failed == 0
+
+
+def test_sizes_are_only_read_when_needed():
+    assert not TreeDeleter().sizes_known
+    assert TreeDeleter(measure=True).sizes_known
+    assert TreeDeleter(policy=Policy(min_size=1)).sizes_known
+    assert not TreeDeleter(policy=Policy(exclude=["*.log"])).sizes_known
+
+
+def test_delete_path_removes_the_folder_itself(tmp_path):
+    make_tree(str(tmp_path))
+    deleter = TreeDeleter()
+    deleter.delete_path(str(tmp_path / "a"))
+    assert not os.path.exists(tmp_path / "a")
+    assert deleter.stats.files_deleted == 2
+    assert deleter.stats.dirs_deleted == 2
+
+
+def test_links_are_removed_without_following_them(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "keep.txt").write_text("keep")
+    target = tmp_path / "target"
+    target.mkdir()
+    os.symlink(str(outside), str(target / "link"))
+    TreeDeleter().delete_contents(str(target))
+    assert os.listdir(target) == []
+    assert (outside / "keep.txt").exists()
+
+
+def test_policy_keeps_young_files_and_their_folders(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    for name in ("top.txt", "a/one.txt", "c/three.log", "a", "c"):
+        set_age(os.path.join(root, name), 10)
+    deleter = TreeDeleter(policy=Policy(min_age_days=7))
+    remaining = deleter.delete_contents(root)
+    assert os.path.exists(os.path.join(root, "a", "b", "two.txt"))
+    assert not os.path.exists(os.path.join(root, "c"))
+    assert remaining == 1
+    assert deleter.stats.files_deleted == 3
+    assert deleter.stats.files_skipped == 1
+    # b holds the kept file and a holds b; neither is a failure
+    assert deleter.stats.dirs_skipped == 2
+    assert deleter.stats.failed == 0
+
+
+def test_excluded_folders_are_not_entered(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    deleter = TreeDeleter(policy=Policy(exclude=["C", "*.TXT"]))
+    deleter.delete_contents(root)
+    assert sorted(os.listdir(root)) == ["a", "c", "top.txt"]
+    assert os.path.exists(os.path.join(root, "c", "three.log"))
+    assert deleter.stats.files_deleted == 0
+
+
+def test_scan_plan_deletes_what_the_scan_counted(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    scanner = TreeScanner()
+    scanner.scan_contents(root)
+    assert (scanner.stats.files, scanner.stats.dirs, scanner.stats.bytes) == (4, 3, 600)
+
+    deleter = TreeDeleter()
+    deleter.delete_plan(scanner.plan)
+    assert os.listdir(root) == []
+    assert deleter.stats.files_deleted == 4
+    assert deleter.stats.dirs_deleted == 3
+    assert deleter.stats.bytes_freed == 600
+
+
+def test_plan_entries_that_disappeared_are_ignored(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    scanner = TreeScanner()
+    scanner.scan_contents(root)
+    os.unlink(os.path.join(root, "c", "three.log"))
+    deleter = TreeDeleter()
+    deleter.delete_plan(scanner.plan)
+    assert os.listdir(root) == []
+    assert deleter.stats.files_deleted == 3
+    assert deleter.stats.failed == 0
@@ -0,0 +1,92 @@
+"""Watch mode: the in-memory view of a target and its evictions"""
+
+import os
+import time
+
+from bat_broom.engine import CleanupEngine, select_targets
+from bat_broom.policy import Policy
+from bat_broom.watch import HEAP_SLACK, WatchDaemon, WatchedTarget
+
+DAY = 24 * 60 * 60
+
+
+class RecordingAudit:
+    def __init__(self):
+        self.records = []
+
+    def record(self, path, kind, outcome, size=None, mtime=None, error=None):
+        self.records.append((path, kind, outcome))
+
+
+def write(path, size, age_days=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    then = time.time() - age_days * DAY
+    os.utime(path, (then, then))
+
+
+def start_daemon(temp, monkeypatch, policy=None, max_bytes=None):
+    monkeypatch.setenv("TEMP", str(temp))
+    audit = RecordingAudit()
+    metrics = []
+    engine = CleanupEngine(policy=policy, audit=audit, metrics_hooks=[metrics.append])
+    daemon = WatchDaemon(engine, select_targets([], ["User Temp Directory"]),
+                         max_bytes=max_bytes, polling=True)
+    daemon.start()
+    return daemon, audit, metrics
+
+
+def test_rewrites_do_not_grow_the_heap():
+    watched = WatchedTarget(None, None, ["/root"])
+    for mtime in range(10000):
+        watched.set_file("/root/busy.log", 10, float(mtime))
+        watched.set_file(f"/root/file{mtime % 5}.log", 10, float(mtime))
+    assert len(watched.files) == 6
+    assert len(watched.heap) <= 2 * len(watched.files) + HEAP_SLACK + 1
+    assert watched.total == 60
+    # The newest version of every file is still in the heap
+    live = {(mtime, path) for path, (size, mtime) in watched.files.items()}
+    assert live <= set(watched.heap)
+
+
+def test_unevictable_files_stay_out_of_the_heap():
+    watched = WatchedTarget(None, Policy(min_size=100, exclude=["*.lock"]), ["/root"])
+    watched.set_file("/root/small.log", 10, 1.0)
+    watched.set_file("/root/held.lock", 1000, 1.0)
+    watched.set_file("/root/big.log", 1000, 1.0)
+    assert watched.heap == [(1.0, "/root/big.log")]
+    assert watched.total == 2010
+
+
+def test_old_files_are_evicted_and_young_ones_kept(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    write(temp / "old.log", 100, age_days=3)
+    write(temp / "young.log", 100)
+    daemon, audit, metrics = start_daemon(temp, monkeypatch, policy=Policy(min_age_days=1))
+    try:
+        results = daemon.cycle()
+    finally:
+        daemon.watcher.close()
+    assert sorted(os.listdir(temp)) == ["young.log"]
+    assert [result.stats.files_deleted for result in results] == [1]
+    assert audit.records == [(str(temp / "old.log"), "file", "deleted")]
+    assert [metric.operation for metric in metrics] == ["watch"]
+    assert daemon.cycle() == []
+
+
+def test_size_cap_evicts_oldest_first_and_removes_emptied_folders(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    write(temp / "sub" / "oldest.bin", 200, age_days=3)
+    write(temp / "older.bin", 200, age_days=2)
+    write(temp / "new.bin", 200)
+    daemon, audit, metrics = start_daemon(temp, monkeypatch, max_bytes=300)
+    try:
+        results = daemon.cycle()
+    finally:
+        daemon.watcher.close()
+    assert sorted(os.listdir(temp)) == ["new.bin"]
+    stats = results[0].stats
+    assert (stats.files_deleted, stats.dirs_deleted, stats.failed) == (2, 1, 0)
+    assert (str(temp / "sub"), "dir", "deleted") in audit.records
+    assert metrics[0].dirs_deleted == 1
+    assert daemon.watched[0].total == 200